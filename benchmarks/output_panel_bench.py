@@ -0,0 +1,41 @@
+"""Benchmark reporting many errors to an `OutputPanel`.
+
+Compares buffered writes with writing every line in its own edit (which is
+what `flush_size = 0` does). This needs Sublime Text, run it from the console:
+
+    from CSScheme.benchmarks import output_panel_bench; output_panel_bench.main()
+"""
+
+import collections
+import time
+
+import sublime
+
+from ..converters import CSSConverter
+from ..my_sublime_lib.view import OutputPanel
+
+PANEL_NAME = "csscheme_bench"
+
+FakeError = collections.namedtuple('FakeError', 'line column reason')
+
+
+def generate_errors(count):
+    return [FakeError(i + 1, 5, "unexpected IDENT token for property foreground")
+            for i in range(count)]
+
+
+def run(window, errors, flush_size):
+    start = time.time()
+    with OutputPanel(window, PANEL_NAME, auto_show=False) as out:
+        out.flush_size = flush_size
+        CSSConverter.report_parse_errors(out, "Benchmark.csscheme", "", errors)
+    return time.time() - start
+
+
+def main(count=10000):
+    window = sublime.active_window()
+    errors = generate_errors(count)
+    print("reporting %d errors" % count)
+    print("  %-24s %8.2fms" % ("buffered", run(window, errors, OutputPanel.flush_size) * 1000))
+    print("  %-24s %8.2fms" % ("one edit per line", run(window, errors, 0) * 1000))
+    window.destroy_output_panel(PANEL_NAME)
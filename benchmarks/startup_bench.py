@@ -0,0 +1,54 @@
+"""Benchmark the cost of loading the scope naming data at plugin startup.
+
+Every case runs in a fresh interpreter, so nothing is cached in `sys.modules`.
+
+Usage (from the directory containing the package, e.g. "Packages"):
+
+    python -m CSScheme.benchmarks.startup_bench [RUNS]
+"""
+
+import os
+import subprocess
+import sys
+
+PACKAGE = (__package__ or __name__).split('.')[0]
+
+CASES = [
+    ("import scope_data",
+     "from {0} import scope_data"),
+    ("import + load() (1st completion)",
+     "from {0} import scope_data; scope_data.load()"),
+    ("parse DATA (previous import)",
+     "from {0}.scope_data import build; build.parse(build.DATA)"),
+]
+
+TEMPLATE = """
+import time
+import {package}
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(code, runs):
+    cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    script = TEMPLATE.format(package=PACKAGE, code=code.format(PACKAGE))
+    times = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-B', '-c', script],
+                                         cwd=cwd, universal_newlines=True)
+        times.append(float(output))
+    return sorted(times)[len(times) // 2]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    runs = int(argv[0]) if argv else 20
+    print("median of %d runs" % runs)
+    for name, code in CASES:
+        print("  %-34s %8.2fms" % (name, measure(code, runs) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark effective-style queries of `tinycsscheme.styles.StyleEngine`.
+
+Usage (from the directory containing the package, e.g. "Packages"):
+
+    python -m CSScheme.benchmarks.styles_bench [RULES ...]
+"""
+
+import random
+import sys
+import time
+
+from ..tinycsscheme.styles import StyleEngine
+
+LANGS = ['python', 'js', 'ruby', 'c', 'rust', 'go', 'html', 'css']
+SCOPES = ['string.quoted.double', 'string.quoted.single', 'comment.line', 'comment.block',
+          'constant.numeric', 'constant.language', 'keyword.control', 'keyword.operator',
+          'entity.name.function', 'entity.name.class', 'variable.parameter',
+          'storage.type', 'storage.modifier', 'support.function', 'punctuation.definition']
+
+
+def generate_data(rules, seed=0):
+    rnd = random.Random(seed)
+    items = [{'settings': {'foreground': "#FFFFFF", 'background': "#000000"}}]
+    for i in range(rules):
+        scope = rnd.choice(SCOPES).split('.')
+        scope = '.'.join(scope[:rnd.randint(1, len(scope))])
+        if rnd.random() < 0.3:
+            scope = "source.%s %s" % (rnd.choice(LANGS), scope)
+        if rnd.random() < 0.1:
+            scope += ", " + rnd.choice(SCOPES)
+        if rnd.random() < 0.05:
+            scope += " - comment"
+        items.append({'scope': scope, 'settings': {'foreground': "#%06X" % i}})
+    return {'name': "Benchmark", 'settings': items}
+
+
+def generate_stacks(count, seed=0):
+    rnd = random.Random(seed)
+    stacks = []
+    for i in range(count):
+        lang = rnd.choice(LANGS)
+        stack = ["source." + lang]
+        for j in range(rnd.randint(0, 3)):
+            stack.append("meta.block." + lang)
+        stack.append("%s.%s" % (rnd.choice(SCOPES), lang))
+        stacks.append(tuple(stack))
+    return stacks
+
+
+def run(rules, stacks=200000, distinct=2000):
+    data = generate_data(rules)
+    samples = generate_stacks(distinct)
+    queries = [samples[i % distinct] for i in range(stacks)]
+
+    start = time.time()
+    engine = StyleEngine(data)
+    setup = time.time() - start
+
+    start = time.time()
+    for stack in samples:
+        engine.style(stack)
+    cold = time.time() - start
+
+    start = time.time()
+    engine.styles(queries)
+    warm = time.time() - start
+
+    print("%d rules (setup %.1fms)" % (rules, setup * 1000))
+    print("  %-28s %10.0f stacks/s" % ("uncached (%d distinct)" % distinct, distinct / cold))
+    print("  %-28s %10.0f stacks/s" % ("cached (%d queries)" % stacks, stacks / warm))
+
+
+def main(argv=None):
+    sizes = [int(arg) for arg in (argv or sys.argv[1:])] or [100, 1000, 10000]
+    for rules in sizes:
+        run(rules)
+
+
+if __name__ == '__main__':
+    main()
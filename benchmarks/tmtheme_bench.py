@@ -0,0 +1,65 @@
+"""Benchmark tmTheme to CSScheme conversion on large generated themes.
+
+Usage (from the directory containing the package, e.g. "Packages"):
+
+    python -m CSScheme.benchmarks.tmtheme_bench [ITEMS ...]
+"""
+
+import sys
+import timeit
+
+from ..converters import tmtheme
+from ..converters.reporters import ListReporter
+
+
+def generate_theme(items):
+    """Return the text of a tmTheme with `items` scope items (and the global one last)."""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<plist version="1.0">\n<dict>\n'
+             '\t<key>name</key>\n\t<string>Benchmark</string>\n'
+             '\t<key>settings</key>\n\t<array>\n']
+    for i in range(items):
+        parts.append('\t\t<dict>\n'
+                     '\t\t\t<key>name</key>\n\t\t\t<string>Item %d</string>\n'
+                     '\t\t\t<key>scope</key>\n\t\t\t<string>source.lang%d string.quoted</string>\n'
+                     '\t\t\t<key>settings</key>\n\t\t\t<dict>\n'
+                     '\t\t\t\t<key>foreground</key>\n\t\t\t\t<string>#%06X</string>\n'
+                     '\t\t\t\t<key>fontStyle</key>\n\t\t\t\t<string>italic</string>\n'
+                     '\t\t\t</dict>\n\t\t</dict>\n' % (i, i % 500, i * 2654435761 % 0xFFFFFF))
+    # Worst case for a scan for the global settings
+    parts.append('\t\t<dict>\n\t\t\t<key>settings</key>\n\t\t\t<dict>\n'
+                 '\t\t\t\t<key>background</key>\n\t\t\t\t<string>#000000</string>\n'
+                 '\t\t\t</dict>\n\t\t</dict>\n')
+    parts.append('\t</array>\n\t<key>uuid</key>\n'
+                 '\t<string>2e3af29f-ebee-431f-af96-72bda5d4c144</string>\n</dict>\n</plist>\n')
+    return ''.join(parts)
+
+
+def run(items, repeat=3):
+    text = generate_theme(items)
+    out = ListReporter()
+    data = tmtheme.load(text, "bench.tmTheme", out)
+
+    cases = [
+        ("to_csscheme (loaded data)",
+         lambda: tmtheme.to_csscheme(data, out, False)),
+        ("load + to_csscheme",
+         lambda: tmtheme.to_csscheme(tmtheme.load(text, "bench.tmTheme", out), out, False)),
+        ("iterparse + to_csscheme",
+         lambda: tmtheme.to_csscheme(tmtheme.iterparse(text, "bench.tmTheme", out), out, False)),
+    ]
+    print("%d items, %.1f KiB" % (items, len(text) / 1024.0))
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        print("  %-28s %8.2fms" % (name, best * 1000))
+    assert not out.chunks, out.getvalue()
+
+
+def main(argv=None):
+    sizes = [int(arg) for arg in (argv or sys.argv[1:])] or [10000, 50000]
+    for items in sizes:
+        run(items)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import re
+
+import sublime
+import sublime_plugin
+
+from .tinycsscheme.dumper import KNOWN_PROPERTIES, evaluate_color
+
+from .convert import settings
+from .validation import is_csscheme
+
+
+REGION_KEY = "csscheme-swatches"
+# Tag for the settings change listener
+SETTINGS_KEY = "csscheme-swatches"
+# How often to check whether the visible region of the active view changed
+POLL_INTERVAL = 150
+MAX_CACHED_LINES = 10000
+
+SWATCH_TEMPLATE = """
+<body id="csscheme-swatch">
+    <style>
+        span {{
+            border: 1px solid color(var(--foreground) alpha(0.5));
+            border-radius: 0.2rem;
+        }}
+    </style>
+    <span style="background-color: {0}">&nbsp;&nbsp;</span>
+</body>
+"""
+
+# A color property and its value up to the end of the declaration on the same line
+property_reg = re.compile(r"(?<![\w-])(?:%s)\s*:\s*([^;{}\n]*?)\s*(?=[;}]|$)"
+                          % "|".join(sorted(KNOWN_PROPERTIES['color'])),
+                          re.MULTILINE)
+
+# line text -> tuple of (column, color)
+_line_cache = {}
+# `loaded` is cleared by `plugin_unloaded` to stop polling with an outdated
+# module, `polling` is set while the timer is running
+_state = {'loaded': False, 'polling': False}
+
+
+def line_colors(text):
+    """Return `(column, color)` tuples for all color values in a line, cached per line."""
+    try:
+        return _line_cache[text]
+    except KeyError:
+        pass
+
+    colors = []
+    for m in property_reg.finditer(text):
+        color = evaluate_color(m.group(1))
+        if color:
+            colors.append((m.start(1), color))
+
+    if len(_line_cache) >= MAX_CACHED_LINES:
+        _line_cache.clear()
+    colors = _line_cache[text] = tuple(colors)
+    return colors
+
+
+def css_color(color):
+    """Convert a color hash to something minihtml understands, including alpha."""
+    if len(color) != 9:
+        return color
+    r, g, b, a = (int(color[i:i + 2], 16) for i in range(1, 9, 2))
+    return "rgba({0}, {1}, {2}, {3:.2f})".format(r, g, b, a / 255.0)
+
+
+def swatch_phantoms(view, region):
+    """Create swatch phantoms for all color values on the lines of `region`."""
+    phantoms = []
+    for line in view.lines(region):
+        for column, color in line_colors(view.substr(line)):
+            point = line.begin() + column
+            if view.match_selector(point, "comment"):
+                continue
+            phantoms.append(sublime.Phantom(sublime.Region(point),
+                                            SWATCH_TEMPLATE.format(css_color(color)),
+                                            sublime.LAYOUT_INLINE))
+    return phantoms
+
+
+class SwatchUpdater(object):
+
+    """Keeps the color swatches of the visible part of a view up to date.
+
+    Phantoms are only created for the visible region (plus one screen above and
+    below, so they are already there when scrolling a bit). Evaluated colors
+    are cached per line text, so only changed lines are scanned again.
+    """
+
+    # view id -> SwatchUpdater
+    instances = {}
+
+    def __init__(self, view):
+        self.view = view
+        self.phantom_set = sublime.PhantomSet(view, REGION_KEY)
+        self.state = None
+
+    @classmethod
+    def get(cls, view):
+        updater = cls.instances.get(view.id())
+        if updater is None:
+            updater = cls.instances[view.id()] = cls(view)
+        return updater
+
+    def update(self):
+        view = self.view
+        visible = view.visible_region()
+        state = (view.change_count(), visible.a, visible.b)
+        if state == self.state:
+            return
+        self.state = state
+
+        margin = visible.size()
+        region = sublime.Region(max(visible.begin() - margin, 0),
+                                min(visible.end() + margin, view.size()))
+        self.phantom_set.update(swatch_phantoms(view, region))
+
+    def clear(self):
+        self.phantom_set.update([])
+        self.state = None
+
+
+def update_active_view():
+    window = sublime.active_window()
+    view = window.active_view() if window else None
+    if view is not None and is_csscheme(view):
+        SwatchUpdater.get(view).update()
+
+
+def enabled():
+    return _state['loaded'] and settings().get("color_swatches", True)
+
+
+def poll():
+    # Stop when unloaded or disabled, `start_polling` is called again when
+    # the setting changes
+    if not enabled():
+        _state['polling'] = False
+        for updater in SwatchUpdater.instances.values():
+            updater.clear()
+        SwatchUpdater.instances.clear()
+        return
+    try:
+        update_active_view()
+    finally:
+        # Keep polling even if a view could not be updated
+        sublime.set_timeout(poll, POLL_INTERVAL)
+
+
+def start_polling():
+    if enabled() and not _state['polling']:
+        _state['polling'] = True
+        poll()
+
+
+def plugin_loaded():
+    if not hasattr(sublime, 'PhantomSet'):
+        return
+    _state['loaded'] = True
+    settings().add_on_change(SETTINGS_KEY, start_polling)
+    start_polling()
+
+
+def plugin_unloaded():
+    _state['loaded'] = False
+    settings().clear_on_change(SETTINGS_KEY)
+
+
+class CSSchemeSwatchListener(sublime_plugin.EventListener):
+
+    def on_activated(self, view):
+        if _state['polling']:
+            update_active_view()
+
+    def on_close(self, view):
+        SwatchUpdater.instances.pop(view.id(), None)
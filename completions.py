@@ -1,51 +1,212 @@
+import os
+import re
+
 import sublime
 import sublime_plugin
 
 
-from .tinycsscheme.dumper import CSSchemeDumper
-from .scope_data import COMPILED_HEADS
+from .tinycsscheme.css_colors import css_colors
+from .tinycsscheme.dumper import KNOWN_PROPERTIES, STYLE_LIST_VALUES, OPTIONS_LIST_VALUES
+from .tinycsscheme.incremental import IncrementalStylesheet
+from . import scope_data
+from .scope_data import harvest
 
-from .convert import status
+from .convert import PACKAGE, status, settings
 
 
-class CSSchemeCompletionListener(sublime_plugin.EventListener):
-    def __init__(self):
-        properties = set()
-        for l in CSSchemeDumper.known_properties.values():
-            properties |= l
+def plugin_loaded():
+    if settings().get("harvest_syntax_scopes", True):
+        sublime.set_timeout_async(harvest_scopes, 0)
+
+
+def harvest_scopes():
+    """Add the scope names of all installed syntax definitions to the completions."""
+    roots = [sublime.packages_path(),
+             sublime.installed_packages_path(),
+             os.path.join(os.path.dirname(sublime.executable_path()), "Packages")]
+    index = harvest.ScopeIndex(os.path.join(sublime.cache_path(), "CSScheme",
+                                            "scope_index.json"))
+    try:
+        index.update(roots)
+    except (OSError, IOError) as e:
+        status("Unable to harvest scopes from syntax definitions", str(e))
+        return
+    scopes = index.scopes()
+    # Modify the nodes on the main thread, where completions are queried
+    sublime.set_timeout(lambda: scope_data.add_scopes(scopes), 0)
+
+
+# Completions are built once and shared between calls, don't modify them
+PROPERTY_COMPLETIONS = sorted(
+    ("{0}\t{0}:".format(s), s + ": $1;$0")
+    for s in set().union(*(KNOWN_PROPERTIES[k] for k in ('color', 'integer', 'list')))
+)
+
+
+def _value_completions(values, kind):
+    return sorted(("{0}\t{1}".format(v, kind), v) for v in values)
+
+
+COLOR_COMPLETIONS = _value_completions(css_colors, "color")
+
+# Property type -> static completions for values
+VALUE_COMPLETIONS = {
+    'color': COLOR_COMPLETIONS,
+    'style_list': _value_completions(STYLE_LIST_VALUES, "style"),
+    'options_list': _value_completions(OPTIONS_LIST_VALUES, "option"),
+}
+
+# Property name -> property type
+PROPERTY_TYPES = dict((name, kind) for kind in VALUE_COMPLETIONS
+                      for name in KNOWN_PROPERTIES[kind])
+
+# The property name before the cursor, if it is in a value
+property_reg = re.compile(r"([a-zA-Z_-]+)\s*:[^:;{}]*$")
+
 
-        self.property_completions = list(("{0}\t{0}:".format(s), s + ": $1;$0")
-                                         for s in properties)
+class ViewStylesheet(object):
 
-    def get_scope(self, view, l):
+    """The incrementally parsed stylesheet of a view and completions derived from it.
+
+    Only updated when the view changed since the last query.
+    """
+
+    def __init__(self):
+        self.change_count = None
+        self.sheet = IncrementalStylesheet()
+        self.value_completions = {}
+
+    def update(self, view):
+        change_count = view.change_count()
+        if change_count != self.change_count:
+            # This runs on the main thread, so keep the last good state (the
+            # sheet is only modified once a whole update succeeded) and try
+            # again after the next modification instead of raising
+            self.change_count = change_count
+            try:
+                self.sheet.update(view.substr(sublime.Region(0, view.size())))
+            except Exception as e:
+                print("[%s] Could not update the stylesheet for completions: %r"
+                      % (PACKAGE, e))
+                return
+            self.value_completions.clear()
+
+    def get_value_completions(self, kind):
+        """Return values used in the scheme ranked by frequency, then the static ones."""
+        try:
+            return self.value_completions[kind]
+        except KeyError:
+            pass
+        counts = self.sheet.value_counts(KNOWN_PROPERTIES[kind])
+        used = [("{0}\tused {1}x".format(value, count), value)
+                for value, count in counts.most_common()]
+        static = [c for c in VALUE_COMPLETIONS[kind] if c[1] not in counts]
+        result = self.value_completions[kind] = (used + static,
+                                                 sublime.INHIBIT_WORD_COMPLETIONS)
+        return result
+
+
+class CompletionContext(object):
+
+    """The line text before and the scope at every cursor.
+
+    Fetches each line only once, no matter how many cursors are on it, and
+    evaluates selectors once per distinct scope instead of once per cursor.
+    """
+
+    def __init__(self, view, locations):
+        self.view = view
+        self.locations = locations
+        self.prefixes = []
+        self.scopes = set()
+        self._matches = {}
+
+        line = None
+        text = ""
+        for l in locations:
+            if line is None or not line.begin() <= l <= line.end():
+                line = view.line(l)
+                text = view.substr(line)
+            self.prefixes.append(text[:l - line.begin()])
+            self.scopes.add(view.scope_name(l))
+
+    def match(self, selector):
+        """Whether `selector` matches at all cursors."""
+        try:
+            return self._matches[selector]
+        except KeyError:
+            pass
+        result = self._matches[selector] = all(sublime.score_selector(scope, selector) > 0
+                                               for scope in self.scopes)
+        return result
+
+    def scope_prefix(self):
+        """Return the scope name typed so far if it is the same at all cursors."""
         # Do some string math (instead of regex because fastness)
-        _, col = view.rowcol(l)
-        begin  = view.line(l).begin()
-        line   = view.substr(sublime.Region(begin, l))
-        scope  = line.rsplit(' ', 1)[-1]
-        return scope.lstrip('-')
+        prefixes = set(prefix.rsplit(' ', 1)[-1].lstrip('-') for prefix in self.prefixes)
+        if len(prefixes) == 1:
+            return prefixes.pop()
+
+
+class CSSchemeCompletionListener(sublime_plugin.EventListener):
+    # (head completions, combined with the property completions)
+    _scss_heads = (None, None)
+    # view id -> ViewStylesheet
+    stylesheets = {}
+
+    def scss_completions(self):
+        heads = scope_data.completions('')
+        if self._scss_heads[0] is not heads:
+            # The head completions are replaced when scopes were harvested
+            self._scss_heads = (heads, PROPERTY_COMPLETIONS + heads)
+        return self._scss_heads[1]
+
+    def value_completions(self, view, context):
+        names = set()
+        for prefix in set(context.prefixes):
+            m = property_reg.search(prefix)
+            names.add(m and m.group(1))
+        if len(names) != 1:
+            return
+        kind = PROPERTY_TYPES.get(names.pop())
+        if not kind:
+            return
+
+        stylesheet = self.stylesheets.get(view.id())
+        if stylesheet is None:
+            stylesheet = self.stylesheets[view.id()] = ViewStylesheet()
+        stylesheet.update(view)
+        return stylesheet.get_value_completions(kind)
+
+    def on_close(self, view):
+        self.stylesheets.pop(view.id(), None)
 
     def on_query_completions(self, view, prefix, locations):
         # Provide a selection of naming convention from TextMate and/or property names
+        # Bail out cheaply for other syntaxes before collecting per-cursor data
+        if not view.match_selector(locations[0], "source.csscheme"):
+            return
 
-        def match_sel(sel):
-            return all(view.match_selector(l, sel) for l in locations)
+        context = CompletionContext(view, locations)
+        match_sel = context.match
 
         # Check context
         if not match_sel("source.csscheme - comment - string - variable"):
             return
 
+        if match_sel("meta.property"):
+            return self.value_completions(view, context)
+
         if match_sel("meta.ruleset"):
             # No nested rulesets for CSS
-            return self.property_completions
+            return PROPERTY_COMPLETIONS
 
         if not match_sel("meta.selector, meta.property_list - meta.property"):
             return
 
-        scope = self.get_scope(view, locations[0])
-
         # We can't work with different prefixes
-        if any(self.get_scope(view, l) != scope for l in locations):
+        scope = context.scope_prefix()
+        if scope is None:
             return
 
         # Tokenize the current selector (only to the cursor)
@@ -54,28 +215,27 @@ class CSSchemeCompletionListener(sublime_plugin.EventListener):
         if len(tokens) > 1:
             del tokens[-1]  # The last token is either incomplete or empty
 
-            # Browse the nodes and their children
-            nodes = COMPILED_HEADS
-            for i, token in enumerate(tokens):
-                node = nodes.find(token)
+            # Look up the children of the full path directly
+            result = scope_data.completions('.'.join(tokens))
+            if result:
+                return (result, sublime.INHIBIT_WORD_COMPLETIONS)
+
+            # Find out why for the status message
+            for i in range(len(tokens)):
+                node = scope_data.find_path('.'.join(tokens[:i + 1]))
                 if not node:
                     status("Warning: `%s` not found in scope naming conventions"
                            % '.'.join(tokens[:i + 1]))
                     break
-                nodes = node.children
-                if not nodes:
+                if not node.children:
                     break
-
-            if nodes and node:
-                return (nodes.to_completion(), sublime.INHIBIT_WORD_COMPLETIONS)
-            else:
-                status("No nodes available in scope naming conventions after `%s`"
-                       % '.'.join(tokens))
-                return  # Should I inhibit here?
+            status("No nodes available in scope naming conventions after `%s`"
+                   % '.'.join(tokens))
+            return  # Should I inhibit here?
 
         # Triggered completion on whitespace:
         elif match_sel("source.csscheme.scss"):
             # For SCSS just return all the head nodes + property completions
-            return self.property_completions + COMPILED_HEADS.to_completion()
+            return self.scss_completions()
         else:
-            return COMPILED_HEADS.to_completion()
+            return scope_data.completions('')
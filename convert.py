@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 
 import sublime
 
@@ -8,8 +10,6 @@ from .my_sublime_lib import WindowAndTextCommand
 from .my_sublime_lib.path import file_path_tuple
 from .my_sublime_lib.view import OutputPanel, get_text, set_text
 
-from .tinycsscheme import parser, dumper
-
 from . import converters
 from .converters import tmtheme
 
@@ -18,7 +18,6 @@ from .converters import tmtheme
 
 
 PACKAGE = __package__
-DEBUG = False
 
 
 def settings():
@@ -35,6 +34,10 @@ def status(msg, printonly=""):
     print("[%s] %s" % (PACKAGE, msg))
 
 
+def plugin_unloaded():
+    converters.worker.shutdown_workers()
+
+
 ###############################################################################
 
 
@@ -48,98 +51,93 @@ class convert_csscheme(WindowAndTextCommand):  # noqa
         path = self.view.file_name()
         return bool(path) and any(conv.valid_file(path) for conv in converters.all)
 
+    # The currently running build as a (thread, cancellation) tuple
+    current_build = None
+    build_lock = threading.Lock()
+
     def run(self, edit=None):
         if self.view.is_dirty():
             return status("Save the file first.")
 
-        self.preview_opened = False
+        window = self.view.window()
         in_file = self.view.file_name()
+        executables = settings().get("executables", {})
+        servers = sublime.expand_variables(settings().get("compiler_servers", {}),
+                                           window.extract_variables())
+
+        # Build on a separate thread to not block the UI. A new build cancels
+        # the previous one and waits for it to finish.
+        cls = convert_csscheme
+        with cls.build_lock:
+            previous = cls.current_build
+            if previous:
+                previous[1].cancel()
+            cancel = converters.Cancellation()
+            thread = threading.Thread(target=self.build,
+                                      args=(window, in_file, executables, servers, cancel,
+                                            previous and previous[0],
+                                            settings().get("minimize_output", False)))
+            cls.current_build = (thread, cancel)
+            thread.start()
+
+    def build(self, window, in_file, executables, servers, cancel, previous_thread,
+              minimize):
+        if previous_thread:
+            previous_thread.join()
+        if cancel.cancelled:
+            return
+
         in_tuple = file_path_tuple(in_file)
-        ext = '.tmTheme'
+        start = time.time()
 
         # Open up output panel and auto-finalize it when we are done
-        with OutputPanel(self.view.window(), "csscheme") as out:
-
-            # Determine our converter
-            conv = tuple(c for c in converters.all if c.valid_file(in_file))
-            if len(conv) > 1:
-                out.write_line("Found multiple contenders for conversion.\n"
-                               "If this happened to you, please tell the developer "
-                               "(me) to add code for this case. Thanks.")
-                return
-            elif not conv:
-                out.write_line("Couldn't match extension against a known converter.\n"
-                               "Known extensions are: %s"
-                               % ', '.join("." + c.ext for c in converters.all))
-                return
-            conv = conv[0]
-
+        with OutputPanel(window, "csscheme") as out:
             out.set_path(in_tuple.path)
-            executables = settings().get("executables", {})
+            out.show()
+            out.write_line("Building %s" % in_tuple.file_name)
 
-            # Run converter
-            text = conv.convert(out, in_file, executables)
-            if not text:
-                return
-
-            # Preview converted css for debugging, optionally
-            self.previewed = not settings().get('preview_compiled_css')
+            def progress(msg):
+                out.write_line("%s..." % msg)
 
-            def preview_compiled_css():
-                if not self.previewed:
-                    self.preview_compiled_css(text, conv, in_tuple.base_name)
-                    self.previewed = True
-
-            # Parse the CSS
-            stylesheet = parser.parse_stylesheet(text)
-
-            # Do some awesome error printing action
-            if stylesheet.errors:
-                conv.report_parse_errors(out, in_file, text, stylesheet.errors)
-                preview_compiled_css()
-                return
-            elif not stylesheet.rules:
-                # The CSS seems to be ... empty?
-                out.write_line("No CSS data was found")
+            try:
+                result = converters.build(out, in_file, executables, servers,
+                                          cancel, progress, minimize)
+            except converters.BuildCancelled:
+                out.write_line("[Cancelled]")
                 return
 
-            # Check for "hidden" at-rule
-            for i, r in enumerate(stylesheet.rules):
-                if not r.at_keyword or r.at_keyword.strip('@') != 'hidden':
-                    continue
-                if parser.strvalue(r.value) == 'true':
-                    ext = '.hidden-tmTheme'
-                    del stylesheet.rules[i]
-                    break
-                else:
-                    e = dumper.DumpError(r, "Unrecognized value for 'hidden' "
-                                            "at-rule, expected 'true'")
-                    conv.report_dump_error(out, in_file, text, e)
-                    preview_compiled_css()
-                    return
-
-            # Dump CSS data as plist into out_file
-            out_file = in_tuple.no_ext + ext
+            if result.success:
+                out.write_line("[Finished in %.2fs]" % (time.time() - start))
+            out.write_line()
+            for line in result.report.format():
+                out.write_line(line)
+
+        log_file = settings().get('build_report_log')
+        if log_file:
             try:
-                dumper.dump_stylesheet_file(out_file, stylesheet)
-            except dumper.DumpError as e:
-                conv.report_dump_error(out, in_file, text, e)
-                if DEBUG:
-                    import traceback
-                    traceback.print_exc()
-                preview_compiled_css()
-                return
+                converters.report.append_log(os.path.expanduser(log_file),
+                                             [result.report.to_dict()])
+            except OSError as e:
+                status("Unable to write build report", str(e))
+
+        if not result.success:
+            # Preview converted css for debugging, optionally
+            if result.css_errors and settings().get('preview_compiled_css'):
+                sublime.set_timeout(lambda: self.preview_compiled_css(window, result.text,
+                                                                      result.conv,
+                                                                      in_tuple.base_name), 0)
+            return
 
         status("Build successful")
         # Open out_file
         if settings().get('open_after_build'):
-            self.view.window().open_file(out_file)
+            sublime.set_timeout(lambda: window.open_file(result.out_file), 0)
 
-    def preview_compiled_css(self, text, conv, base_name):
+    def preview_compiled_css(self, window, text, conv, base_name):
         if conv.ext == 'csscheme':
             return
 
-        v = self.view.window().new_file()
+        v = window.new_file()
         v.set_scratch(True)
         v.set_syntax_file("Packages/%s/Package/CSScheme.tmLanguage" % PACKAGE)
         v.set_name("Preview: %s.csscheme" % base_name)
@@ -156,9 +154,9 @@ class convert_tmtheme(WindowAndTextCommand):  # noqa
         return bool(path and (path.endswith(".tmTheme")
                               or path.endswith(".hidden-tmTheme")))
 
-    def run(self, edit=None, overwrite=False, skip_names=False):
+    def run(self, edit=None, overwrite=False, skip_names=False, optimize=False, scss=False):
         path = self.view.file_name()
-        new_path = os.path.splitext(path)[0] + '.csscheme'
+        new_path = os.path.splitext(path)[0] + ('.scsscheme' if scss else '.csscheme')
 
         if not overwrite and os.path.exists(new_path):
             if not sublime.ok_cancel_dialog("The file %s already exists.\n"
@@ -167,14 +165,11 @@ class convert_tmtheme(WindowAndTextCommand):  # noqa
                 return
 
         with OutputPanel(self.view.window(), "csscheme_tmtheme") as out:
-            # Load the tmTheme file
-            data = tmtheme.load(get_text(self.view), path, out)
-            if not data:
-                return
-
-            # Convert
-            csscheme = tmtheme.to_csscheme(data, out, skip_names,
-                                           hidden=path.endswith(".hidden-tmTheme"))
+            # Load the tmTheme file and convert while parsing
+            events = tmtheme.iterparse(get_text(self.view), path, out)
+            csscheme = tmtheme.to_csscheme(events, out, skip_names,
+                                           hidden=path.endswith(".hidden-tmTheme"),
+                                           optimize=optimize, scss=scss)
             if not csscheme:
                 return
 
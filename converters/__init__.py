@@ -1,12 +1,26 @@
-"""Provides various to-csscheme converters."""
+"""Provides various to-csscheme converters.
 
+Nothing in here depends on Sublime Text. Output is written to a reporter, which
+is either an OutputPanel or one of the classes in `.reporters`.
+"""
+
+import bisect
 import re
 import os
+import signal
 import subprocess
+import threading
+
+from ..tinycsscheme import parser, dumper, minimizer
+
+from . import worker
+from .cache import compile_cache, find_imports, hash_files
+from .report import BuildReport
 
-import sublime
+DEBUG = False
 
-__all__ = ('all', 'CSSConverter', 'SCSSConverter', 'SASSConverter', 'StylusConverter')
+__all__ = ('all', 'CSSConverter', 'SCSSConverter', 'SASSConverter', 'StylusConverter',
+           'find_converter', 'build', 'BuildResult', 'Cancellation', 'BuildCancelled', 'LineMap')
 
 
 def swap_path_line(pattern, rel_dir):
@@ -32,6 +46,121 @@ def swap_path_line(pattern, rel_dir):
     return repl
 
 
+def kill_process_tree(process):
+    """Kill `process` and its children, e.g. when a shell or wrapper script was started.
+
+    The process must have been started with `start_new_session=True` on POSIX.
+    """
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.call(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+
+
+class LineMap(object):
+
+    """Index of the line number comments in compiled CSS.
+
+    Pre-processors emit comments like `/* line 12, path/to/file.scss */` before
+    each ruleset. They are indexed once, so every line of the compiled CSS can
+    be mapped to the last comment before it with a binary search.
+
+    * source - the compiled CSS
+    * lineno_reg - regex matching a comment with line number and path in groups 1 and 2
+    * in_dir - directory to make paths relative to
+    """
+
+    # Only show up to this many lines before an error
+    max_context = 20
+
+    def __init__(self, source, lineno_reg, in_dir):
+        self.lines = source.split('\n')
+        self.lineno_reg = lineno_reg
+        self.in_dir = in_dir
+        # Indices of lines with a comment
+        self.indices = []
+        self._swapped = {}
+
+        for i, line in enumerate(self.lines):
+            if '/*' not in line:
+                continue
+            m = lineno_reg.match(line, len(line) - len(line.lstrip()))
+            if m:
+                self.indices.append(i)
+
+    def _find(self, lineno):
+        """Return the position of the last comment at or before 1-based `lineno` or -1."""
+        return bisect.bisect_right(self.indices, lineno - 1) - 1
+
+    def context(self, lineno):
+        """Return the lines from the last comment up to 1-based `lineno`.
+
+        The comment has its path and line swapped so that Sublime can parse it.
+        If there is no comment within `max_context` lines, only the line itself
+        is returned.
+        """
+        index = lineno - 1
+        pos = self._find(lineno)
+        start = self.indices[pos] if pos >= 0 else None
+        if start is None or index - start >= self.max_context:
+            return self.lines[max(index, 0):index + 1]
+
+        if start not in self._swapped:
+            # Swap line and path because sublime can't parse them otherwise
+            self._swapped[start] = self.lineno_reg.sub(
+                swap_path_line("/* %s, line %s */", self.in_dir), self.lines[start])
+        return [self._swapped[start]] + self.lines[start + 1:index + 1]
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+class Cancellation(object):
+
+    """Allows cancelling a conversion or build from a different thread.
+
+    Callbacks registered with `on_cancel` are called when `cancel` is, e.g. to
+    kill a running pre-processor.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Register `callback`, or call it immediately if already cancelled."""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def check(self):
+        """Raise `BuildCancelled` if cancelled."""
+        if self.cancelled:
+            raise BuildCancelled()
+
+
 class BaseConverter(object):
 
     """abstract base class."""
@@ -40,6 +169,10 @@ class BaseConverter(object):
     ext = ""
     default_executable = ""
     cmd_params = ()
+    # Regex for import statements with the imported names in the "names" group
+    import_reg = None
+    # Extensions to try when resolving imports
+    import_exts = ()
 
     @classmethod
     def valid_file(cls, file_path):
@@ -50,12 +183,15 @@ class BaseConverter(object):
         return file_path.endswith('.' + cls.ext)
 
     @classmethod
-    def convert(cls, out, file_path, executables):
+    def convert(cls, out, file_path, executables, servers=None, cancel=None):
         """Convert the specified file to CSScheme and return as string.
 
-        * out - output panel to write output to
+        * out - reporter to write output to, see `.reporters`
         * file_path - file to convert
         * executables - dict with optional path settings
+        * servers - dict with optional commands for persistent compiler
+                    servers, see `.worker`
+        * cancel - optional `Cancellation`; raises `BuildCancelled` when triggered
         """
         # Just read the file when we have no executable
         if not cls.default_executable:
@@ -66,10 +202,99 @@ class BaseConverter(object):
                 out.write_line("Error reading %s:\n%s" % (file_path, e))
                 return
 
+        # Use the cached result if no file in the import graph changed
+        executable = cls.resolve_executable(executables)
+        server_cmd = (servers or {}).get(cls.default_executable)
+        cache_key = (cls.name, os.path.abspath(file_path), executable,
+                     server_cmd and tuple(server_cmd), cls.cmd_params)
+        result = compile_cache.get(cache_key)
+
+        if result is None:
+            # Hash the import graph before compiling, so files saved while the
+            # pre-processor runs invalidate the result
+            imports = cls.find_imports(file_path)
+            hashes = hash_files(imports)
+
+            if server_cmd:
+                server = worker.get_worker(server_cmd)
+                if cancel:
+                    # Killing the server is the only way to abort; it is restarted on demand
+                    cancel.on_cancel(server.stop)
+                try:
+                    result = server.compile(file_path, cls.cmd_params)
+                except worker.WorkerError as e:
+                    if cancel:
+                        cancel.check()
+                    # Fall back to running the executable directly
+                    out.write_line("Compiler server unavailable, running %s directly: %s"
+                                   % (executable, e))
+                finally:
+                    if cancel:
+                        cancel.remove(server.stop)
+
+            if result is None:
+                result = cls.run_executable(out, file_path, executables, cancel)
+                if result is None:
+                    return
+
+            if not result[0] and result[1]:
+                compile_cache.put(cache_key, cls.find_dependencies(file_path, result[1], imports),
+                                  result, hashes)
+
+        returncode, stdout, stderr = result
+
+        # Process results
+        if returncode:
+            cls.report_convert_errors(out, file_path, returncode, stderr)
+        elif not stdout:
+            out.write_line("Unexpected error converting from %s to CSS:\nNo output"
+                           % cls.name)
+        else:
+            # e.g. "warn(msg)" in stylus
+            if stderr:
+                out.write_line(stderr)
+            return stdout
+
+    @classmethod
+    def resolve_executable(cls, executables):
+        """Return the executable to run, which may be overridden in `executables`."""
+        return executables.get(cls.default_executable, cls.default_executable)
+
+    @classmethod
+    def find_imports(cls, file_path):
+        """Return the set of files `file_path` (recursively) imports, including itself."""
+        if cls.import_reg:
+            return find_imports(file_path, cls.import_reg, cls.import_exts)
+        return set([os.path.abspath(file_path)])
+
+    @classmethod
+    def find_dependencies(cls, file_path, compiled, imports=None):
+        """Return the set of files that `compiled` was built from.
+
+        Combines the files mentioned in line number comments of the output
+        with the (recursively) imported files, since partials that only define
+        variables or mixins don't show up in the output. Pass `imports` if
+        they were already collected with `find_imports`.
+        """
+        deps = set(imports) if imports is not None else cls.find_imports(file_path)
+
+        lineno_reg = getattr(cls, 'lineno_reg', None)
+        if lineno_reg:
+            in_dir = os.path.dirname(file_path)
+            for path in set(m.group(2) for m in lineno_reg.finditer(compiled)):
+                if not os.path.isabs(path) and not os.path.isfile(path):
+                    path = os.path.join(in_dir, path)
+                deps.add(os.path.abspath(path))
+        return deps
+
+    @classmethod
+    def run_executable(cls, out, file_path, executables, cancel=None):
+        """Run the pre-processor once and return a `(returncode, stdout, stderr)` tuple.
+
+        The process is killed when `cancel` is triggered.
+        """
         # Construct command
-        executable = cls.default_executable
-        if cls.default_executable in executables:
-            executable = executables[cls.default_executable]
+        executable = cls.resolve_executable(executables)
         cmd = (executable,) + cls.cmd_params + (file_path,)
 
         try:
@@ -77,25 +302,27 @@ class BaseConverter(object):
             process = subprocess.Popen(cmd,
                                        stdout=subprocess.PIPE,
                                        stderr=subprocess.PIPE,
-                                       shell=sublime.platform() == 'windows',
-                                       universal_newlines=True)
-            stdout, stderr = process.communicate()
+                                       shell=os.name == 'nt',
+                                       universal_newlines=True,
+                                       start_new_session=os.name != 'nt')
         except Exception as e:
             out.write_line("Error converting from %s to CSScheme:\n"
                            "%s: %s" % (cls.name, e.__class__.__name__, e))
             return
 
-        # Process results
-        if process.returncode:
-            cls.report_convert_errors(out, file_path, process.returncode, stderr)
-        elif not stdout:
-            out.write_line("Unexpected error converting from %s to CSS:\nNo output"
-                           % cls.name)
-        else:
-            # e.g. "warn(msg)" in stylus
-            if stderr:
-                out.write_line(stderr)
-            return stdout
+        def kill():
+            kill_process_tree(process)
+
+        if cancel:
+            cancel.on_cancel(kill)
+        try:
+            stdout, stderr = process.communicate()
+        finally:
+            if cancel:
+                cancel.remove(kill)
+                cancel.check()
+
+        return process.returncode, stdout, stderr
 
     @classmethod
     def report_convert_errors(cls, out, file_path, returncode, stderr):
@@ -136,6 +363,8 @@ class SCSSConverter(BaseConverter):
     ext = "scsscheme"
     default_executable = "sass"
     cmd_params = ('--line-numbers', '--no-cache', '--scss')
+    import_reg = re.compile(r"@import\s+(?P<names>[^;]+)", re.M)
+    import_exts = ('.scss', '.sass', '.css', '.scsscheme', '.sasscheme')
 
     @classmethod
     def report_convert_errors(cls, out, file_path, returncode, stderr):
@@ -159,12 +388,11 @@ class SCSSConverter(BaseConverter):
         # Match our modified output
         out.set_regex(r"^\s*/\* (.*?), line (\d+) \*/")
 
-        lines = source.split('\n')
+        line_map = LineMap(source, cls.lineno_reg, in_dir)
         for e in errors:
             out.write_line("ParseError from CSS on line %d:" % e.line)
 
-            printlines = cls.get_lines_till_last_lineno(lines, e.line, in_dir)
-            for l in printlines:
+            for l in line_map.context(e.line):
                 out.write_line("  " + l)
             # Mark the column where the error happened (since we don't have source code)
             out.write_line("  %s^" % ('-' * (e.column - 1)))
@@ -177,11 +405,10 @@ class SCSSConverter(BaseConverter):
         # Match our modified output
         out.set_regex(r"^\s*/\* (.*?), line (\d+) \*/")
 
-        lines = source.split('\n')
+        line_map = LineMap(source, cls.lineno_reg, in_dir)
         out.write_line("Error in CSScheme data on line %d:" % e.line)
 
-        printlines = cls.get_lines_till_last_lineno(lines, e.line, in_dir)
-        for l in printlines:
+        for l in line_map.context(e.line):
             out.write_line("  " + l)
         # Mark the column where the error happened (since we don't have source code)
         out.write_line("  %s^" % ('-' * (e.column - 1)))
@@ -189,36 +416,6 @@ class SCSSConverter(BaseConverter):
 
     lineno_reg = re.compile(r"/\* line (\d+), (.+?) \*/", re.M)
 
-    @classmethod
-    def get_lines_till_last_lineno(cls, lines, lineno, in_dir):
-        printlines = []
-
-        # Search for last known line number (max 20)
-        start_dump = 0
-        for i in range(lineno, lineno - 20, -1):
-            if i < 0:
-                break
-            m = re.match(r"\s*/\* line (\d+)", lines[i])
-            if not m:
-                continue
-
-            start_dump = i
-            # Swap line and path because sublime can't parse them otherwise
-            printlines.append(
-                cls.lineno_reg.sub(swap_path_line("/* %s, line %s */", in_dir), lines[i])
-            )
-            break
-
-        if not start_dump:
-            # Nothing found in the past lines => only store the erroneous line
-            start_dump = lineno - 2
-
-        # printlines.extend(lines[start_dump + 1:lineno])
-        for i in range(start_dump + 1, lineno):
-            printlines.append(lines[i])
-
-        return printlines
-
 
 class SASSConverter(SCSSConverter):
 
@@ -227,6 +424,7 @@ class SASSConverter(SCSSConverter):
     name = "SASScheme"
     ext = "sasscheme"
     cmd_params = SCSSConverter.cmd_params[:-1]
+    import_reg = re.compile(r"@import\s+(?P<names>[^;\n]+)", re.M)
 
 
 class StylusConverter(SCSSConverter):
@@ -237,6 +435,8 @@ class StylusConverter(SCSSConverter):
     ext = "styluscheme"
     default_executable = "stylus"
     cmd_params = ('-l', '-p')
+    import_reg = re.compile(r"@(?:import|require)\s+(?P<names>[^;\n]+)", re.M)
+    import_exts = ('.styl', '.css', '.styluscheme')
 
     lineno_reg = re.compile(r"/\* line (\d+) : (.+?) \*/", re.M)
 
@@ -249,3 +449,139 @@ class StylusConverter(SCSSConverter):
 
 # For exporting
 all = (CSSConverter, SCSSConverter, SASSConverter, StylusConverter)
+
+
+###############################################################################
+
+
+def find_converter(out, file_path):
+    """Determine the converter for `file_path` or write an error and return `None`."""
+    conv = tuple(c for c in all if c.valid_file(file_path))
+    if len(conv) > 1:
+        out.write_line("Found multiple contenders for conversion.\n"
+                       "If this happened to you, please tell the developer "
+                       "(me) to add code for this case. Thanks.")
+        return
+    elif not conv:
+        out.write_line("Couldn't match extension against a known converter.\n"
+                       "Known extensions are: %s"
+                       % ', '.join("." + c.ext for c in all))
+        return
+    return conv[0]
+
+
+class BuildResult(object):
+
+    """The outcome of `build`.
+
+    * conv - the converter class used, if any
+    * text - the (compiled) CSScheme source, if conversion succeeded
+    * out_file - path of the written tmTheme file, if the build succeeded
+    * css_errors - whether the build failed because of errors in the CSScheme source
+    * report - a `.report.BuildReport` with timings and counts
+    """
+
+    def __init__(self, conv=None, text=None, out_file=None, css_errors=False, report=None):
+        self.conv = conv
+        self.text = text
+        self.out_file = out_file
+        self.css_errors = css_errors
+        self.report = report
+
+    @property
+    def success(self):
+        return self.out_file is not None
+
+
+def build(out, in_file, executables, servers=None, cancel=None, progress=None,
+          minimize=False):
+    """Convert a *Scheme file into a .tmTheme (or .hidden-tmTheme) file next to it.
+
+    Does not depend on Sublime Text, so it can be used headless.
+
+    * out - reporter to write output to, see `.reporters`
+    * in_file - the file to build
+    * executables - dict with optional path settings
+    * servers - dict with optional compiler server commands
+    * cancel - optional `Cancellation`, raises `BuildCancelled` when triggered
+               between stages (and kills the pre-processor)
+    * progress - optional callable that is passed a message for each stage
+    * minimize - whether to remove redundant settings from the output, see
+                 `tinycsscheme.minimizer`
+    """
+    report = BuildReport(in_file)
+    result = BuildResult(report=report)
+
+    def stage(name, msg=None):
+        if cancel:
+            cancel.check()
+        if progress and msg:
+            progress(msg)
+        return report.timed(name)
+
+    conv = result.conv = find_converter(out, in_file)
+    if not conv:
+        return result
+
+    # Run converter
+    with stage('preprocess', conv.default_executable
+               and "Compiling with %s" % conv.default_executable):
+        text = result.text = conv.convert(out, in_file, executables, servers, cancel)
+    if not text:
+        return result
+
+    # Parse the CSS
+    with stage('parse', "Parsing"):
+        stylesheet = parser.parse_stylesheet(text)
+    report.count_stylesheet(stylesheet)
+
+    # Do some awesome error printing action
+    if stylesheet.errors:
+        conv.report_parse_errors(out, in_file, text, stylesheet.errors)
+        result.css_errors = True
+        return result
+    elif not stylesheet.rules:
+        # The CSS seems to be ... empty?
+        out.write_line("No CSS data was found")
+        return result
+
+    # Check for "hidden" at-rule
+    ext = '.tmTheme'
+    with stage('hidden'):
+        for i, r in enumerate(stylesheet.rules):
+            if not r.at_keyword or r.at_keyword.strip('@') != 'hidden':
+                continue
+            if parser.strvalue(r.value) == 'true':
+                ext = '.hidden-tmTheme'
+                del stylesheet.rules[i]
+                break
+            else:
+                e = dumper.DumpError(r, "Unrecognized value for 'hidden' "
+                                        "at-rule, expected 'true'")
+                conv.report_dump_error(out, in_file, text, e)
+                result.css_errors = True
+                return result
+
+    # Dump CSS data as plist into out_file
+    out_file = os.path.splitext(in_file)[0] + ext
+    try:
+        with stage('datafy', "Converting"):
+            data = dumper.datafy_stylesheet(stylesheet)
+    except dumper.DumpError as e:
+        conv.report_dump_error(out, in_file, text, e)
+        if DEBUG:
+            import traceback
+            traceback.print_exc()
+        result.css_errors = True
+        return result
+
+    if minimize:
+        with stage('minimize', "Minimizing"):
+            data = minimizer.minimize(data)
+
+    with stage('write', "Writing %s" % os.path.basename(out_file)):
+        dumper.write_plist_file(out_file, data)
+
+    result.out_file = out_file
+    report.success = True
+    return result
@@ -0,0 +1,264 @@
+"""Convert many *Scheme files to tmTheme in parallel, without Sublime Text.
+
+Usage (from the directory containing the package, e.g. "Packages"):
+
+    python -m CSScheme.converters [options] PATH [PATH ...]
+
+Each PATH may be a file, a directory (searched recursively) or a glob pattern.
+With --watch, schemes are rebuilt whenever they or a file they import change.
+With --from-tmtheme, tmTheme files are converted to CSScheme instead.
+"""
+
+import argparse
+import fnmatch
+import glob
+import os
+import shlex
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import all as all_converters, build, tmtheme
+from .report import append_log
+from .reporters import ListReporter, StreamReporter
+
+__all__ = ('collect_files', 'convert_files', 'convert_tmtheme_files', 'main')
+
+TMTHEME_PATTERNS = ('*.tmTheme', '*.hidden-tmTheme')
+
+
+def collect_files(paths, patterns=None):
+    """Expand files, directories and glob patterns into a sorted list of scheme files.
+
+    Directories are searched recursively for files matching any of `patterns`
+    (defaults to the extensions of all known converters).
+    """
+    if patterns is None:
+        patterns = tuple('*.' + c.ext for c in all_converters)
+
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for name in files:
+                    if any(fnmatch.fnmatch(name, p) for p in patterns):
+                        found.add(os.path.join(root, name))
+        elif os.path.isfile(path):
+            found.add(path)
+        else:
+            found.update(p for p in glob.glob(path) if os.path.isfile(p))
+
+    return sorted(os.path.abspath(p) for p in found)
+
+
+def _convert_one(path, executables, servers, minimize):
+    out = ListReporter()
+    start = time.time()
+    report = None
+    try:
+        result = build(out, path, executables, servers, minimize=minimize)
+    except Exception as e:
+        out.write_line("Unexpected %s: %s" % (e.__class__.__name__, e))
+        out_file = None
+    else:
+        out_file = result.out_file
+        report = result.report.to_dict()
+    return path, out_file, time.time() - start, out.getvalue(), report
+
+
+def _convert_tmtheme_one(path, skip_names, overwrite, optimize, scss):
+    out = ListReporter()
+    start = time.time()
+    new_path = os.path.splitext(path)[0] + ('.scsscheme' if scss else '.csscheme')
+    out_file = None
+    try:
+        if not overwrite and os.path.exists(new_path):
+            out.write_line("%s already exists, use --overwrite to replace it" % new_path)
+        else:
+            # Stream from the tmTheme into a temporary file
+            tmp_path = new_path + '.tmp'
+            success = False
+            try:
+                with open(path, encoding='utf-8') as in_f, \
+                        open(tmp_path, 'w', encoding='utf-8') as out_f:
+                    events = tmtheme.iterparse(in_f, path, out)
+                    success = tmtheme.write_csscheme(events, out_f, out, skip_names,
+                                                     hidden=path.endswith(".hidden-tmTheme"),
+                                                     optimize=optimize, scss=scss)
+            except tmtheme.PlistError:
+                pass
+            if success:
+                os.replace(tmp_path, new_path)
+                out_file = new_path
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    except Exception as e:
+        out.write_line("Unexpected %s: %s" % (e.__class__.__name__, e))
+    return path, out_file, time.time() - start, out.getvalue(), None
+
+
+def _map(func, files, jobs, *args):
+    """Call `func(path, *args)` for all files in a process pool and yield the results."""
+    if jobs == 1:
+        for path in files:
+            yield func(path, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(func, path, *args) for path in files]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def convert_files(files, executables=None, jobs=None, servers=None, minimize=False):
+    """Convert `files` using a process pool and yield results as they complete.
+
+    Yields tuples of `(path, out_file, seconds, log, report)`, where `out_file`
+    is `None` if the conversion failed and `report` is a dict of
+    `.report.BuildReport` (or `None` on unexpected errors).
+    Each worker process starts its own compiler servers, if any are specified.
+    """
+    return _map(_convert_one, files, jobs, executables or {}, servers, minimize)
+
+
+def convert_tmtheme_files(files, jobs=None, skip_names=False, overwrite=False,
+                          optimize=False, scss=False):
+    """Convert tmTheme `files` to CSScheme files next to them using a process pool.
+
+    Yields the same tuples as `convert_files`, `report` is always `None`.
+    Existing files are skipped (and count as failed) unless `overwrite` is true.
+    See `tmtheme.iter_blocks` for `optimize` and `scss`.
+    """
+    return _map(_convert_tmtheme_one, files, jobs, skip_names, overwrite, optimize, scss)
+
+
+def _positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError("expected a positive number, got %r" % text)
+    return value
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m CSScheme.converters",
+        description="Convert CSScheme, SCSScheme, SASScheme and StyluScheme files to tmTheme "
+                    "or tmTheme files to CSScheme.")
+    arg_parser.add_argument('paths', nargs='+', metavar='PATH',
+                            help="scheme file, directory or glob pattern")
+    arg_parser.add_argument('-j', '--jobs', type=_positive_int, default=None,
+                            help="number of worker processes (default: number of CPUs)")
+    arg_parser.add_argument('-e', '--executable', action='append', default=[],
+                            metavar='NAME=PATH',
+                            help="path to an executable, e.g. 'sass=/usr/bin/sass'")
+    arg_parser.add_argument('-s', '--server', action='append', default=[],
+                            metavar='NAME=COMMAND',
+                            help="command for a persistent compiler server, e.g. "
+                                 "'sass=ruby converters/servers/sass_server.rb'")
+    arg_parser.add_argument('-w', '--watch', action='store_true',
+                            help="keep running and rebuild schemes when they or their "
+                                 "imports change")
+    arg_parser.add_argument('-r', '--report-log', metavar='FILE',
+                            help="append timings and statistics of each build to FILE, "
+                                 "one JSON object per line")
+    arg_parser.add_argument('-m', '--minimize', action='store_true',
+                            help="remove redundant settings from the generated files")
+    arg_parser.add_argument('-t', '--from-tmtheme', action='store_true',
+                            help="convert .tmTheme and .hidden-tmTheme files to CSScheme instead")
+    arg_parser.add_argument('--skip-names', action='store_true',
+                            help="with --from-tmtheme, don't convert the names of items")
+    arg_parser.add_argument('--overwrite', action='store_true',
+                            help="with --from-tmtheme, overwrite existing .csscheme files")
+    arg_parser.add_argument('--optimize', action='store_true',
+                            help="with --from-tmtheme, merge items with identical settings "
+                                 "or scopes")
+    arg_parser.add_argument('--scss', action='store_true',
+                            help="with --from-tmtheme, create .scsscheme files with "
+                                 "variables for repeated colors")
+    arg_parser.add_argument('-q', '--quiet', action='store_true',
+                            help="only print failures and the summary")
+    args = arg_parser.parse_args(argv)
+    if args.from_tmtheme:
+        if args.minimize:
+            arg_parser.error("--minimize can't be used with --from-tmtheme")
+        # Every rebuild would fail because the first one created the files
+        if args.watch and not args.overwrite:
+            arg_parser.error("--watch with --from-tmtheme requires --overwrite")
+    else:
+        for option in ('skip_names', 'overwrite', 'optimize', 'scss'):
+            if getattr(args, option):
+                arg_parser.error("--%s requires --from-tmtheme" % option.replace('_', '-'))
+    out = StreamReporter()
+
+    executables = {}
+    for spec in args.executable:
+        name, sep, path = spec.partition('=')
+        if not sep:
+            arg_parser.error("invalid executable specification: %r" % spec)
+        executables[name] = path
+
+    servers = {}
+    for spec in args.server:
+        name, sep, command = spec.partition('=')
+        if not sep:
+            arg_parser.error("invalid server specification: %r" % spec)
+        servers[name] = shlex.split(command)
+
+    patterns = TMTHEME_PATTERNS if args.from_tmtheme else None
+    files = collect_files(args.paths, patterns)
+    if not files:
+        out.write_line("No scheme files found.")
+        return 1
+
+    def convert(files):
+        failed = 0
+        reports = []
+        start = time.time()
+        if args.from_tmtheme:
+            results = convert_tmtheme_files(files, args.jobs, args.skip_names, args.overwrite,
+                                            args.optimize, args.scss)
+        else:
+            results = convert_files(files, executables, args.jobs, servers, args.minimize)
+        for path, out_file, seconds, log, report in results:
+            if report:
+                reports.append(report)
+            rel_path = os.path.relpath(path)
+            if out_file:
+                if not args.quiet:
+                    out.write_line("[ OK ] %s (%.3fs)" % (rel_path, seconds))
+            else:
+                failed += 1
+                out.write_line("[FAIL] %s (%.3fs)" % (rel_path, seconds))
+            if log and (not out_file or not args.quiet):
+                for line in log.rstrip('\n').split('\n'):
+                    out.write_line("       " + line)
+
+        out.write_line("\n%d converted, %d failed, %d total in %.3fs"
+                       % (len(files) - failed, failed, len(files), time.time() - start))
+        # Show the results right away when watching
+        out.finish()
+        if args.report_log:
+            append_log(args.report_log, reports)
+        return failed
+
+    failed = convert(files)
+    if not args.watch:
+        return 1 if failed else 0
+
+    from .watch import Watcher
+    watcher = Watcher(lambda: collect_files(args.paths, patterns), convert)
+    out.write_line("Watching %d files for changes, press Ctrl+C to stop."
+                   % len(watcher.index.files()))
+    out.finish()
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
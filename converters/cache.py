@@ -0,0 +1,131 @@
+"""Cache for compiled pre-processor output.
+
+Entries are keyed on the converter and the root file and remember the content
+hashes of every file that took part in the compilation (the import graph). An
+entry is only used if none of these files changed, so the pre-processor does
+not need to run at all for unchanged schemes.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+__all__ = ('file_hash', 'hash_files', 'find_imports', 'CompileCache', 'compile_cache')
+
+
+def file_hash(path):
+    """Return the sha1 hex digest of a file's contents or `None` if it can't be read."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (OSError, IOError):
+        return None
+
+
+def hash_files(paths):
+    """Return a dict of the `file_hash` of every path in `paths`."""
+    return dict((path, file_hash(path)) for path in paths)
+
+
+def _resolve_import(name, base_dir, exts):
+    """Find the file an import statement refers to, trying partials and extensions."""
+    path = os.path.join(base_dir, name)
+    head, tail = os.path.split(path)
+    bases = (path, os.path.join(head, '_' + tail), os.path.join(path, 'index'))
+    for base in bases:
+        for ext in ('',) + exts:
+            candidate = base + ext
+            if os.path.isfile(candidate):
+                return os.path.abspath(candidate)
+
+
+def find_imports(file_path, import_reg, exts):
+    """Recursively collect the files imported by `file_path`, including itself.
+
+    * import_reg - compiled regex with the imported names in a group named
+                   "names", separated by commas and each in quotes
+    * exts - tuple of extensions to try when resolving imports
+    """
+    found = set()
+    todo = [os.path.abspath(file_path)]
+    while todo:
+        path = todo.pop()
+        if path in found:
+            continue
+        found.add(path)
+        try:
+            with open(path) as f:
+                source = f.read()
+        except (OSError, IOError, UnicodeDecodeError):
+            continue
+        base_dir = os.path.dirname(path)
+        for m in import_reg.finditer(source):
+            for name in re.findall(r"['\"](.+?)['\"]", m.group('names')):
+                imported = _resolve_import(name, base_dir, exts)
+                if imported:
+                    todo.append(imported)
+    return found
+
+
+class CompileCache(object):
+
+    """Least recently used cache for compilation results.
+
+    Results are arbitrary objects, the converters store
+    `(returncode, stdout, stderr)` tuples.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached result for `key` if no dependency changed, else `None`."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        hashes, result = entry
+        if any(file_hash(path) != digest for path, digest in hashes.items()):
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return result
+
+    def put(self, key, dependencies, result, hashes=None):
+        """Store `result` and the hashes of all files in `dependencies`.
+
+        `hashes` should contain the hashes taken before compiling (see
+        `hash_files`), so that changes made during the compilation are not
+        missed. Dependencies not in there are hashed now.
+        """
+        hashes = dict(hashes or ())
+        for path in dependencies:
+            if path not in hashes:
+                hashes[path] = file_hash(path)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (hashes, result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def dependencies(self, key):
+        """Return the files the cached result for `key` depends on (possibly empty)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return set(entry[0]) if entry else set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+compile_cache = CompileCache()
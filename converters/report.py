@@ -0,0 +1,78 @@
+"""Timings and statistics of a build."""
+
+import json
+import time
+from contextlib import contextmanager
+
+__all__ = ('BuildReport', 'append_log')
+
+
+class BuildReport(object):
+
+    """Records wall and CPU time per build stage and some counts.
+
+    .. attribute:: stages
+
+        List of `(name, wall_seconds, cpu_seconds)` tuples, in order.
+
+    .. attribute:: counts
+
+        Dict of counts, e.g. 'rules', 'declarations' and 'tokens'.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.timestamp = time.time()
+        self.stages = []
+        self.counts = {}
+        self.success = False
+
+    @contextmanager
+    def timed(self, name):
+        """Context manager that records the time spent in the block as stage `name`."""
+        wall, cpu = time.time(), time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.time() - wall, time.process_time() - cpu))
+
+    @property
+    def total(self):
+        """The summed `(wall, cpu)` seconds of all stages."""
+        return (sum(s[1] for s in self.stages), sum(s[2] for s in self.stages))
+
+    def count_stylesheet(self, stylesheet):
+        rulesets = [r for r in stylesheet.rules if not r.at_keyword]
+        declarations = [d for r in rulesets for d in r.declarations]
+        self.counts['rules'] = len(stylesheet.rules)
+        self.counts['declarations'] = len(declarations)
+        self.counts['tokens'] = (sum(len(r.selector) for r in rulesets)
+                                 + sum(len(d.value) for d in declarations))
+
+    def to_dict(self):
+        return {
+            'file': self.file_path,
+            'timestamp': self.timestamp,
+            'success': self.success,
+            'stages': [{'name': name, 'wall': wall, 'cpu': cpu}
+                       for name, wall, cpu in self.stages],
+            'counts': self.counts,
+        }
+
+    def format(self):
+        """Return the report as a list of human-readable lines."""
+        lines = ["%-12s %9s %9s" % ("Stage", "Wall", "CPU")]
+        for name, wall, cpu in self.stages:
+            lines.append("%-12s %8.1fms %8.1fms" % (name, wall * 1000, cpu * 1000))
+        wall, cpu = self.total
+        lines.append("%-12s %8.1fms %8.1fms" % ("total", wall * 1000, cpu * 1000))
+        if self.counts:
+            lines.append(", ".join("%s: %d" % (k, v) for k, v in sorted(self.counts.items())))
+        return lines
+
+
+def append_log(log_file, reports):
+    """Append report dicts to `log_file`, one JSON object per line."""
+    with open(log_file, 'a') as f:
+        for report in reports:
+            f.write(json.dumps(report, sort_keys=True) + "\n")
@@ -0,0 +1,99 @@
+"""Reporters that converters write their output to.
+
+A reporter is any object that provides the following methods:
+
+    write(text)
+    write_line(text='')
+    set_path(path=None, file_regex=None, line_regex=None)
+    set_regex(file_regex=None, line_regex=None)
+    finish()
+
+`my_sublime_lib.view.OutputPanel` is the reporter used inside Sublime Text.
+The classes in this module do not depend on Sublime Text and can be used for
+headless conversion, in worker processes and in tests.
+"""
+
+__all__ = ('Reporter', 'StreamReporter', 'ListReporter')
+
+import sys
+
+
+class Reporter(object):
+
+    """Base class for reporters. Subclasses need to implement `write`.
+
+    Like OutputPanel, reporters can be used as context managers and call
+    `finish()` when leaving the block.
+    """
+
+    path = None
+    file_regex = None
+    line_regex = None
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def write_line(self, text=''):
+        self.write(text + "\n")
+
+    def set_path(self, path=None, file_regex=None, line_regex=None):
+        if path is not None:
+            self.path = path
+        self.set_regex(file_regex, line_regex)
+
+    def set_regex(self, file_regex=None, line_regex=None):
+        if file_regex is not None:
+            self.file_regex = file_regex
+        if line_regex is not None:
+            self.line_regex = line_regex
+
+    def finish(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.finish()
+
+
+class StreamReporter(Reporter):
+
+    """Write everything to a stream, `sys.stdout` by default."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, text):
+        # Look up sys.stdout late so that it can be replaced (e.g. while testing)
+        (self.stream or sys.stdout).write(text)
+
+    def finish(self):
+        (self.stream or sys.stdout).flush()
+
+
+class ListReporter(Reporter):
+
+    """Collect everything in a list, e.g. to pass it across processes.
+
+    .. attribute:: chunks
+
+        The written texts, in order.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def getvalue(self):
+        return ''.join(self.chunks)
+
+    @property
+    def lines(self):
+        """All written text as a list of lines (without line endings)."""
+        text = self.getvalue()
+        if not text:
+            return []
+        return text.rstrip('\n').split('\n')
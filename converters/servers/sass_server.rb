@@ -0,0 +1,36 @@
+# Compiler server for sass (Ruby), see converters/worker.py for the protocol.
+#
+# Usage: ruby sass_server.rb
+require 'json'
+require 'sass'
+
+$stdout.sync = true
+
+def compile(request)
+  args = request['args'] || []
+  source = File.read(request['file'])
+  engine = Sass::Engine.new(source,
+                            syntax: args.include?('--scss') ? :scss : :sass,
+                            filename: request['file'],
+                            line_numbers: args.include?('--line-numbers'),
+                            cache: !args.include?('--no-cache'),
+                            load_paths: [File.dirname(request['file'])])
+  { returncode: 0, stdout: engine.render, stderr: '' }
+rescue Sass::SyntaxError => e
+  # Mimic the command line output so the error reporting works the same
+  { returncode: 65, stdout: '',
+    stderr: "Error: #{e.message}\n        on line #{e.sass_line} of #{e.sass_filename}\n" }
+rescue StandardError => e
+  { returncode: 1, stdout: '', stderr: "Error: #{e.message}\n" }
+end
+
+$stdin.each_line do |line|
+  begin
+    request = JSON.parse(line)
+  rescue JSON::ParserError
+    next
+  end
+  response = request['ping'] ? { pong: true } : compile(request)
+  response[:id] = request['id']
+  puts JSON.generate(response)
+end
@@ -0,0 +1,34 @@
+"""Stub compiler server that returns the source file unmodified.
+
+Speaks the protocol described in `converters.worker` and is meant for testing
+the worker without having sass or stylus installed.
+"""
+
+import json
+import sys
+
+
+def handle(request):
+    if request.get('ping'):
+        return {'pong': True}
+    try:
+        with open(request['file']) as f:
+            return {'returncode': 0, 'stdout': f.read(), 'stderr': ''}
+    except (KeyError, OSError) as e:
+        return {'returncode': 1, 'stdout': '', 'stderr': "Error: %s\n" % e}
+
+
+def main():
+    for line in iter(sys.stdin.readline, ''):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        response = handle(request)
+        response['id'] = request.get('id')
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+// Compiler server for stylus, see converters/worker.py for the protocol.
+//
+// Usage: node stylus_server.js
+// Requires the stylus module to be resolvable, e.g. through NODE_PATH.
+'use strict';
+
+var fs = require('fs');
+var path = require('path');
+var readline = require('readline');
+var stylus = require('stylus');
+
+function respond(request, response) {
+    response.id = request.id;
+    process.stdout.write(JSON.stringify(response) + '\n');
+}
+
+function compile(request) {
+    var args = request.args || [];
+    var source;
+    try {
+        source = fs.readFileSync(request.file, 'utf8');
+    } catch (err) {
+        return respond(request, {returncode: 1, stdout: '', stderr: 'Error: ' + err.message + '\n'});
+    }
+    stylus(source)
+        .set('filename', request.file)
+        .set('paths', [path.dirname(request.file)])
+        .set('linenos', args.indexOf('-l') !== -1)
+        .render(function (err, css) {
+            if (err) {
+                respond(request, {returncode: 1, stdout: '', stderr: err.name + ': ' + err.message + '\n'});
+            } else {
+                respond(request, {returncode: 0, stdout: css, stderr: ''});
+            }
+        });
+}
+
+readline.createInterface({input: process.stdin}).on('line', function (line) {
+    var request;
+    try {
+        request = JSON.parse(line);
+    } catch (err) {
+        return;
+    }
+    if (request.ping) {
+        respond(request, {pong: true});
+    } else {
+        compile(request);
+    }
+});
@@ -1,7 +1,8 @@
 import os
-from io import StringIO
+import re
 
-__all__ = ('load',)
+__all__ = ('load', 'iterparse', 'iter_data', 'iter_blocks', 'write_csscheme',
+           'to_csscheme', 'merge_items', 'PlistError', 'ConvertError')
 
 debug_base = 'Error parsing Property List "%s": %s, line %s, column %s'
 debug_base_2 = 'Error parsing Property List "%s": %s'
@@ -16,7 +17,7 @@ def load(text, path, out):
     :param path:
         The path of the file, for error output purposes.
     :param out:
-        OutputPanel instance.
+        Reporter to write errors to, e.g. an OutputPanel instance.
 
     :return:
         `None` if errored, the parsed data otherwise (mostly a dict).
@@ -53,6 +54,9 @@ def load(text, path, out):
         try:
             # This will try `from xml.parsers.expat import ParserCreate`
             # but since it is already tried above it should succeed.
+            if hasattr(plistlib, 'loads'):
+                # readPlistFromBytes is gone in Python 3.9, loads was added in 3.4
+                return plistlib.loads(text.encode('utf-8'), fmt=plistlib.FMT_XML)
             return plistlib.readPlistFromBytes(text.encode('utf-8'))
         except ExpatError as e:
             out.write_line(debug_base
@@ -63,59 +67,439 @@ def load(text, path, out):
                            )
 
 
-def to_csscheme(data, out, skip_names, hidden=False):
-    with StringIO() as stream:
-        if 'name' in data:
-            stream.write('@name "%s";\n\n' % data['name'])
+class PlistError(ValueError):
 
-        if hidden:
-            stream.write('@hidden true;\n\n')
+    """Raised by `iterparse` after the error has been written to the reporter."""
 
-        uuid = data.get('uuid')
-        if uuid:
-            stream.write('@uuid %s;\n\n' % uuid)
 
-        # Search for settings item and extract the others
-        items = data['settings']
-        settings = None
-        for i, item in enumerate(items):
+class _PlistBuilder(object):
+
+    """Expat handlers that build plist values and collect events for `iterparse`.
+
+    Items of the top-level "settings" array are turned into events as soon as
+    they are complete and not kept around, neither are other top-level values.
+    """
+
+    def __init__(self):
+        # Frames of [container, pending dict key, is the streamed settings array]
+        self.stack = []
+        self.data = []
+        self.events = []
+        self.root_seen = False
+
+    def start(self, tag, attrs):
+        self.data = []
+        if tag == 'dict':
+            if not self.stack and self.root_seen:
+                raise ValueError("unexpected second root element")
+            self.root_seen = True
+            self.stack.append([{}, None, False])
+        elif tag == 'array':
+            if not self.stack:
+                raise ValueError("expected a dict as root element")
+            streamed = (len(self.stack) == 1 and self.stack[0][1] == 'settings')
+            self.stack.append([[], None, streamed])
+        elif tag != 'plist' and not self.stack:
+            raise ValueError("expected a dict as root element")
+
+    def end(self, tag):
+        text = ''.join(self.data)
+        self.data = []
+        if tag == 'key':
+            self.stack[-1][1] = text
+            return
+        elif tag in ('dict', 'array'):
+            value = self.stack.pop()[0]
+        elif tag == 'string':
+            value = text
+        elif tag == 'integer':
+            value = int(text)
+        elif tag == 'real':
+            value = float(text)
+        elif tag in ('true', 'false'):
+            value = tag == 'true'
+        elif tag == 'data':
+            import base64
+            value = base64.b64decode(text.encode('ascii'))
+        elif tag == 'date':
+            value = text
+        else:
+            return
+        self.add(value)
+
+    def add(self, value):
+        if not self.stack:
+            return  # the root dict is complete
+        container, key, streamed = frame = self.stack[-1]
+        if streamed:
+            self.events.append(('item', value))
+        elif len(self.stack) == 1:
+            if not (key == 'settings' and isinstance(value, list)):
+                self.events.append(('key', key, value))
+        elif isinstance(container, dict):
+            container[key] = value
+            frame[1] = None
+        else:
+            container.append(value)
+
+    def characters(self, data):
+        self.data.append(data)
+
+
+def iterparse(source, path, out, chunk_size=64 * 1024):
+    """Incrementally parse a tmTheme property list and yield its contents.
+
+    Yields `('key', key, value)` for every top-level entry except "settings" and
+    `('item', item)` for every item of the "settings" array, in document order.
+    Only the item currently being parsed is kept in memory.
+
+    :param source:
+        The text of the file or a file object opened in text mode.
+    :param path:
+        The path of the file, for error output purposes.
+    :param out:
+        Reporter to write errors to, e.g. an OutputPanel instance.
+
+    :raise PlistError:
+        If parsing failed. The error has been written to `out` already.
+    """
+    try:
+        from xml.parsers.expat import ParserCreate, ExpatError, ErrorString
+    except ImportError:
+        # Use the non-incremental fallback
+        data = load(source if isinstance(source, str) else source.read(), path, out)
+        if data is None:
+            raise PlistError(path)
+        for event in iter_data(data):
+            yield event
+        return
+
+    out.set_path(os.path.dirname(path), file_regex)
+    builder = _PlistBuilder()
+    parser = ParserCreate()
+    parser.StartElementHandler = builder.start
+    parser.EndElementHandler = builder.end
+    parser.CharacterDataHandler = builder.characters
+
+    if isinstance(source, str):
+        chunks = (source[i:i + chunk_size] for i in range(0, len(source), chunk_size))
+    else:
+        chunks = iter(lambda: source.read(chunk_size), '')
+
+    try:
+        for chunk in chunks:
+            parser.Parse(chunk, False)
+            events, builder.events = builder.events, []
+            for event in events:
+                yield event
+        parser.Parse('', True)
+    except ExpatError as e:
+        out.write_line(debug_base % (path, ErrorString(e.code), e.lineno, e.offset + 1))
+        raise PlistError(path)
+    except ValueError as e:
+        out.write_line(debug_base % (path, e, parser.CurrentLineNumber,
+                                     parser.CurrentColumnNumber + 1))
+        raise PlistError(path)
+
+    if not builder.root_seen:
+        out.write_line(debug_base_2 % (path, "no root dict found"))
+        raise PlistError(path)
+    for event in builder.events:
+        yield event
+
+
+def iter_data(data):
+    """Turn loaded tmTheme data into the events that `iterparse` yields."""
+    for key, value in data.items():
+        if key != 'settings':
+            yield ('key', key, value)
+    for item in data.get('settings', ()):
+        yield ('item', item)
+
+
+class ConvertError(ValueError):
+
+    """Raised by `iter_blocks` after the error has been written to the reporter."""
+
+
+def _format_settings(settings):
+    return ''.join(["\n\t%s: %s;" % item for item in settings])
+
+
+def iter_blocks(events, out, skip_names, hidden=False, optimize=False, scss=False):
+    """Yield the at-rules and rulesets of the CSScheme for the tmTheme `events`.
+
+    Each block is built with a single join. Items are processed in one pass,
+    the first item without a scope provides the global settings.
+
+    The header (@name, @uuid and the global settings) always comes first, so
+    scoped blocks are only yielded as they are read once "name", "uuid" and the
+    global item have been seen. tmTheme files usually have their keys sorted,
+    with "uuid" after "settings", in which case nothing is yielded before the
+    end of the document and all formatted blocks are held in memory.
+
+    :param events:
+        Iterable of events as yielded by `iterparse` or `iter_data`.
+    :param optimize:
+        Merge items with identical settings or scopes, see `merge_items`.
+        Requires reading all events before the first block is yielded.
+    :param scss:
+        Create SCSScheme: Colors used more than once are extracted into
+        variables and selectors and values are escaped as necessary.
+
+    :raise ConvertError:
+        If an item is invalid. The error has been written to `out` already.
+    """
+    if optimize or scss:
+        for block in _iter_collected_blocks(events, out, skip_names, hidden, optimize, scss):
+            yield block
+        return
+
+    # Formatted blocks of scoped items, until the header is complete
+    meta = {}
+    global_block = None
+    pending = []
+    header_done = False
+
+    for event in events:
+        if event[0] == 'key':
+            meta[event[1]] = event[2]
+        else:
+            item = event[1]
             if 'scope' not in item:
+                if global_block is not None:
+                    out.write_line("Missing 'scope' key in item")
+                    raise ConvertError()
                 if 'settings' not in item:
                     out.write_line("Expected 'settings' key in item without scope")
-                    return
-                settings = item['settings']
-                del items[i]  # remove from the regular items list
-                break
+                    raise ConvertError()
+                settings = sorted(item['settings'].items(), key=lambda x: x[0].lower())
+                global_block = "* {%s\n}" % _format_settings(settings)
+            else:
+                if 'settings' not in item:
+                    out.write_line("Missing 'settings' key in item")
+                    raise ConvertError()
+                name = ('\n\t@name "%s";' % item['name']
+                        if not skip_names and 'name' in item else '')
+                block = "%s {%s%s\n}" % (item['scope'], name,
+                                         _format_settings(item['settings'].items()))
+                if header_done:
+                    yield block
+                else:
+                    pending.append(block)
 
-        if not settings:
-            settings = []
-        else:
-            settings = list(settings.items())
+        if not header_done and global_block is not None and 'name' in meta and 'uuid' in meta:
+            header_done = True
+            for block in _header_rules(meta, hidden) + [global_block or "* {\n}"] + pending:
+                yield block
+            pending = []
 
-        # Global settings
-        settings.sort(key=lambda x: x[0].lower())
-        stream.write("* {")
-        for key, value in settings:
-            stream.write("\n\t%s: %s;" % (key, value))
-        stream.write("\n}")
+    if not header_done:
+        for block in _header_rules(meta, hidden) + [global_block or "* {\n}"] + pending:
+            yield block
+
+
+def _header_rules(meta, hidden):
+    """Return the at-rules for the top-level keys in `meta`."""
+    rules = []
+    if 'name' in meta:
+        rules.append('@name "%s";' % meta['name'])
+    if hidden:
+        rules.append('@hidden true;')
+    if meta.get('uuid'):
+        rules.append('@uuid %s;' % meta['uuid'])
+    return rules
+
+
+def merge_items(items):
+    """Merge scope items without changing the effective styling.
+
+    Items with identical settings are combined into one ruleset with a
+    comma-separated selector and items with an identical scope have their
+    settings combined. Since this moves an item to the position of an earlier
+    one, it is only done if no item in between sets any of the same keys.
+
+    :param items:
+        List of tmTheme items that all have 'scope' and 'settings' keys.
+
+    :return:
+        List of `(scopes, names, settings)` tuples, where `scopes` and `names`
+        are lists and `settings` is a dict.
+    """
+    groups = []
+    by_settings = {}  # frozen settings -> group index
+    by_scope = {}     # scope -> index of a group with only that scope
+    last_set = {}     # key -> index of the last group setting it
+
+    def freeze(settings):
+        return tuple(sorted(settings.items()))
+
+    for item in items:
+        scope, settings = item['scope'], item['settings']
+        latest = max([last_set.get(k, -1) for k in settings] or [-1])
+        frozen = freeze(settings)
+
+        i = by_settings.get(frozen)
+        if i is not None and i >= latest:
+            scopes, names, _ = groups[i]
+            if len(scopes) == 1:
+                by_scope.pop(scopes[0], None)
+            scopes.append(scope)
+            names.append(item.get('name'))
+            continue
+
+        i = by_scope.get(scope)
+        if i is not None and i >= latest:
+            scopes, names, group_settings = groups[i]
+            if by_settings.get(freeze(group_settings)) == i:
+                del by_settings[freeze(group_settings)]
+            group_settings.update(settings)
+            by_settings[freeze(group_settings)] = i
+            names.append(item.get('name'))
+            for k in settings:
+                last_set[k] = i
+            continue
+
+        i = len(groups)
+        groups.append(([scope], [item.get('name')], dict(settings)))
+        by_settings[frozen] = i
+        by_scope.setdefault(scope, i)
+        for k in settings:
+            last_set[k] = i
+
+    return groups
+
+
+_color_reg = re.compile(r"^#(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})$")
+
+
+def _build_palette(settings_list, min_count=2):
+    """Map lowercased colors used at least `min_count` times to variable names."""
+    counts = {}
+    first = {}
+    for settings in settings_list:
+        for value in settings.values():
+            if isinstance(value, str) and _color_reg.match(value):
+                color = value.lower()
+                counts[color] = counts.get(color, 0) + 1
+                first.setdefault(color, (len(first), value))
+    colors = sorted((c for c in counts if counts[c] >= min_count),
+                    key=lambda c: (-counts[c], first[c][0]))
+    return dict((c, ("$color%d" % i, first[c][1])) for i, c in enumerate(colors))
+
+
+def _scss_value(value):
+    # The SASS parser does not accept raw #RRGGBBAA hashes
+    if isinstance(value, str) and len(value) == 9 and _color_reg.match(value):
+        return "'%s'" % value
+    return value
+
+
+_scss_operator_reg = re.compile(r"[&|()]|(?<!\S)-(?!\S)|(?<=\.)(?=\d)")
 
-        # The other items
-        for item in items:
-            if 'scope' not in item:
-                out.write_line("Missing 'scope' key in item")
-                return
-            stream.write("\n\n%s {" % item['scope'])
 
-            if not skip_names and 'name' in item:
-                stream.write('\n\t@name "%s";' % item['name'])
+def _scss_selector(scope):
+    # The SASS parser does not accept some scope selector operators and segments starting with
+    # numbers; they need to be escaped (the backslashes are removed by the dumper).
+    return _scss_operator_reg.sub(lambda m: "\\" + m.group(0), scope)
 
+
+def _iter_collected_blocks(events, out, skip_names, hidden, optimize, scss):
+    """Like `iter_blocks`, but reads all events first to merge items and extract a palette."""
+    meta = {}
+    global_settings = None
+    items = []
+    for event in events:
+        if event[0] == 'key':
+            meta[event[1]] = event[2]
+            continue
+        item = event[1]
+        if 'scope' not in item:
+            if global_settings is not None:
+                out.write_line("Missing 'scope' key in item")
+                raise ConvertError()
             if 'settings' not in item:
-                out.write_line("Missing 'settings' key in item")
-                return
-            for key, value in item['settings'].items():
-                stream.write("\n\t%s: %s;" % (key, value))
+                out.write_line("Expected 'settings' key in item without scope")
+                raise ConvertError()
+            global_settings = item['settings']
+        elif 'settings' not in item:
+            out.write_line("Missing 'settings' key in item")
+            raise ConvertError()
+        else:
+            items.append(item)
+
+    if optimize:
+        groups = merge_items(items)
+    else:
+        groups = [([item['scope']], [item.get('name')], item['settings']) for item in items]
+    global_settings = global_settings or {}
+
+    for block in _header_rules(meta, hidden):
+        yield block
+
+    palette = {}
+    if scss:
+        palette = _build_palette([global_settings] + [g[2] for g in groups])
+        if palette:
+            yield '\n'.join("%s: %s;" % (var, _scss_value(value))
+                            for var, value in sorted(palette.values(),
+                                                     key=lambda v: int(v[0][6:])))
+
+    def value_of(value):
+        if isinstance(value, str) and value.lower() in palette:
+            return palette[value.lower()][0]
+        return _scss_value(value) if scss else value
+
+    def format_settings(settings):
+        return _format_settings([(k, value_of(v)) for k, v in settings])
+
+    global_items = sorted(global_settings.items(), key=lambda x: x[0].lower())
+    yield "* {%s\n}" % format_settings(global_items)
+
+    for scopes, names, settings in groups:
+        if scss:
+            scopes = [_scss_selector(scope) for scope in scopes]
+        names = set(names)
+        name = ''
+        if not skip_names and len(names) == 1 and None not in names:
+            name = '\n\t@name "%s";' % names.pop()
+        yield "%s {%s%s\n}" % (",\n".join(scopes), name, format_settings(settings.items()))
+
 
-            stream.write("\n}")
+def write_csscheme(events, stream, out, skip_names, hidden=False, optimize=False, scss=False):
+    """Write CSScheme for the tmTheme `events` to `stream` as they come in.
 
-        stream.write("\n")
-        return stream.getvalue()
+    See `iter_blocks` for the parameters.
+
+    :return:
+        `True` if successful, `False` if an error was written to `out`.
+        Raises `PlistError` from `iterparse`.
+    """
+    try:
+        blocks = iter_blocks(events, out, skip_names, hidden, optimize, scss)
+        for i, block in enumerate(blocks):
+            if i:
+                stream.write("\n\n")
+            stream.write(block)
+    except ConvertError:
+        return False
+    stream.write("\n")
+    return True
+
+
+def to_csscheme(data, out, skip_names, hidden=False, optimize=False, scss=False):
+    """Convert tmTheme data to CSScheme and return it as a string.
+
+    :param data:
+        The data returned by `load` or the events of `iterparse`.
+
+    See `iter_blocks` for the other parameters.
+
+    :return:
+        `None` if errored, the CSScheme source otherwise.
+    """
+    events = iter_data(data) if isinstance(data, dict) else data
+    try:
+        return "\n\n".join(iter_blocks(events, out, skip_names, hidden, optimize, scss)) + "\n"
+    except (ConvertError, PlistError):
+        return
@@ -0,0 +1,141 @@
+"""Watch schemes and the files they import and rebuild them when something changes.
+
+Polls modification times, so it works everywhere without additional
+dependencies. Changes are debounced and coalesced, and only the schemes that
+(transitively) import a changed file are rebuilt.
+"""
+
+import os
+import time
+from collections import defaultdict
+
+from . import all as all_converters
+from .cache import find_imports
+
+__all__ = ('scheme_dependencies', 'DependencyIndex', 'Watcher')
+
+
+def scheme_dependencies(path):
+    """Return the set of files a scheme depends on, including itself."""
+    path = os.path.abspath(path)
+    for conv in all_converters:
+        if conv.valid_file(path) and conv.import_reg:
+            return find_imports(path, conv.import_reg, conv.import_exts)
+    return {path}
+
+
+class DependencyIndex(object):
+
+    """Maps files to the root schemes that depend on them."""
+
+    def __init__(self):
+        self.roots = {}
+        self.dependents = defaultdict(set)
+
+    def update(self, root):
+        """(Re-)compute the dependencies of `root`."""
+        self.remove(root)
+        deps = self.roots[root] = scheme_dependencies(root)
+        for dep in deps:
+            self.dependents[dep].add(root)
+
+    def remove(self, root):
+        for dep in self.roots.pop(root, ()):
+            roots = self.dependents[dep]
+            roots.discard(root)
+            if not roots:
+                del self.dependents[dep]
+
+    def affected(self, paths):
+        """Return the roots that depend on any of `paths`."""
+        roots = set()
+        for path in paths:
+            roots |= self.dependents.get(path, set())
+        return roots
+
+    def files(self):
+        return set(self.dependents)
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+class Watcher(object):
+
+    """Poll for changes and call `on_change` with the roots to rebuild.
+
+    * find_roots - callable returning the current list of root schemes (absolute
+                   paths), called on every poll to pick up new files
+    * on_change - callable that is passed a sorted list of roots to rebuild
+    * interval - seconds between polls
+    * debounce - seconds without further changes before `on_change` is called
+    """
+
+    def __init__(self, find_roots, on_change, interval=0.5, debounce=0.3):
+        self.find_roots = find_roots
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self.index = DependencyIndex()
+        self.stats = {}
+        self.running = False
+
+        for root in self.find_roots():
+            self.index.update(root)
+        self.stats = dict((path, _stat(path)) for path in self.index.files())
+
+    def poll(self):
+        """Check all known files once and return the set of changed ones.
+
+        New root schemes count as changed, removed ones are forgotten.
+        """
+        changed = set()
+        roots = set(self.find_roots())
+        for root in set(self.index.roots) - roots:
+            self.index.remove(root)
+        for root in roots - set(self.index.roots):
+            self.index.update(root)
+            changed.add(root)
+
+        stats = {}
+        for path in self.index.files():
+            stat = stats[path] = _stat(path)
+            if path in self.stats and self.stats[path] != stat:
+                changed.add(path)
+        self.stats = stats
+        return changed
+
+    def rebuild(self, changed):
+        roots = self.index.affected(changed)
+        if not roots:
+            return
+        self.on_change(sorted(roots))
+        # Imports may have changed as well
+        for root in roots:
+            self.index.update(root)
+        self.stats.update((path, _stat(path)) for path in self.index.files()
+                          if path not in self.stats)
+
+    def run(self):
+        """Poll until `stop` is called (or KeyboardInterrupt)."""
+        self.running = True
+        pending = set()
+        last_change = 0
+        while self.running:
+            changed = self.poll()
+            now = time.time()
+            if changed:
+                pending |= changed
+                last_change = now
+            elif pending and now - last_change >= self.debounce:
+                self.rebuild(pending)
+                pending = set()
+            time.sleep(min(self.interval, self.debounce) if pending else self.interval)
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,213 @@
+"""Long-lived compiler processes, so that we don't pay startup costs for every build.
+
+A compiler server is started once and then receives one request per line on its
+stdin, answering with one response per line on its stdout. Both are JSON
+objects:
+
+    -> {"id": 1, "file": "/path/to/file.scsscheme", "args": ["--scss"]}
+    <- {"id": 1, "returncode": 0, "stdout": "...", "stderr": ""}
+
+    -> {"id": 2, "ping": true}
+    <- {"id": 2, "pong": true}
+
+`args` are the command line parameters the converter would pass to a one-shot
+invocation; servers may use them to select e.g. the syntax.
+
+Servers for sass and stylus as well as a stub server (which passes the source
+through unmodified) can be found in the `servers` directory.
+"""
+
+import atexit
+import json
+import os
+import subprocess
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # noqa
+
+__all__ = ('WorkerError', 'CompilerWorker', 'get_worker', 'shutdown_workers', 'SERVERS_DIR')
+
+
+SERVERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'servers')
+
+
+class WorkerError(Exception):
+    pass
+
+
+class CompilerWorker(object):
+
+    """Manage a single compiler server process.
+
+    The process is started lazily and restarted when it died or didn't answer
+    a health check. After `max_failures` consecutive failed starts the worker
+    gives up and every request raises `WorkerError`.
+    """
+
+    # Seconds to wait for the process to answer a ping
+    ping_timeout = 5
+    # Ping the process before a request if it was idle for this many seconds
+    ping_interval = 60
+    # Seconds to wait for a compilation result
+    compile_timeout = 60
+    max_failures = 3
+
+    def __init__(self, cmd):
+        self.cmd = tuple(cmd)
+        self.process = None
+        self.failures = 0
+        self.last_used = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._lines = None
+
+    # Process management
+
+    def start(self):
+        if self.failures >= self.max_failures:
+            raise WorkerError("%s failed to start %d times, giving up"
+                              % (self.cmd[0], self.failures))
+        try:
+            self.process = subprocess.Popen(self.cmd,
+                                            stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL,
+                                            shell=os.name == 'nt',
+                                            universal_newlines=True,
+                                            bufsize=1)
+        except OSError as e:
+            self.failures += 1
+            raise WorkerError("Could not start %s: %s" % (self.cmd[0], e))
+
+        # Read stdout on a separate thread so we can time out
+        self._lines = queue.Queue()
+        reader = threading.Thread(target=self._read_lines, args=(self.process, self._lines))
+        reader.daemon = True
+        reader.start()
+
+        if not self._ping():
+            self.failures += 1
+            self.stop()
+            raise WorkerError("%s did not respond after starting" % self.cmd[0])
+        self.failures = 0
+
+    def stop(self):
+        process, self.process = self.process, None
+        if process and process.poll() is None:
+            try:
+                process.stdin.close()
+                process.wait(timeout=1)
+            except Exception:
+                process.kill()
+                process.wait()
+
+    def is_alive(self):
+        process = self.process
+        return process is not None and process.poll() is None
+
+    def ensure_alive(self):
+        """Start or restart the process if it is not healthy."""
+        if self.is_alive() and time.time() - self.last_used > self.ping_interval:
+            if not self._ping():
+                self.stop()
+        if not self.is_alive():
+            self.stop()
+            self.start()
+
+    @staticmethod
+    def _read_lines(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)  # EOF
+
+    # Communication
+
+    def _request(self, data, timeout):
+        # `stop` may be called from another thread at any time (e.g. to cancel
+        # a build), so only look at the process once
+        process, lines = self.process, self._lines
+        if process is None:
+            raise WorkerError("%s is not running" % self.cmd[0])
+        self._next_id += 1
+        data['id'] = self._next_id
+        try:
+            process.stdin.write(json.dumps(data) + "\n")
+            process.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise WorkerError("Could not write to %s: %s" % (self.cmd[0], e))
+
+        deadline = time.time() + timeout
+        while True:
+            try:
+                line = lines.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                raise WorkerError("%s did not respond within %s seconds"
+                                  % (self.cmd[0], timeout))
+            if line is None:
+                raise WorkerError("%s exited unexpectedly" % self.cmd[0])
+            try:
+                response = json.loads(line)
+            except ValueError:
+                # Probably some debug output, skip it
+                continue
+            # Skip responses to requests that previously timed out
+            if isinstance(response, dict) and response.get('id') == data['id']:
+                self.last_used = time.time()
+                return response
+
+    def _ping(self):
+        try:
+            return bool(self._request({'ping': True}, self.ping_timeout).get('pong'))
+        except WorkerError:
+            return False
+
+    def compile(self, file_path, args=()):
+        """Compile `file_path` and return a `(returncode, stdout, stderr)` tuple.
+
+        Raises `WorkerError` if the server could not be reached, in which case
+        the caller should fall back to a one-shot invocation.
+        """
+        with self._lock:
+            self.ensure_alive()
+            try:
+                response = self._request({'file': file_path, 'args': list(args)},
+                                         self.compile_timeout)
+            except WorkerError:
+                # Can't know what state it is in now
+                self.stop()
+                raise
+            try:
+                return (int(response['returncode']),
+                        response.get('stdout', ''),
+                        response.get('stderr', ''))
+            except (KeyError, TypeError, ValueError):
+                raise WorkerError("Invalid response from %s: %r" % (self.cmd[0], response))
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(cmd):
+    """Return the shared worker for `cmd`, creating it if necessary."""
+    cmd = tuple(cmd)
+    with _workers_lock:
+        worker = _workers.get(cmd)
+        if worker is None:
+            worker = _workers[cmd] = CompilerWorker(cmd)
+        return worker
+
+
+def shutdown_workers():
+    """Stop all server processes, e.g. when the plugin is unloaded."""
+    with _workers_lock:
+        for worker in _workers.values():
+            worker.stop()
+        _workers.clear()
+
+
+atexit.register(shutdown_workers)
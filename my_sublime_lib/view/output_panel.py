@@ -1,4 +1,6 @@
-from sublime import Region, Window
+import threading
+
+from sublime import Region, Window, set_timeout
 
 from ._view import ViewSettings, unset_read_only, append, clear, get_text
 from .. import ST3
@@ -68,6 +70,16 @@ class OutputPanel(object):
         view
             The view handle of the output panel. Can be passed to
             `Edit(output.view)` to group modifications for example.
+            Call `flush()` before, so buffered text is not written after
+            your modifications.
+
+        flush_delay
+            Milliseconds after which buffered text is written to the panel.
+            Defaults to 50.
+
+        flush_size
+            Number of buffered characters that cause an immediate flush.
+            Defaults to 65536, 0 disables buffering.
 
     Defines the following methods:
 
@@ -83,15 +95,26 @@ class OutputPanel(object):
             the last call of  set_regex/path).
             The same applies to `line_regex`.
 
+            The panel only picks up changed settings when it is re-created,
+            which copies its contents. This happens once in `finish()` and
+            only if any of the settings actually changed.
+
         set_regex(file_regex=None, line_regex=None)
             Subset of set_path. Read there for further information.
 
         write(text)
             Will just write appending `text` to the output panel.
+            Writes are buffered and added to the view in a single edit,
+            see `flush()`.
 
         write_line(text='')
             Same as write() but inserts a newline at the end.
 
+        flush()
+            Writes all buffered text to the panel now. Happens automatically
+            after `flush_delay` milliseconds, when `flush_size` characters
+            are buffered or when calling `finish()`.
+
         clear()
             Erases all text in the output panel.
 
@@ -104,6 +127,13 @@ class OutputPanel(object):
             Required if you want the next_result command (F4) to work.
             If `auto_show` is true, will also show the panel if text was added.
     """
+    flush_delay = 50
+    flush_size = 2 ** 16
+
+    path = None
+    file_regex = None
+    line_regex = None
+
     def __init__(self, window, panel_name, file_regex=None,
                  line_regex=None, path=None, read_only=True,
                  auto_show=True):
@@ -118,6 +148,15 @@ class OutputPanel(object):
         self.view.set_read_only(read_only)
         self.settings = ViewSettings(self.view)
 
+        # Writes may come from any thread and flushes happen on a timer, so
+        # protect the buffer and serialize the edits
+        self._buffer = []
+        self._buffered = 0
+        self._flush_scheduled = False
+        self._buffer_lock = threading.Lock()
+        self._edit_lock = threading.RLock()
+        self._results_changed = False
+
         self.set_path(path, file_regex, line_regex)
 
         self.auto_show = auto_show
@@ -127,7 +166,7 @@ class OutputPanel(object):
         Only overrides the previous settings if parameters are not None.
         """
         if path is not None:
-            self.settings.result_base_dir = path
+            self.path = path
         # Also always update the file_regex
         self.set_regex(file_regex, line_regex)
 
@@ -137,34 +176,88 @@ class OutputPanel(object):
         """
         if file_regex is not None:
             self.file_regex = file_regex
-        if hasattr(self, 'file_regex'):
-            self.settings.result_file_regex = self.file_regex
-
         if line_regex is not None:
             self.line_regex = line_regex
-        if hasattr(self, 'line_regex'):
-            self.settings.result_line_regex = self.line_regex
-
-        # Call get_output_panel again after assigning the above settings, so
+        self._update_result_settings()
+
+    def _update_result_settings(self):
+        # Settings may also have been changed by another instance for the
+        # same panel, so compare with the view's actual values
+        for key, value in (('result_base_dir', self.path),
+                           ('result_file_regex', self.file_regex),
+                           ('result_line_regex', self.line_regex)):
+            if value is not None and self.settings.get(key) != value:
+                self.settings.set(key, value)
+                self._results_changed = True
+
+    def _recreate(self):
+        # Call get_output_panel again after assigning the result settings, so
         # that "next_result" and "prev_result" work. However, it will also clear
         # the view so read it before and re-write its contents afterwards. Cache
         # selection as well.
-        contents = get_text(self.view)
-        sel = self.view.sel()
-        selections = list(sel)
-        self.view = self.window.get_output_panel(self.panel_name)
-        sel.clear()
-        for reg in selections:  # sel.add_all requires a `RegionSet` in ST2
-            sel.add(reg)
-        self.write(contents)
+        with self._edit_lock:
+            self.flush()
+            contents = get_text(self.view)
+            sel = self.view.sel()
+            selections = list(sel)
+            self.view = self.window.get_output_panel(self.panel_name)
+            sel.clear()
+            for reg in selections:  # sel.add_all requires a `RegionSet` in ST2
+                sel.add(reg)
+            self._append(contents)
+        self._results_changed = False
+
+    def _append(self, text):
+        if text:
+            with unset_read_only(self.view):
+                append(self.view, text)
 
     def write(self, text):
         """Appends `text` to the output panel.
-        Alias for `sublime_lib.view.append(self.view, text)`
-        + `with unset_read_only:`.
+
+        The text is buffered and only added to the view when flushing, so that
+        many small writes (e.g. one per error) result in a single edit.
+        """
+        with self._buffer_lock:
+            self._buffer.append(text)
+            self._buffered += len(text)
+            full = self._buffered >= self.flush_size
+        if full:
+            self.flush()
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        with self._buffer_lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        set_timeout(self._timed_flush, self.flush_delay)
+
+    def _timed_flush(self):
+        with self._buffer_lock:
+            self._flush_scheduled = False
+        # Don't wait for a flush on another thread (which might be waiting
+        # for the main thread to run its edit), just try again later
+        if not self.flush(blocking=False):
+            self._schedule_flush()
+
+    def flush(self, blocking=True):
+        """Writes all buffered text to the output panel in a single edit.
+
+        Returns `False` if `blocking` is false and another flush is running.
         """
-        with unset_read_only(self.view):
-            append(self.view, text)
+        if not self._edit_lock.acquire(blocking):
+            return False
+        try:
+            with self._buffer_lock:
+                text = ''.join(self._buffer)
+                del self._buffer[:]
+                self._buffered = 0
+            self._append(text)
+        finally:
+            self._edit_lock.release()
+        return True
 
     def write_line(self, text=''):
         """Appends `text` to the output panel and starts a new line.
@@ -175,8 +268,12 @@ class OutputPanel(object):
         """Clears the output panel.
         Alias for `sublime_lib.view.clear(self.view)`.
         """
-        with unset_read_only(self.view):
-            clear(self.view)
+        with self._edit_lock:
+            with self._buffer_lock:
+                del self._buffer[:]
+                self._buffered = 0
+            with unset_read_only(self.view):
+                clear(self.view)
 
     def show(self):
         """Makes the output panel visible.
@@ -193,10 +290,14 @@ class OutputPanel(object):
     def finish(self):
         """Things that are required to use the output panel properly.
 
-        Set the selection to the start, so that next_result will work as
-        expected. Also shows the panel if text has been added.
+        Write buffered text, re-create the panel if the result settings
+        changed and set the selection to the start, so that next_result will
+        work as expected. Also shows the panel if text has been added.
         """
-        self.set_path()
+        self.flush()
+        self._update_result_settings()
+        if self._results_changed:
+            self._recreate()
         self.view.sel().clear()
         self.view.sel().add(Region(0))
         if self.auto_show:
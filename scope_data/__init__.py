@@ -3,99 +3,13 @@ import sys
 if sys.version_info[0] > 2:
     basestring = str
 
-__all__ = ["COMPILED_NODES", "COMPILED_HEADS"]
-
-
-# https://manual.macromates.com/en/language_grammars#naming_conventions
-DATA = """
-    comment
-        line
-            double-slash
-            double-dash
-            number-sign
-            percentage
-        block
-            documentation
-
-    constant
-        numeric
-        character
-            escape
-        language
-        other
-
-    entity
-        name
-            function
-            type
-            tag
-            section
-        other
-            inherited-class
-            attribute-name
-
-    invalid
-        illegal
-        deprecated
-
-    keyword
-        control
-        operator
-        other
-
-    markup
-        underline
-            link
-        bold
-        heading
-        italic
-        list
-            numbered
-            unnumbered
-        quote
-        raw
-        other
-
-    meta
-
-    storage
-        type
-        modifier
-
-    string
-        quoted
-            single
-            double
-            triple
-            other
-        unquoted
-        interpolated
-        regexp
-        other
-
-    support
-        function
-        class
-        type
-        constant
-        variable
-        other
-
-    variable
-        parameter
-        language
-        other
-
-    source
-
-    text
-
-    punctuation
-        definition
-        section
-        separator
-        terminator
-"""
+__all__ = ["COMPILED_NODES", "COMPILED_HEADS", "NODES_BY_PATH", "load", "add_scopes",
+           "find_path", "completions"]
+
+
+# The naming conventions are maintained in `build.py` and precompiled into
+# `compiled.py`, which is only imported by `load()` on first use. This keeps
+# plugin startup fast.
 
 
 class NodeList(list):
@@ -104,33 +18,45 @@ class NodeList(list):
         * find(name)
         * find_all(name)
         * to_completion()
+
+    Lookups by name and the completions are cached until the length of the
+    list changes.
     """
+    _cache = None
+
+    def _cached(self):
+        cache = self._cache
+        if cache is None or cache[0] != len(self):
+            names = {}
+            for node in self:
+                names.setdefault(node.name, []).append(node)
+            completions = [(n.name + "\tscope", n.name) for n in self]
+            cache = self._cache = (len(self), names, completions)
+        return cache
+
     def find(self, name):
-        for node in self:
-            if node == name:
-                return node
-        return None
+        nodes = self._cached()[1].get(name)
+        return nodes[0] if nodes else None
 
     def find_all(self, name):
-        res = NodeList()
-        for node in self:
-            if node == name:
-                res.append(node)
-        return res
+        return NodeList(self._cached()[1].get(name, ()))
 
     def to_completion(self):
-        # return zip(self, self)
-        return [(n.name + "\tscope", n.name) for n in self]
+        # Shared between calls, don't modify
+        return self._cached()[2]
 
 
 COMPILED_NODES = NodeList()
 COMPILED_HEADS = NodeList()
+# Full dotted path -> ScopeNode
+NODES_BY_PATH = {}
 
 
 class ScopeNode(object):
     """
     Attributes:
         * name
+        * path | full dotted path, e.g. "comment.line"
         * parent
         * children
         * level | unused
@@ -141,6 +67,7 @@ class ScopeNode(object):
 
     def __init__(self, name, parent=None, children=None):
         self.name = name
+        self.path = parent.path + '.' + name if parent else name
         self.parent = parent
         self.children = children or NodeList()
         self.level = parent and parent.level + 1 or 1
@@ -156,7 +83,7 @@ class ScopeNode(object):
 
     def __eq__(self, other):
         if isinstance(other, basestring):
-            return str(self) == other
+            return self.name == other
 
     def __str__(self):
         return self.name
@@ -170,37 +97,78 @@ class ScopeNode(object):
 
 #######################################
 
-# parse the DATA string
-lines = DATA.split("\n")
-
-# some variables
-indent = " " * 4
-indent_level = 0
-indents = {}
-
-# process lines
-# Note: expects sane indentation (such as only indent by 1 `indent` at a time)
-for line in lines:
-    if line.isspace() or not len(line):
-        # skip blank lines
-        continue
-    if line.startswith(indent * (indent_level + 1)):
-        # indent increased
-        indent_level += 1
-    if not line.startswith(indent * indent_level):
-        # indent decreased
-        for level in range(indent_level - 1, 0, -1):
-            if line.startswith(indent * level):
-                indent_level = level
-                break
-
-    parent = indents[indent_level - 1] if indent_level - 1 in indents else None
-    node = ScopeNode(line.strip(), parent)
-    indents[indent_level] = node
-
-    if parent:
-        parent.add_child(node)
-    else:
-        COMPILED_HEADS.append(node)
+_loaded = False
+
 
-    COMPILED_NODES.append(node)
+def load():
+    """Build the nodes from the precompiled tree, if not already done.
+
+    `COMPILED_NODES`, `COMPILED_HEADS` and `NODES_BY_PATH` are empty until
+    this was called. The functions below call it automatically.
+    """
+    global _loaded
+    if _loaded:
+        return
+    from .compiled import TREE
+
+    def add(items, parent):
+        for name, children in items:
+            node = ScopeNode(name, parent)
+            if parent:
+                parent.add_child(node)
+            else:
+                COMPILED_HEADS.append(node)
+            COMPILED_NODES.append(node)
+            NODES_BY_PATH.setdefault(node.path, node)
+            add(children, node)
+
+    add(TREE, None)
+    _loaded = True
+
+
+def add_scopes(scopes):
+    """Merge dotted scope names (e.g. harvested from syntax definitions) into the tree.
+
+    Returns the number of added nodes.
+    """
+    load()
+    added = 0
+    for scope in scopes:
+        parent = None
+        path = None
+        for name in scope.split('.'):
+            if not name:
+                # Skip empty segments of invalid names like "a..b" or "a."
+                continue
+            path = path + '.' + name if path else name
+            node = NODES_BY_PATH.get(path)
+            if node is None:
+                node = NODES_BY_PATH[path] = ScopeNode(name, parent)
+                if parent:
+                    parent.add_child(node)
+                else:
+                    COMPILED_HEADS.append(node)
+                COMPILED_NODES.append(node)
+                added += 1
+            parent = node
+    return added
+
+
+def find_path(path):
+    """Return the node for a full dotted path like "comment.line" or `None`."""
+    load()
+    return NODES_BY_PATH.get(path)
+
+
+def completions(path):
+    """Return the completions for the children of `path` or `None` if there are none.
+
+    The empty path returns the completions for the head nodes.
+    """
+    load()
+    if not path:
+        nodes = COMPILED_HEADS
+    else:
+        node = find_path(path)
+        nodes = node and node.children
+    return nodes.to_completion() if nodes else None
@@ -0,0 +1,156 @@
+"""Generate `compiled.py` from the scope naming conventions in `DATA`.
+
+Run this after editing `DATA` (from the directory containing the package):
+
+    python -m CSScheme.scope_data.build [--check]
+"""
+
+import os
+import sys
+
+__all__ = ["DATA", "parse", "render", "main"]
+
+
+# https://manual.macromates.com/en/language_grammars#naming_conventions
+DATA = """
+    comment
+        line
+            double-slash
+            double-dash
+            number-sign
+            percentage
+        block
+            documentation
+
+    constant
+        numeric
+        character
+            escape
+        language
+        other
+
+    entity
+        name
+            function
+            type
+            tag
+            section
+        other
+            inherited-class
+            attribute-name
+
+    invalid
+        illegal
+        deprecated
+
+    keyword
+        control
+        operator
+        other
+
+    markup
+        underline
+            link
+        bold
+        heading
+        italic
+        list
+            numbered
+            unnumbered
+        quote
+        raw
+        other
+
+    meta
+
+    storage
+        type
+        modifier
+
+    string
+        quoted
+            single
+            double
+            triple
+            other
+        unquoted
+        interpolated
+        regexp
+        other
+
+    support
+        function
+        class
+        type
+        constant
+        variable
+        other
+
+    variable
+        parameter
+        language
+        other
+
+    source
+
+    text
+
+    punctuation
+        definition
+        section
+        separator
+        terminator
+"""
+
+
+def parse(data):
+    """Parse the indented `data` into a tree of nested `(name, children)` tuples.
+
+    Note: expects sane indentation (such as only indent by 1 `indent` at a time)
+    """
+    indent = " " * 4
+    # Children lists of the current path, starting with the heads
+    stack = [(-1, [])]
+    for line in data.split("\n"):
+        if line.isspace() or not len(line):
+            # skip blank lines
+            continue
+        level = (len(line) - len(line.lstrip(" "))) // len(indent)
+        while stack[-1][0] >= level:
+            stack.pop()
+        children = []
+        stack[-1][1].append((line.strip(), children))
+        stack.append((level, children))
+
+    def freeze(nodes):
+        return tuple((name, freeze(children)) for name, children in nodes)
+
+    return freeze(stack[0][1])
+
+
+def render(tree):
+    import pprint
+    return ("# Generated by build.py from the naming conventions in DATA, do not edit.\n"
+            "# flake8: noqa\n"
+            "# (name, children) tuples\n"
+            "TREE = %s\n" % pprint.pformat(tree, indent=1, width=99))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compiled.py")
+    text = render(parse(DATA))
+    if "--check" in argv:
+        with open(path) as f:
+            if f.read() != text:
+                print("%s is out of date" % path)
+                return 1
+        return 0
+    with open(path, "w") as f:
+        f.write(text)
+    print("Wrote %s" % path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# Generated by build.py from the naming conventions in DATA, do not edit.
+# flake8: noqa
+# (name, children) tuples
+TREE = (('comment',
+  (('line', (('double-slash', ()), ('double-dash', ()), ('number-sign', ()), ('percentage', ()))),
+   ('block', (('documentation', ()),)))),
+ ('constant',
+  (('numeric', ()), ('character', (('escape', ()),)), ('language', ()), ('other', ()))),
+ ('entity',
+  (('name', (('function', ()), ('type', ()), ('tag', ()), ('section', ()))),
+   ('other', (('inherited-class', ()), ('attribute-name', ()))))),
+ ('invalid', (('illegal', ()), ('deprecated', ()))),
+ ('keyword', (('control', ()), ('operator', ()), ('other', ()))),
+ ('markup',
+  (('underline', (('link', ()),)),
+   ('bold', ()),
+   ('heading', ()),
+   ('italic', ()),
+   ('list', (('numbered', ()), ('unnumbered', ()))),
+   ('quote', ()),
+   ('raw', ()),
+   ('other', ()))),
+ ('meta', ()),
+ ('storage', (('type', ()), ('modifier', ()))),
+ ('string',
+  (('quoted', (('single', ()), ('double', ()), ('triple', ()), ('other', ()))),
+   ('unquoted', ()),
+   ('interpolated', ()),
+   ('regexp', ()),
+   ('other', ()))),
+ ('support',
+  (('function', ()),
+   ('class', ()),
+   ('type', ()),
+   ('constant', ()),
+   ('variable', ()),
+   ('other', ()))),
+ ('variable', (('parameter', ()), ('language', ()), ('other', ()))),
+ ('source', ()),
+ ('text', ()),
+ ('punctuation', (('definition', ()), ('section', ()), ('separator', ()), ('terminator', ()))))
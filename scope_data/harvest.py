@@ -0,0 +1,216 @@
+"""Harvest scope names from syntax definitions for the completions.
+
+Scans .tmLanguage and .sublime-syntax files in directories as well as inside
+.sublime-package archives. Instead of parsing the files, scope names are
+extracted with regular expressions, which is a lot faster and only needs the
+text of one file in memory at a time.
+
+The results are kept in a `ScopeIndex` that can be saved to a JSON cache file.
+Scope names are shared between sources, since most syntaxes use the same ones.
+On `update`, only files (or archives) whose modification time or size changed
+are scanned again.
+
+Run from the directory containing the package to print statistics:
+
+    python -m CSScheme.scope_data.harvest [--cache FILE] PATH ...
+"""
+
+import json
+import os
+import re
+import sys
+import zipfile
+
+__all__ = ["SYNTAX_EXTS", "scan_text", "iter_sources", "ScopeIndex", "main"]
+
+
+SYNTAX_EXTS = ('.tmLanguage', '.sublime-syntax')
+ARCHIVE_EXT = '.sublime-package'
+
+_tmlanguage_reg = re.compile(r"<key>(?:name|contentName|scopeName)</key>\s*"
+                             r"<string>([^<]*)</string>")
+_syntax_reg = re.compile(r"^[ \t-]*(?:scope|meta_scope|meta_content_scope|\d+)[ \t]*:"
+                         r"[ \t]*(.+?)[ \t]*$",
+                         re.MULTILINE)
+# Scope names are lowercase by convention, which also excludes the display
+# names of tmLanguage files. Captures like `$1` can't be resolved statically.
+_scope_reg = re.compile(r"^[a-z][\w+-]*(?:\.[\w+-]+)*$")
+
+
+def _strip_yaml(value):
+    """Remove quotes and trailing comments from a YAML scalar."""
+    if value[:1] in ('"', "'"):
+        end = value.find(value[0], 1)
+        return value[1:end] if end > 0 else value[1:]
+    return value.split(' #', 1)[0]
+
+
+def scan_text(name, text):
+    """Return the set of scope names in the text of a syntax definition file `name`."""
+    if name.endswith('.sublime-syntax'):
+        values = (_strip_yaml(v) for v in _syntax_reg.findall(text))
+    else:
+        values = _tmlanguage_reg.findall(text)
+
+    scopes = set()
+    for value in values:
+        for scope in value.split():
+            if _scope_reg.match(scope):
+                scopes.add(scope)
+    return scopes
+
+
+def iter_sources(roots):
+    """Yield `(path, is_archive)` for all syntax files and package archives in `roots`.
+
+    `roots` may contain directories and file paths.
+    """
+    for root in roots:
+        if os.path.isfile(root):
+            if root.endswith(SYNTAX_EXTS):
+                yield os.path.abspath(root), False
+            elif root.endswith(ARCHIVE_EXT):
+                yield os.path.abspath(root), True
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(SYNTAX_EXTS):
+                    yield os.path.abspath(os.path.join(dirpath, filename)), False
+                elif filename.endswith(ARCHIVE_EXT):
+                    yield os.path.abspath(os.path.join(dirpath, filename)), True
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8', 'replace')
+
+
+def _scan_source(path, is_archive):
+    scopes = set()
+    if not is_archive:
+        return scan_text(path, _read(path))
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.namelist():
+            if member.endswith(SYNTAX_EXTS):
+                text = archive.read(member).decode('utf-8', 'replace')
+                scopes |= scan_text(member, text)
+    return scopes
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime, st.st_size]
+
+
+class ScopeIndex(object):
+
+    """Scope names per syntax file (or package archive), updated incrementally.
+
+    * cache_file - optional path of a JSON file to load from and save to
+    * max_scopes - upper bound for the number of scopes stored per source, so
+                   a single generated syntax can't blow up the index
+    """
+
+    version = 2
+
+    def __init__(self, cache_file=None, max_scopes=5000):
+        self.cache_file = cache_file
+        self.max_scopes = max_scopes
+        # path -> [mtime, size, [scopes]]
+        self.sources = {}
+        if cache_file:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (OSError, IOError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            return
+        try:
+            table = [sys.intern(scope) for scope in data['scopes']]
+            self.sources = dict((path, [mtime, size, [table[i] for i in indices]])
+                                for path, (mtime, size, indices) in data['sources'].items())
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            # Damaged or written by something else, everything is rescanned
+            self.sources = {}
+
+    def save(self):
+        directory = os.path.dirname(self.cache_file)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        table = self.scopes()
+        numbers = dict((scope, i) for i, scope in enumerate(table))
+        sources = dict((path, [mtime, size, [numbers[scope] for scope in scopes]])
+                       for path, (mtime, size, scopes) in self.sources.items())
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'version': self.version, 'scopes': table, 'sources': sources}, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def update(self, roots):
+        """Rescan changed sources in `roots` and forget removed ones.
+
+        Returns the number of (re)scanned sources. Saves the cache file if
+        anything changed.
+        """
+        scanned = 0
+        seen = set()
+        for path, is_archive in iter_sources(roots):
+            seen.add(path)
+            stat = _stat(path)
+            entry = self.sources.get(path)
+            if stat is None or (entry and entry[:2] == stat):
+                continue
+            try:
+                scopes = _scan_source(path, is_archive)
+            except (OSError, IOError, zipfile.BadZipfile):
+                scopes = set()
+            scopes = [sys.intern(scope) for scope in sorted(scopes)[:self.max_scopes]]
+            self.sources[path] = stat + [scopes]
+            scanned += 1
+
+        removed = set(self.sources) - seen
+        for path in removed:
+            del self.sources[path]
+
+        if (scanned or removed) and self.cache_file:
+            self.save()
+        return scanned
+
+    def scopes(self):
+        """Return the sorted list of all harvested scope names."""
+        scopes = set()
+        for entry in self.sources.values():
+            scopes.update(entry[2])
+        return sorted(scopes)
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    arg_parser = argparse.ArgumentParser(prog="python -m CSScheme.scope_data.harvest",
+                                         description=__doc__.split("\n\n")[0])
+    arg_parser.add_argument('paths', nargs='+', metavar='PATH',
+                            help="directories, syntax files or .sublime-package files")
+    arg_parser.add_argument('--cache', metavar='FILE',
+                            help="JSON file to keep the index in between runs")
+    args = arg_parser.parse_args(argv)
+
+    start = time.time()
+    index = ScopeIndex(args.cache)
+    scanned = index.update(args.paths)
+    scopes = index.scopes()
+    print("%d sources, %d scanned, %d scopes in %.3fs"
+          % (len(index.sources), scanned, len(scopes), time.time() - start))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
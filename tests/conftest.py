@@ -0,0 +1,21 @@
+"""
+    Test suite for the package-level modules (converters, scope_data)
+    -----------------------------------------------------------------
+
+These modules use relative imports beyond their own directory, so they need to
+be imported as part of the package, like Sublime Text does. The repository
+itself is registered as the `CSScheme` package here, regardless of the name of
+the directory it is checked out to.
+"""
+
+import os
+import sys
+import types
+
+PACKAGE = 'CSScheme'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ROOT]
+    sys.modules[PACKAGE] = package
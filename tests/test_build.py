@@ -0,0 +1,195 @@
+"""
+    Tests for the headless build pipeline and the batch CLI
+"""
+
+import os
+import plistlib
+
+import pytest
+
+from CSScheme.converters import build, batch
+from CSScheme.converters.reporters import ListReporter
+
+
+SCHEME = """\
+@name "Smoke Test";
+
+* {
+    background: #000;
+    foreground: white;
+}
+
+comment {
+    foreground: rgb(128, 128, 128);
+    fontStyle: italic;
+}
+"""
+
+
+def write(path, text):
+    with open(str(path), 'w') as f:
+        f.write(text)
+    return str(path)
+
+
+def test_build(tmpdir):
+    in_file = write(tmpdir.join("Smoke.csscheme"), SCHEME)
+    out = ListReporter()
+    progress = []
+
+    result = build(out, in_file, {}, progress=progress.append)
+
+    assert result.success
+    assert result.out_file == str(tmpdir.join("Smoke.tmTheme"))
+    assert out.lines == []
+    assert progress == ["Parsing", "Converting", "Writing Smoke.tmTheme"]
+    assert result.report.success
+
+    with open(result.out_file, 'rb') as f:
+        data = plistlib.load(f)
+    assert data['name'] == "Smoke Test"
+    assert data['settings'] == [
+        {'settings': {'background': "#000000", 'foreground': "#FFFFFF"}},
+        {'scope': "comment", 'settings': {'foreground': "#808080", 'fontStyle': "italic"}},
+    ]
+
+
+def test_build_hidden(tmpdir):
+    in_file = write(tmpdir.join("Hidden.csscheme"), "@hidden true;\n" + SCHEME)
+    result = build(ListReporter(), in_file, {})
+    assert result.out_file == str(tmpdir.join("Hidden.hidden-tmTheme"))
+
+
+def test_build_errors(tmpdir):
+    in_file = write(tmpdir.join("Broken.csscheme"),
+                    SCHEME.replace("fontStyle: italic", "fontStyle: italicc"))
+    out = ListReporter()
+
+    result = build(out, in_file, {})
+
+    assert not result.success
+    assert result.css_errors
+    assert not tmpdir.join("Broken.tmTheme").check()
+    assert out.lines[0] == "Error in CSScheme data:"
+    assert "Broken.csscheme:10:16:" in out.lines
+
+
+def test_build_unknown_extension(tmpdir):
+    out = ListReporter()
+    result = build(out, write(tmpdir.join("scheme.txt"), SCHEME), {})
+    assert not result.success
+    assert result.conv is None
+    assert out.lines[0].startswith("Couldn't match extension")
+
+
+def test_collect_files(tmpdir):
+    for name in ("a.csscheme", "b.scsscheme", "notes.txt",
+                 "sub/c.styluscheme", "sub/deeper/d.sasscheme", "sub/e.tmTheme"):
+        tmpdir.join(name).ensure()
+    root = str(tmpdir)
+
+    def rel(paths):
+        return [os.path.relpath(p, root).replace(os.sep, '/') for p in paths]
+
+    assert rel(batch.collect_files([root])) == [
+        "a.csscheme", "b.scsscheme", "sub/c.styluscheme", "sub/deeper/d.sasscheme"]
+    assert rel(batch.collect_files([root], batch.TMTHEME_PATTERNS)) == ["sub/e.tmTheme"]
+    # Files are taken as they are, globs only match files
+    assert rel(batch.collect_files([os.path.join(root, "notes.txt"),
+                                    os.path.join(root, "sub", "*")])) == [
+        "notes.txt", "sub/c.styluscheme", "sub/e.tmTheme"]
+    # No duplicates, missing paths are ignored
+    assert rel(batch.collect_files([root, os.path.join(root, "a.csscheme"),
+                                    os.path.join(root, "missing")])) == rel(
+        batch.collect_files([root]))
+
+
+def test_convert_files(tmpdir):
+    good = write(tmpdir.join("Good.csscheme"), SCHEME)
+    bad = write(tmpdir.join("Bad.csscheme"), "* { foreground: nocolor; }")
+
+    results = sorted(batch.convert_files([good, bad], jobs=1))
+
+    assert [(path, out_file) for path, out_file, _, _, _ in results] == [
+        (bad, None), (good, str(tmpdir.join("Good.tmTheme")))]
+    assert "unknown color name 'nocolor'" in results[0][3]
+    assert results[1][4]['success']
+
+
+def write_tmtheme(path):
+    """Build `SCHEME` and move the tmTheme to `path`."""
+    result = build(ListReporter(), write(path.dirpath().join("Source.csscheme"), SCHEME), {})
+    os.rename(result.out_file, str(path))
+    return str(path)
+
+
+def test_convert_tmtheme_files(tmpdir):
+    theme = write_tmtheme(tmpdir.join("Theme.tmTheme"))
+    hidden = write_tmtheme(tmpdir.join("Hidden.hidden-tmTheme"))
+    broken = write(tmpdir.join("Broken.tmTheme"), "<plist>")
+
+    results = sorted(batch.convert_tmtheme_files([theme, hidden, broken], jobs=1))
+    assert [(path, out_file) for path, out_file, _, _, _ in results] == [
+        (broken, None),
+        (hidden, str(tmpdir.join("Hidden.csscheme"))),
+        (theme, str(tmpdir.join("Theme.csscheme"))),
+    ]
+    assert all(report is None for _, _, _, _, report in results)
+    assert not tmpdir.join("Broken.csscheme.tmp").check()
+    assert tmpdir.join("Hidden.csscheme").read().startswith('@name "Smoke Test";\n\n@hidden true;')
+
+    # The result converts back to the same data (replacing the original)
+    with open(theme, 'rb') as f:
+        data = plistlib.load(f)
+    result = build(ListReporter(), str(tmpdir.join("Theme.csscheme")), {})
+    assert result.out_file == theme
+    with open(theme, 'rb') as f:
+        assert plistlib.load(f) == data
+
+
+def test_convert_tmtheme_files_existing(tmpdir):
+    theme = write_tmtheme(tmpdir.join("Theme.tmTheme"))
+    existing = write(tmpdir.join("Theme.csscheme"), "keep me")
+
+    (path, out_file, _, log, _), = batch.convert_tmtheme_files([theme], jobs=1)
+    assert out_file is None
+    assert log == "%s already exists, use --overwrite to replace it\n" % existing
+    assert tmpdir.join("Theme.csscheme").read() == "keep me"
+
+    (path, out_file, _, log, _), = batch.convert_tmtheme_files([theme], jobs=1, overwrite=True)
+    assert out_file == existing
+    assert tmpdir.join("Theme.csscheme").read().startswith('@name "Smoke Test";')
+
+    # SCSScheme goes to a different file
+    (path, out_file, _, log, _), = batch.convert_tmtheme_files([theme], jobs=1, scss=True)
+    assert out_file == str(tmpdir.join("Theme.scsscheme"))
+
+
+def test_main_from_tmtheme(tmpdir, capsys):
+    write_tmtheme(tmpdir.join("Theme.tmTheme"))
+
+    assert batch.main(["--from-tmtheme", "-j", "1", str(tmpdir)]) == 0
+    assert tmpdir.join("Theme.csscheme").check()
+    output = capsys.readouterr()[0]
+    assert "[ OK ] " in output
+    assert "1 converted, 0 failed, 1 total" in output
+
+    # Existing files fail without --overwrite
+    assert batch.main(["--from-tmtheme", "-j", "1", "-q", str(tmpdir)]) == 1
+    assert "[FAIL] " in capsys.readouterr()[0]
+
+
+@pytest.mark.parametrize(('args', 'expected_error'), [
+    (["-t", "-m"], "--minimize can't be used with --from-tmtheme"),
+    (["-t", "-w"], "--watch with --from-tmtheme requires --overwrite"),
+    (["--overwrite"], "--overwrite requires --from-tmtheme"),
+    (["--scss"], "--scss requires --from-tmtheme"),
+    (["-j", "0"], "argument -j/--jobs: expected a positive number, got '0'"),
+    (["--jobs", "-2"], "argument -j/--jobs: expected a positive number, got '-2'"),
+    (["-j", "two"], "argument -j/--jobs: expected a positive number, got 'two'"),
+])
+def test_main_invalid_options(tmpdir, capsys, args, expected_error):
+    with pytest.raises(SystemExit) as excinfo:
+        batch.main(args + [str(tmpdir)])
+    assert excinfo.value.code == 2
+    assert expected_error in capsys.readouterr()[1]
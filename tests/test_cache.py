@@ -0,0 +1,163 @@
+"""
+    Tests for the import graph and the cache of compiled pre-processor output
+"""
+
+import os
+import sys
+
+from CSScheme import converters
+from CSScheme.converters import cache
+from CSScheme.converters.reporters import ListReporter
+
+
+def write(path, text):
+    path.ensure()
+    path.write(text)
+    return str(path)
+
+
+def find_scss_imports(path):
+    conv = converters.SCSSConverter
+    return cache.find_imports(path, conv.import_reg, conv.import_exts)
+
+
+def test_find_imports(tmpdir):
+    root = write(tmpdir.join("main.scsscheme"),
+                 '@import "colors", \'partials/base\';\n'
+                 '@import "lib/index-dir";\n'
+                 '@import "missing";\n'
+                 '* { foreground: $fg; }\n')
+    colors = write(tmpdir.join("_colors.scss"), '@import "main";\n$fg: #fff;')
+    base = write(tmpdir.join("partials", "base.scss"), '@import "../colors";')
+    index = write(tmpdir.join("lib", "index-dir", "index.scss"), "")
+
+    assert find_scss_imports(root) == set(os.path.abspath(p)
+                                          for p in (root, colors, base, index))
+    # Works from any file in the graph, cycles are no problem
+    assert find_scss_imports(base) == set(os.path.abspath(p) for p in (root, colors, base, index))
+
+
+def test_find_imports_stylus(tmpdir):
+    conv = converters.StylusConverter
+    root = write(tmpdir.join("main.styluscheme"), "@import 'vars'\n@require 'mixins.styl'\n")
+    vars_ = write(tmpdir.join("vars.styl"), "fg = #fff")
+    mixins = write(tmpdir.join("mixins.styl"), "")
+
+    assert cache.find_imports(root, conv.import_reg, conv.import_exts) == \
+        set(os.path.abspath(p) for p in (root, vars_, mixins))
+
+
+def test_find_imports_unreadable(tmpdir):
+    path = str(tmpdir.join("missing.scsscheme"))
+    assert find_scss_imports(path) == set([os.path.abspath(path)])
+
+
+def test_cache_invalidation(tmpdir):
+    root = write(tmpdir.join("main.scsscheme"), '@import "colors";')
+    colors = write(tmpdir.join("_colors.scss"), "$fg: #fff;")
+    c = cache.CompileCache()
+
+    c.put('key', [root, colors], "result")
+    assert c.get('key') == "result"
+    assert c.dependencies('key') == set([root, colors])
+
+    tmpdir.join("_colors.scss").write("$fg: #000;")
+    assert c.get('key') is None
+    # Dropped, even if the change is reverted
+    tmpdir.join("_colors.scss").write("$fg: #fff;")
+    assert c.get('key') is None
+    assert c.dependencies('key') == set()
+
+
+def test_cache_deleted_dependency(tmpdir):
+    path = write(tmpdir.join("_colors.scss"), "")
+    c = cache.CompileCache()
+    c.put('key', [path], "result")
+    os.remove(path)
+    assert c.get('key') is None
+
+
+def test_cache_given_hashes(tmpdir):
+    path = write(tmpdir.join("main.scsscheme"), "old")
+    other = write(tmpdir.join("other.scss"), "")
+    hashes = cache.hash_files([path])
+    tmpdir.join("main.scsscheme").write("new")
+
+    c = cache.CompileCache()
+    c.put('key', [path, other], "result", hashes)
+    # The file changed since the hashes were taken
+    assert c.get('key') is None
+
+    c.put('key', [path, other], "result", cache.hash_files([path]))
+    assert c.get('key') == "result"
+
+
+def test_cache_lru():
+    c = cache.CompileCache(max_entries=2)
+    c.put('a', [], 1)
+    c.put('b', [], 2)
+    assert c.get('a') == 1
+    c.put('c', [], 3)
+    assert (c.get('a'), c.get('b'), c.get('c')) == (1, None, 3)
+
+
+class CountingConverter(converters.SCSSConverter):
+
+    """Prints the source and counts its invocations in a file next to it.
+
+    If a ".modify" file exists next to it, the import "_colors.scss" is changed
+    while "compiling".
+    """
+
+    name = "CountingScheme"
+    ext = "countingscheme"
+    default_executable = "countc"
+    cmd_params = ('-c', "import os, sys\n"
+                        "path = sys.argv[1]\n"
+                        "with open(path + '.count', 'a') as f: f.write('x')\n"
+                        "sys.stdout.write(open(path).read())\n"
+                        "if os.path.exists(path + '.modify'):\n"
+                        "    colors = os.path.join(os.path.dirname(path), '_colors.scss')\n"
+                        "    with open(colors, 'a') as f: f.write('// saved')\n")
+
+
+def runs(path):
+    with open(path + '.count') as f:
+        return len(f.read())
+
+
+def test_convert_cached(tmpdir):
+    cache.compile_cache.clear()
+    root = write(tmpdir.join("main.countingscheme"), '@import "colors";\n* {}')
+    write(tmpdir.join("_colors.scss"), "$fg: #fff;")
+    executables = {'countc': sys.executable}
+
+    for _ in range(2):
+        text = CountingConverter.convert(ListReporter(), root, executables)
+        assert text == '@import "colors";\n* {}'
+    assert runs(root) == 1
+
+    tmpdir.join("_colors.scss").write("$fg: #000;")
+    CountingConverter.convert(ListReporter(), root, executables)
+    assert runs(root) == 2
+
+    # A different executable doesn't use the cached output
+    os.symlink(sys.executable, str(tmpdir.join("python")))
+    CountingConverter.convert(ListReporter(), root, {'countc': str(tmpdir.join("python"))})
+    assert runs(root) == 3
+    cache.compile_cache.clear()
+
+
+def test_convert_modified_while_compiling(tmpdir):
+    cache.compile_cache.clear()
+    root = write(tmpdir.join("main.countingscheme"), '@import "colors";\n* {}')
+    write(tmpdir.join("_colors.scss"), "$fg: #fff;")
+    executables = {'countc': sys.executable}
+
+    tmpdir.join("main.countingscheme.modify").ensure()
+    CountingConverter.convert(ListReporter(), root, executables)
+    tmpdir.join("main.countingscheme.modify").remove()
+    # The output is from before the import was saved, so it must not be reused
+    CountingConverter.convert(ListReporter(), root, executables)
+    assert runs(root) == 2
+    cache.compile_cache.clear()
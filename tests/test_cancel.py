@@ -0,0 +1,137 @@
+"""
+    Tests for cancelling conversions and builds
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from CSScheme import converters
+from CSScheme.converters import worker
+from CSScheme.converters.cache import compile_cache
+from CSScheme.converters.reporters import ListReporter
+
+
+# Answers pings, but never finishes compiling
+SLOW_SERVER_CMD = (sys.executable, '-c', """if True:
+    import json, sys, time
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get('ping'):
+            print(json.dumps({'id': request['id'], 'pong': True}))
+            sys.stdout.flush()
+        else:
+            time.sleep(30)
+""")
+
+
+class SlowConverter(converters.SCSSConverter):
+
+    """Runs a python one-liner that writes its pid to the source file and sleeps."""
+
+    name = "SlowScheme"
+    ext = "slowscheme"
+    default_executable = "slowc"
+    cmd_params = ('-c', "import os, sys, time\n"
+                        "with open(sys.argv[1], 'w') as f: f.write(str(os.getpid()))\n"
+                        "time.sleep(30)")
+    import_reg = None
+
+
+@pytest.fixture(autouse=True)
+def cleanup(request):
+    compile_cache.clear()
+    request.addfinalizer(compile_cache.clear)
+    request.addfinalizer(worker.shutdown_workers)
+
+
+def cancel_later(cancel, delay=0.5):
+    timer = threading.Timer(delay, cancel.cancel)
+    timer.start()
+    return timer
+
+
+def test_cancellation_callbacks():
+    cancel = converters.Cancellation()
+    called = []
+
+    def removed():
+        called.append(2)
+
+    cancel.on_cancel(lambda: called.append(1))
+    cancel.on_cancel(removed)
+    cancel.remove(removed)
+    cancel.check()
+    assert called == []
+
+    cancel.cancel()
+    assert called == [1]
+    with pytest.raises(converters.BuildCancelled):
+        cancel.check()
+
+    # Called right away when already cancelled, and only once
+    cancel.on_cancel(lambda: called.append(3))
+    cancel.cancel()
+    assert called == [1, 3]
+
+
+def test_cancel_executable(tmpdir):
+    path = tmpdir.join("a.slowscheme")
+    path.write("")
+    cancel = converters.Cancellation()
+    out = ListReporter()
+
+    start = time.time()
+    timer = cancel_later(cancel)
+    try:
+        with pytest.raises(converters.BuildCancelled):
+            SlowConverter.convert(out, str(path), {'slowc': sys.executable}, cancel=cancel)
+    finally:
+        timer.cancel()
+    assert time.time() - start < 10
+    assert out.lines == []
+
+    # The process was started and is gone now
+    pid = int(path.read())
+    if os.name != 'nt':
+        with pytest.raises(OSError):
+            os.kill(pid, 0)
+
+
+def test_cancel_server(tmpdir):
+    path = tmpdir.join("a.slowscheme")
+    path.write("")
+    cancel = converters.Cancellation()
+    out = ListReporter()
+
+    start = time.time()
+    timer = cancel_later(cancel)
+    try:
+        with pytest.raises(converters.BuildCancelled):
+            SlowConverter.convert(out, str(path), {'slowc': sys.executable},
+                                  {'slowc': SLOW_SERVER_CMD}, cancel)
+    finally:
+        timer.cancel()
+    assert time.time() - start < 10
+    # No fallback to the executable
+    assert out.lines == []
+    assert path.read() == ""
+    assert not worker.get_worker(SLOW_SERVER_CMD).is_alive()
+
+
+def test_build_cancelled_before_start(tmpdir):
+    path = tmpdir.join("a.csscheme")
+    path.write("@name 'x'; * { foreground: #fff; }")
+    cancel = converters.Cancellation()
+    cancel.cancel()
+    out = ListReporter()
+    progress = []
+
+    with pytest.raises(converters.BuildCancelled):
+        converters.build(out, str(path), {}, cancel=cancel, progress=progress.append)
+    assert progress == []
+    assert out.lines == []
+    assert not tmpdir.join("a.tmTheme").check()
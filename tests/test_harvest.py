@@ -0,0 +1,208 @@
+"""
+    Tests for harvesting scope names from syntax definitions
+"""
+
+import json
+import os
+import zipfile
+
+import pytest
+
+from CSScheme.scope_data import harvest
+
+
+SUBLIME_SYNTAX = """\
+%YAML 1.2
+---
+name: Example
+scope: source.example
+file_extensions: [ex]
+contexts:
+  main:
+    - match: '"'
+      scope: punctuation.definition.string.begin.example
+      push:
+        - meta_scope: string.quoted.double.example
+        - meta_content_scope: "meta.string-contents.example"
+        - match: '"'
+          scope: punctuation.definition.string.end.example # a comment
+          pop: true
+    - match: (def)\\s+(\\w+)
+      captures:
+        1: storage.type.function.example keyword.declaration.example
+        2: entity.name.function.example
+    - match: '\\$(\\w+)'
+      scope: variable.other.$1.example
+    - match: x
+      scope: 'constant.language.example'
+"""
+
+TMLANGUAGE = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<plist version="1.0">
+<dict>
+    <key>name</key>
+    <string>Example Language</string>
+    <key>scopeName</key>
+    <string>text.example</string>
+    <key>patterns</key>
+    <array>
+        <dict>
+            <key>name</key>
+            <string>comment.line.example</string>
+            <key>match</key>
+            <string>#.*</string>
+        </dict>
+        <dict>
+            <key>contentName</key>
+            <string>meta.embedded.block.example source.embedded</string>
+            <key>begin</key>
+            <string>```</string>
+        </dict>
+    </array>
+</dict>
+</plist>
+"""
+
+
+def test_scan_sublime_syntax():
+    assert harvest.scan_text("Example.sublime-syntax", SUBLIME_SYNTAX) == set([
+        "source.example",
+        "punctuation.definition.string.begin.example",
+        "string.quoted.double.example",
+        "meta.string-contents.example",
+        "punctuation.definition.string.end.example",
+        "storage.type.function.example",
+        "keyword.declaration.example",
+        "entity.name.function.example",
+        "constant.language.example",
+    ])
+
+
+def test_scan_tmlanguage():
+    # The display name is not lowercase and skipped
+    assert harvest.scan_text("Example.tmLanguage", TMLANGUAGE) == set([
+        "text.example",
+        "comment.line.example",
+        "meta.embedded.block.example",
+        "source.embedded",
+    ])
+
+
+def make_packages(tmpdir):
+    tmpdir.join("Example", "Example.sublime-syntax").write(SUBLIME_SYNTAX, ensure=True)
+    tmpdir.join("Example", "notes.txt").write("scope: not.harvested", ensure=True)
+    archive = str(tmpdir.join("Zipped.sublime-package"))
+    with zipfile.ZipFile(archive, 'w') as z:
+        z.writestr("Syntaxes/Example.tmLanguage", TMLANGUAGE)
+        z.writestr("Other.sublime-syntax", "scope: source.zipped\n")
+        z.writestr("readme.md", "scope: not.harvested")
+    return str(tmpdir.join("Example", "Example.sublime-syntax")), archive
+
+
+def test_iter_sources(tmpdir):
+    syntax, archive = make_packages(tmpdir)
+    assert list(harvest.iter_sources([str(tmpdir)])) == [(archive, True), (syntax, False)]
+    # Files may be given directly
+    assert list(harvest.iter_sources([archive, str(tmpdir.join("Example", "notes.txt"))])) \
+        == [(archive, True)]
+
+
+def test_index_archive(tmpdir):
+    syntax, archive = make_packages(tmpdir)
+    index = harvest.ScopeIndex()
+    assert index.update([str(tmpdir)]) == 2
+
+    assert sorted(index.sources) == [syntax, archive]
+    assert set(index.sources[archive][2]) == set([
+        "source.zipped", "text.example", "comment.line.example",
+        "meta.embedded.block.example", "source.embedded"])
+    assert "source.example" in index.scopes()
+    assert index.scopes() == sorted(index.scopes())
+
+
+def test_index_cache(tmpdir):
+    syntax, archive = make_packages(tmpdir)
+    cache_file = str(tmpdir.join("cache", "index.json"))
+
+    index = harvest.ScopeIndex(cache_file)
+    assert index.update([str(tmpdir)]) == 2
+    scopes = index.scopes()
+
+    # Loaded from the cache, nothing needs to be scanned again
+    index = harvest.ScopeIndex(cache_file)
+    assert index.scopes() == scopes
+    assert index.update([str(tmpdir)]) == 0
+
+    # Changed files are scanned again
+    with open(syntax, 'a') as f:
+        f.write("    - match: y\n      scope: constant.other.new.example\n")
+    assert index.update([str(tmpdir)]) == 1
+    assert "constant.other.new.example" in index.scopes()
+    assert "constant.other.new.example" in harvest.ScopeIndex(cache_file).scopes()
+
+    # A changed mtime is enough
+    st = os.stat(archive)
+    os.utime(archive, (st.st_atime, st.st_mtime + 10))
+    assert index.update([str(tmpdir)]) == 1
+
+    # Removed files are forgotten
+    os.remove(archive)
+    assert index.update([str(tmpdir)]) == 0
+    assert sorted(index.sources) == [syntax]
+    assert "source.zipped" not in harvest.ScopeIndex(cache_file).scopes()
+
+
+def test_index_cache_format(tmpdir):
+    syntax, archive = make_packages(tmpdir)
+    cache_file = str(tmpdir.join("index.json"))
+    harvest.ScopeIndex(cache_file).update([str(tmpdir)])
+
+    with open(cache_file) as f:
+        data = json.load(f)
+    assert data['version'] == harvest.ScopeIndex.version
+    # Scopes are stored once and referenced by index
+    assert data['scopes'] == sorted(data['scopes'])
+    mtime, size, indices = data['sources'][syntax]
+    assert size == os.path.getsize(syntax)
+    assert "source.example" in [data['scopes'][i] for i in indices]
+
+
+@pytest.mark.parametrize('content', [
+    "not json",
+    "[]",
+    '{"version": 1, "scopes": [], "sources": {}}',
+    # Wrong shape for the current version
+    '{"version": 2}',
+    '{"version": 2, "scopes": [], "sources": {"x": 1}}',
+    '{"version": 2, "scopes": [], "sources": []}',
+    '{"version": 2, "scopes": [1], "sources": {}}',
+    '{"version": 2, "scopes": ["a"], "sources": {"x": [0, 0, [1]]}}',
+    '{"version": 2, "scopes": ["a"], "sources": {"x": [0, 0]}}',
+])
+def test_index_invalid_cache(tmpdir, content):
+    syntax, archive = make_packages(tmpdir.mkdir("packages"))
+    cache_file = tmpdir.join("index.json")
+    cache_file.write(content)
+    index = harvest.ScopeIndex(str(cache_file))
+    assert index.sources == {}
+
+    # Rebuilt on the next update
+    assert index.update([str(tmpdir.join("packages"))]) == 2
+    assert harvest.ScopeIndex(str(cache_file)).sources == index.sources
+
+
+def test_index_max_scopes(tmpdir):
+    path = tmpdir.join("Many.sublime-syntax")
+    path.write("".join("  - scope: scope.number%03d\n" % i for i in range(20)))
+    index = harvest.ScopeIndex(max_scopes=5)
+    index.update([str(path)])
+    assert index.scopes() == ["scope.number%03d" % i for i in range(5)]
+
+
+def test_broken_archive(tmpdir):
+    path = tmpdir.join("Broken.sublime-package")
+    path.write("not a zip file")
+    index = harvest.ScopeIndex()
+    assert index.update([str(path)]) == 1
+    assert index.scopes() == []
@@ -0,0 +1,69 @@
+"""
+    Tests for mapping lines of compiled CSS to line number comments
+"""
+
+from CSScheme.converters import LineMap, SCSSConverter
+
+
+SOURCE = """\
+@name "Test";
+/* line 3, /base/dir/main.scss */
+* {
+  foreground: #fff; }
+
+/* line 8, /base/dir/_part.scss */
+source {
+  foreground: red; }
+/* line 12, /base/dir/main.scss */
+comment {
+  foreground: blue; }"""
+
+
+def line_map(source=SOURCE):
+    return LineMap(source, SCSSConverter.lineno_reg, "/base/dir")
+
+
+def test_indices():
+    assert line_map().indices == [1, 5, 8]
+
+
+def test_before_first_marker():
+    assert line_map().context(1) == ['@name "Test";']
+
+
+def test_on_marker():
+    assert line_map().context(2) == ["/* main.scss, line 3 */"]
+    assert line_map().context(6) == ["/* _part.scss, line 8 */"]
+
+
+def test_between_markers():
+    assert line_map().context(4) == ["/* main.scss, line 3 */", "* {", "  foreground: #fff; }"]
+    # The comment on the next line is not used (the old implementation did)
+    assert line_map().context(8) == ["/* _part.scss, line 8 */",
+                                     "source {",
+                                     "  foreground: red; }"]
+
+
+def test_after_last_marker():
+    assert line_map().context(11) == ["/* main.scss, line 12 */",
+                                      "comment {",
+                                      "  foreground: blue; }"]
+
+
+def test_marker_on_first_line():
+    lm = line_map("/* line 1, /base/dir/main.scss */\n* {\n  foreground: #fff; }")
+    assert lm.context(3) == ["/* main.scss, line 1 */", "* {", "  foreground: #fff; }"]
+
+
+def test_max_context():
+    source = "/* line 1, /base/dir/main.scss */\n" + "\n".join("l%d" % i for i in range(2, 30))
+    lm = line_map(source)
+    assert lm.context(20) == ["/* main.scss, line 1 */"] + ["l%d" % i for i in range(2, 21)]
+    assert lm.context(21) == ["l21"]
+
+
+def test_relative_path_outside():
+    lm = line_map("/* line 1, /other/place/very/far/away.scss */\nx")
+    # Paths going up too many directories stay absolute
+    lm.in_dir = "/base/dir/a/b"
+    assert lm.context(2) == ["/* /other/place/very/far/away.scss, line 1 */", "x"]
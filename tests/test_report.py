@@ -0,0 +1,94 @@
+"""
+    Tests for build reports
+"""
+
+import json
+
+from CSScheme.converters.report import BuildReport, append_log
+from CSScheme.tinycsscheme.parser import parse_stylesheet
+
+
+def make_report():
+    report = BuildReport("/path/scheme.csscheme")
+    report.timestamp = 1234.5
+    report.stages = [('parse', 0.0125, 0.01), ('write', 0.002, 0.0015)]
+    report.counts = {'rules': 3, 'declarations': 2, 'tokens': 9}
+    return report
+
+
+def test_count_stylesheet():
+    stylesheet = parse_stylesheet("""
+        @name "Test";
+        * { foreground: #fff; background: #000; }
+        string.quoted { fontStyle: bold italic; }
+    """)
+    report = BuildReport("scheme.csscheme")
+    report.count_stylesheet(stylesheet)
+
+    assert report.counts == {
+        'rules': 3,
+        'declarations': 3,
+        # '*'; '#fff'; '#000'; 'string', '.', 'quoted'; 'bold', ' ', 'italic'
+        'tokens': 1 + 1 + 1 + 3 + 3,
+    }
+
+
+def test_timed():
+    report = BuildReport("scheme.csscheme")
+    with report.timed('parse'):
+        pass
+    try:
+        with report.timed('datafy'):
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert [s[0] for s in report.stages] == ['parse', 'datafy']
+    assert all(wall >= 0 and cpu >= 0 for _, wall, cpu in report.stages)
+
+
+def test_total():
+    assert make_report().total == (0.0145, 0.0115)
+    assert BuildReport("x").total == (0, 0)
+
+
+def test_format():
+    assert make_report().format() == [
+        "Stage             Wall       CPU",
+        "parse            12.5ms     10.0ms",
+        "write             2.0ms      1.5ms",
+        "total            14.5ms     11.5ms",
+        "declarations: 2, rules: 3, tokens: 9",
+    ]
+    # No counts line without counts
+    assert len(BuildReport("x").format()) == 2
+
+
+def test_to_dict():
+    report = make_report()
+    report.success = True
+    assert report.to_dict() == {
+        'file': "/path/scheme.csscheme",
+        'timestamp': 1234.5,
+        'success': True,
+        'stages': [{'name': 'parse', 'wall': 0.0125, 'cpu': 0.01},
+                   {'name': 'write', 'wall': 0.002, 'cpu': 0.0015}],
+        'counts': {'rules': 3, 'declarations': 2, 'tokens': 9},
+    }
+
+
+def test_append_log(tmpdir):
+    log_file = str(tmpdir.join("builds.jsonl"))
+    first = make_report().to_dict()
+    second = BuildReport("other.csscheme").to_dict()
+
+    append_log(log_file, [first])
+    append_log(log_file, [second])
+    append_log(log_file, [])
+
+    with open(log_file) as f:
+        lines = f.read().split("\n")
+    assert lines[-1] == ""
+    assert [json.loads(line) for line in lines[:-1]] == [first, second]
+    # Keys are sorted, so lines are stable and diffable
+    assert lines[0].startswith('{"counts": ')
@@ -0,0 +1,76 @@
+"""
+    Tests for the Sublime-free reporters
+"""
+
+import io
+import sys
+
+from CSScheme.converters.reporters import Reporter, StreamReporter, ListReporter
+
+
+def test_list_reporter():
+    out = ListReporter()
+    assert out.getvalue() == ""
+    assert out.lines == []
+
+    out.write("Error(s) ")
+    out.write_line("parsing:")
+    out.write_line()
+    out.write_line("a.csscheme:1:2:\n  reason")
+
+    assert out.chunks == ["Error(s) ", "parsing:\n", "\n", "a.csscheme:1:2:\n  reason\n"]
+    assert out.getvalue() == "Error(s) parsing:\n\na.csscheme:1:2:\n  reason\n"
+    assert out.lines == ["Error(s) parsing:", "", "a.csscheme:1:2:", "  reason"]
+
+
+def test_stream_reporter():
+    stream = io.StringIO()
+    with StreamReporter(stream) as out:
+        out.write("Error(s) ")
+        out.write_line("parsing:")
+        out.write_line()
+    assert stream.getvalue() == "Error(s) parsing:\n\n"
+
+
+def test_stream_reporter_stdout(monkeypatch):
+    out = StreamReporter()
+    # sys.stdout is looked up on every write, not when creating the reporter
+    stream = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stream)
+    out.write_line("done")
+    out.finish()
+    assert stream.getvalue() == "done\n"
+
+
+def test_list_reporter_unterminated():
+    out = ListReporter()
+    out.write("no newline")
+    assert out.lines == ["no newline"]
+
+
+def test_regex_and_path():
+    out = ListReporter()
+    out.set_path("/some/dir")
+    assert (out.path, out.file_regex, out.line_regex) == ("/some/dir", None, None)
+
+    out.set_regex(r"^(.*):(\d+)$")
+    out.set_regex(line_regex=r"^(\d+)$")
+    # None keeps the previous values
+    out.set_path(file_regex=None)
+    assert (out.path, out.file_regex, out.line_regex) == \
+        ("/some/dir", r"^(.*):(\d+)$", r"^(\d+)$")
+
+
+def test_context_manager():
+    finished = []
+
+    class Recorder(Reporter):
+        def write(self, text):
+            pass
+
+        def finish(self):
+            finished.append(True)
+
+    with Recorder() as out:
+        out.write_line("x")
+    assert finished == [True]
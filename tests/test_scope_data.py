@@ -0,0 +1,150 @@
+"""
+    Tests for the scope naming conventions and their completions
+"""
+
+import pytest
+
+from CSScheme import scope_data
+from CSScheme.scope_data import NodeList, ScopeNode, build, compiled
+
+
+@pytest.fixture
+def restore_tree(request):
+    """Undo all changes to the (global) scope tree after the test."""
+    scope_data.load()
+    heads = list(scope_data.COMPILED_HEADS)
+    nodes = list(scope_data.COMPILED_NODES)
+    by_path = dict(scope_data.NODES_BY_PATH)
+    children = [(node, list(node.children)) for node in nodes]
+
+    def restore():
+        scope_data.COMPILED_HEADS[:] = heads
+        scope_data.COMPILED_NODES[:] = nodes
+        scope_data.NODES_BY_PATH.clear()
+        scope_data.NODES_BY_PATH.update(by_path)
+        for node, node_children in children:
+            node.children[:] = node_children
+    request.addfinalizer(restore)
+
+
+def iter_paths(tree, prefix=""):
+    """Yield `(path, child names)` for all nodes of a `(name, children)` tree."""
+    for name, children in tree:
+        path = prefix + name
+        yield path, [child[0] for child in children]
+        for item in iter_paths(children, path + "."):
+            yield item
+
+
+def test_compiled_up_to_date():
+    assert compiled.TREE == build.parse(build.DATA)
+    assert build.main(["--check"]) == 0
+
+
+def test_loaded_tree_matches_source():
+    paths = list(iter_paths(build.parse(build.DATA)))
+    assert len(paths) > 50
+    for path, child_names in paths:
+        node = scope_data.find_path(path)
+        assert node is not None, path
+        assert [child.name for child in node.children] == child_names
+        if child_names:
+            assert scope_data.completions(path) == [(name + "\tscope", name)
+                                                    for name in child_names]
+        else:
+            assert scope_data.completions(path) is None
+
+
+@pytest.mark.parametrize('path', [
+    "comment",
+    "comment.line.double-slash",
+    "entity.other.inherited-class",
+    "string.quoted.double",
+    "punctuation.definition",
+])
+def test_find_path(path):
+    node = scope_data.find_path(path)
+    assert node.path == path
+    assert node.name == path.split('.')[-1]
+    assert node.tree() == '.'.join(reversed(path.split('.')))
+    assert scope_data.NODES_BY_PATH[path] is node
+
+
+@pytest.mark.parametrize('path', ["", "nope", "comment.nope", "comment.line.", ".comment"])
+def test_find_path_missing(path):
+    assert scope_data.find_path(path) is None
+
+
+def test_completions():
+    assert scope_data.completions("comment") == [("line\tscope", "line"),
+                                                 ("block\tscope", "block")]
+    assert scope_data.completions("comment.block") == [("documentation\tscope",
+                                                        "documentation")]
+    heads = scope_data.completions("")
+    assert heads[0] == ("comment\tscope", "comment")
+    assert len(heads) == len(scope_data.COMPILED_HEADS)
+
+    # No children
+    assert scope_data.completions("comment.line.double-slash") is None
+    assert scope_data.completions("meta") is None
+    assert scope_data.completions("nope") is None
+
+
+def test_completions_cached():
+    children = scope_data.find_path("string").children
+    assert scope_data.completions("string") is scope_data.completions("string")
+    assert children.find("quoted") is children.find("quoted")
+    assert scope_data.completions("") is scope_data.completions("")
+
+
+def test_node_list_cache():
+    parent = ScopeNode("parent")
+    nodes = parent.children
+    for name in ("a", "b", "a"):
+        parent.add_child(ScopeNode(name, parent))
+
+    completions = nodes.to_completion()
+    assert completions == [("a\tscope", "a"), ("b\tscope", "b"), ("a\tscope", "a")]
+    assert nodes.find("a") is nodes[0]
+    assert nodes.find_all("a") == NodeList([nodes[0], nodes[2]])
+    assert nodes.find("c") is None
+    assert nodes.find_all("c") == []
+
+    # Adding a node invalidates the cache, but doesn't change returned completions
+    parent.add_child(ScopeNode("c", parent))
+    assert nodes.find("c") is nodes[3]
+    assert nodes.to_completion()[-1] == ("c\tscope", "c")
+    assert len(completions) == 3
+
+
+def test_add_scopes(restore_tree):
+    comment = scope_data.find_path("comment")
+    node_count = len(scope_data.COMPILED_NODES)
+    head_count = len(scope_data.COMPILED_HEADS)
+
+    assert scope_data.add_scopes(["comment.line.double-slash.js", "comment.line.fancy",
+                                  "comment.line.fancy", "source.js", "harvested.scope"]) == 5
+    assert len(scope_data.COMPILED_NODES) == node_count + 5
+    # Merged into the existing nodes
+    assert scope_data.find_path("comment") is comment
+    assert scope_data.completions("comment.line.double-slash") == [("js\tscope", "js")]
+    assert scope_data.completions("comment.line")[-1] == ("fancy\tscope", "fancy")
+    assert scope_data.completions("source") == [("js\tscope", "js")]
+    # New heads
+    assert len(scope_data.COMPILED_HEADS) == head_count + 1
+    assert scope_data.completions("")[-1] == ("harvested\tscope", "harvested")
+    assert scope_data.find_path("harvested.scope").parent is scope_data.find_path("harvested")
+
+    # Nothing new
+    assert scope_data.add_scopes(["comment.line.fancy", "source", "harvested"]) == 0
+    assert len(scope_data.COMPILED_NODES) == node_count + 5
+
+
+def test_add_scopes_empty_segments(restore_tree):
+    node_count = len(scope_data.COMPILED_NODES)
+    assert scope_data.add_scopes(["", ".", "comment..weird", "comment.weird.", ".text.weird"]) == 2
+    assert len(scope_data.COMPILED_NODES) == node_count + 2
+    assert scope_data.completions("comment")[-1] == ("weird\tscope", "weird")
+    assert scope_data.completions("text") == [("weird\tscope", "weird")]
+    assert scope_data.find_path("comment.") is None
+    assert "" not in scope_data.NODES_BY_PATH
@@ -0,0 +1,173 @@
+"""
+    Tests for the tmTheme to CSScheme conversion
+"""
+
+import copy
+import plistlib
+from collections import OrderedDict
+from io import StringIO
+
+import pytest
+
+from CSScheme.converters import tmtheme
+from CSScheme.converters.reporters import ListReporter
+
+
+def old_to_csscheme(data, skip_names, hidden=False):
+    """The converter before streaming was added, as the reference for the output."""
+    data = copy.deepcopy(data)
+    with StringIO() as stream:
+        if 'name' in data:
+            stream.write('@name "%s";\n\n' % data['name'])
+        if hidden:
+            stream.write('@hidden true;\n\n')
+        uuid = data.get('uuid')
+        if uuid:
+            stream.write('@uuid %s;\n\n' % uuid)
+
+        items = data['settings']
+        settings = None
+        for i, item in enumerate(items):
+            if 'scope' not in item:
+                if 'settings' not in item:
+                    return
+                settings = item['settings']
+                del items[i]
+                break
+        settings = list(settings.items()) if settings else []
+
+        settings.sort(key=lambda x: x[0].lower())
+        stream.write("* {")
+        for key, value in settings:
+            stream.write("\n\t%s: %s;" % (key, value))
+        stream.write("\n}")
+
+        for item in items:
+            if 'scope' not in item:
+                return
+            stream.write("\n\n%s {" % item['scope'])
+            if not skip_names and 'name' in item:
+                stream.write('\n\t@name "%s";' % item['name'])
+            if 'settings' not in item:
+                return
+            for key, value in item['settings'].items():
+                stream.write("\n\t%s: %s;" % (key, value))
+            stream.write("\n}")
+
+        stream.write("\n")
+        return stream.getvalue()
+
+
+GLOBAL = OrderedDict([('settings', OrderedDict([('foreground', "#F8F8F2"),
+                                                ('background', "#272822"),
+                                                ('Caret', "#F8F8F0")]))])
+COMMENT = OrderedDict([('name', "Comment"), ('scope', "comment"),
+                       ('settings', OrderedDict([('foreground', "#75715E")]))])
+STRING = OrderedDict([('name', "String"), ('scope', "string, meta.string - meta.x"),
+                      ('settings', OrderedDict([('foreground', "#E6DB74"),
+                                                ('fontStyle', "italic")]))])
+
+
+def theme(keys, items):
+    """Create an ordered theme dict, `keys` is a list of top-level keys in order."""
+    values = {'name': "Test Theme", 'uuid': "a1b2c3", 'author': "Someone", 'settings': items}
+    return OrderedDict((key, values[key]) for key in keys)
+
+
+THEMES = [
+    # The usual (alphabetical) order, uuid after the items
+    theme(['author', 'name', 'settings', 'uuid'], [GLOBAL, COMMENT, STRING]),
+    theme(['uuid', 'name', 'settings'], [GLOBAL, COMMENT, STRING]),
+    theme(['name', 'uuid', 'settings'], [GLOBAL, COMMENT, STRING]),
+    # No global item
+    theme(['name', 'settings', 'uuid'], [COMMENT, STRING]),
+    theme(['name', 'uuid', 'settings'], [COMMENT, STRING]),
+    # Global item not first
+    theme(['name', 'uuid', 'settings'], [COMMENT, GLOBAL, STRING]),
+    # No name or uuid
+    theme(['settings'], [GLOBAL, COMMENT]),
+    theme(['settings', 'name'], []),
+]
+
+
+def events_of(data):
+    """Run the data through `iterparse`, in small chunks."""
+    text = plistlib.dumps(data, sort_keys=False).decode('utf-8')
+    return tmtheme.iterparse(text, "/path/Test.tmTheme", ListReporter(), chunk_size=50)
+
+
+@pytest.mark.parametrize('data', THEMES)
+@pytest.mark.parametrize(('skip_names', 'hidden'), [(False, False), (True, True)])
+def test_same_as_old_converter(data, skip_names, hidden):
+    expected = old_to_csscheme(data, skip_names, hidden)
+    assert expected
+
+    assert tmtheme.to_csscheme(data, ListReporter(), skip_names, hidden) == expected
+    assert tmtheme.to_csscheme(events_of(data), ListReporter(), skip_names, hidden) == expected
+
+    stream = StringIO()
+    assert tmtheme.write_csscheme(events_of(data), stream, ListReporter(), skip_names, hidden)
+    assert stream.getvalue() == expected
+
+
+def test_uuid_after_settings():
+    # The usual (sorted) key order, which can't be streamed
+    data = theme(['name', 'settings', 'uuid'], [GLOBAL, COMMENT, STRING])
+    events = list(events_of(data))
+    consumed = []
+
+    def iter_events():
+        for event in events:
+            consumed.append(event)
+            yield event
+
+    blocks = tmtheme.iter_blocks(iter_events(), ListReporter(), False)
+    assert next(blocks) == '@name "Test Theme";'
+    assert len(consumed) == len(events)
+    blocks = ['@name "Test Theme";'] + list(blocks)
+    assert blocks[:3] == [
+        '@name "Test Theme";',
+        '@uuid a1b2c3;',
+        "* {\n\tbackground: #272822;\n\tCaret: #F8F8F0;\n\tforeground: #F8F8F2;\n}",
+    ]
+    assert blocks[3].startswith("comment {")
+    assert blocks[4].startswith("string, meta.string - meta.x {")
+    assert len(blocks) == 5
+    assert "\n\n".join(blocks) + "\n" == old_to_csscheme(data, False, False)
+
+
+def test_streams_after_header():
+    data = theme(['name', 'uuid', 'settings'], [GLOBAL, COMMENT, STRING])
+    consumed = []
+
+    def events():
+        for event in tmtheme.iter_data(data):
+            consumed.append(event)
+            yield event
+
+    blocks = tmtheme.iter_blocks(events(), ListReporter(), False)
+    assert next(blocks) == '@name "Test Theme";'
+    for _ in range(3):
+        next(blocks)
+    # The comment block was yielded before the string item was read
+    assert len(consumed) == 4
+
+
+@pytest.mark.parametrize(('items', 'expected_error'), [
+    ([GLOBAL, COMMENT, GLOBAL], "Missing 'scope' key in item"),
+    ([{'name': "x"}], "Expected 'settings' key in item without scope"),
+    ([GLOBAL, {'scope': "x"}], "Missing 'settings' key in item"),
+])
+def test_errors(items, expected_error):
+    for optimize in (False, True):
+        out = ListReporter()
+        assert tmtheme.to_csscheme(theme(['settings'], items), out, False,
+                                   optimize=optimize) is None
+        assert out.lines == [expected_error]
+
+
+def test_iterparse_error():
+    out = ListReporter()
+    with pytest.raises(tmtheme.PlistError):
+        list(tmtheme.iterparse("<plist><dict><key>name</key>", "/path/Broken.tmTheme", out))
+    assert out.lines[0].startswith('Error parsing Property List "/path/Broken.tmTheme": ')
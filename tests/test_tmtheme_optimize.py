@@ -0,0 +1,167 @@
+"""
+    Tests for merging items, the color palette and SCSS escaping of the
+    tmTheme to CSScheme conversion
+"""
+
+import random
+import re
+from collections import OrderedDict
+
+import pytest
+
+from CSScheme.converters import tmtheme
+from CSScheme.converters.reporters import ListReporter
+from CSScheme.tinycsscheme import dumper, minimizer, parser
+
+
+def item(scope, **settings):
+    return {'scope': scope, 'settings': settings}
+
+
+def roundtrip(data, **kwargs):
+    """Convert `data` to CSScheme and back to tmTheme data."""
+    source = tmtheme.to_csscheme(data, ListReporter(), False, **kwargs)
+    stylesheet = parser.parse_stylesheet(source)
+    assert stylesheet.errors == []
+    return dumper.datafy_stylesheet(stylesheet)
+
+
+# merge_items
+
+def test_merge_identical_settings():
+    groups = tmtheme.merge_items([
+        dict(item("comment", foreground="#111111"), name="Comment"),
+        item("string", background="#222222"),
+        dict(item("comment.block", foreground="#111111"), name="Block"),
+    ])
+    assert groups == [
+        (["comment", "comment.block"], ["Comment", "Block"], {'foreground': "#111111"}),
+        (["string"], [None], {'background': "#222222"}),
+    ]
+
+
+def test_merge_identical_scope():
+    groups = tmtheme.merge_items([
+        item("comment", foreground="#111111"),
+        item("string", background="#222222"),
+        item("comment", fontStyle="italic"),
+    ])
+    assert groups == [
+        (["comment"], [None, None], {'foreground': "#111111", 'fontStyle': "italic"}),
+        (["string"], [None], {'background': "#222222"}),
+    ]
+
+
+def test_no_merge_across_same_key():
+    items = [
+        item("comment", foreground="#111111"),
+        item("comment.block", foreground="#222222"),
+        # Moving these up would let "comment.block" override them
+        item("comment.block.x", foreground="#111111"),
+        item("comment", foreground="#333333"),
+    ]
+    assert [g[0] for g in tmtheme.merge_items(items)] == [
+        ["comment"], ["comment.block"], ["comment.block.x"], ["comment"]]
+
+
+def test_merged_settings_can_merge_again():
+    groups = tmtheme.merge_items([
+        item("a", foreground="#111111"),
+        item("a", fontStyle="bold"),
+        item("b", foreground="#111111", fontStyle="bold"),
+    ])
+    assert groups == [(["a", "b"], [None, None, None],
+                       {'foreground': "#111111", 'fontStyle': "bold"})]
+
+
+SCOPES = ["comment", "comment.line", "comment.block.documentation", "string",
+          "string.quoted", "source.python string", "keyword", "keyword.control",
+          "entity.name.function", "meta.tag - meta.tag.x", "constant, variable",
+          "text.html keyword.control"]
+COLORS = ["#111111", "#222222", "#333333", "#ABCDEF"]
+STYLES = ["bold", "italic", "bold italic", "underline"]
+
+
+def random_theme(rnd):
+    items = [{'settings': OrderedDict([('foreground', "#FFFFFF"),
+                                       ('background', "#000000")])}]
+    for _ in range(rnd.randint(1, 25)):
+        settings = OrderedDict()
+        for key, values in (('foreground', COLORS), ('background', COLORS),
+                            ('fontStyle', STYLES)):
+            if rnd.random() < 0.5:
+                settings[key] = rnd.choice(values)
+        if not settings:
+            settings['foreground'] = rnd.choice(COLORS)
+        items.append({'scope': rnd.choice(SCOPES), 'settings': settings})
+    return OrderedDict([('name', "Random"), ('settings', items)])
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_optimize_keeps_styles(seed):
+    data = random_theme(random.Random(seed))
+    converted = roundtrip(data, optimize=True)
+
+    assert len(converted['settings']) <= len(data['settings'])
+    assert minimizer.verify(data, converted) == []
+
+
+# Palette
+
+def test_palette_threshold():
+    palette = tmtheme._build_palette([
+        {'foreground': "#AABBCC", 'background': "#000000"},
+        {'foreground': "#aabbcc", 'fontStyle': "bold"},
+        {'foreground': "#123", 'background': "#000000", 'caret': "#000000"},
+        {'background': "#FFFFFF", 'invisibles': "#123"},
+    ])
+    # Colors used once are not included, case doesn't matter and the most
+    # used color comes first
+    assert palette == {
+        "#000000": ("$color0", "#000000"),
+        "#aabbcc": ("$color1", "#AABBCC"),
+        "#123": ("$color2", "#123"),
+    }
+    assert tmtheme._build_palette([{'foreground': "#123"}, {'foreground': "#123"}],
+                                  min_count=3) == {}
+
+
+def test_scss_output():
+    data = OrderedDict([('name', "Palette"), ('settings', [
+        {'settings': {'foreground': "#FFFFFF", 'background': "#00000080"}},
+        item("comment", foreground="#00000080"),
+        item("string", foreground="#ffffff", background="#123456"),
+        item("source.python - comment", fontStyle="bold"),
+    ])])
+    source = tmtheme.to_csscheme(data, ListReporter(), False, scss=True)
+
+    assert source == "\n\n".join([
+        '@name "Palette";',
+        "$color0: #FFFFFF;\n$color1: '#00000080';",
+        "* {\n\tbackground: $color1;\n\tforeground: $color0;\n}",
+        "comment {\n\tforeground: $color1;\n}",
+        "string {\n\tforeground: $color0;\n\tbackground: #123456;\n}",
+        "source.python \\- comment {\n\tfontStyle: bold;\n}",
+    ]) + "\n"
+
+
+# SCSS selectors
+
+@pytest.mark.parametrize(('scope', 'expected'), [
+    ("source.python string", "source.python string"),
+    ("meta.foo-bar", "meta.foo-bar"),
+    ("a, b -c", "a, b -c"),
+    ("source.python - comment", "source.python \\- comment"),
+    ("a | b", "a \\| b"),
+    ("(a & b) - c", "\\(a \\& b\\) \\- c"),
+    ("meta.3d.x", "meta.\\3d.x"),
+    ("constant.numeric.1.2", "constant.numeric.\\1.\\2"),
+])
+def test_scss_selector(scope, expected):
+    escaped = tmtheme._scss_selector(scope)
+    assert escaped == expected
+
+    # The dumper removes the backslashes again
+    data = roundtrip(OrderedDict([('name', "x"), ('settings', [
+        {'settings': {}}, item(scope, foreground="#FFFFFF")])]))
+    assert data['settings'][1]['scope'] == re.sub(r"\s+", " ", scope)
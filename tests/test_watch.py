@@ -0,0 +1,141 @@
+"""
+    Tests for the dependency index and the polling watcher
+"""
+
+import os
+
+from CSScheme.converters import watch
+
+
+def write(path, text="", mtime=1000):
+    path.ensure()
+    path.write(text)
+    os.utime(str(path), (mtime, mtime))
+    return str(path)
+
+
+def touch(path, mtime):
+    os.utime(str(path), (mtime, mtime))
+
+
+def make_tree(tmpdir):
+    a = write(tmpdir.join("a.scsscheme"), '@import "colors";')
+    b = write(tmpdir.join("b.scsscheme"), '@import "colors", "extra";')
+    c = write(tmpdir.join("c.csscheme"), "* {}")
+    colors = write(tmpdir.join("_colors.scss"))
+    extra = write(tmpdir.join("_extra.scss"))
+    return a, b, c, colors, extra
+
+
+def collect(tmpdir):
+    return lambda: sorted(str(p) for p in tmpdir.listdir()
+                          if p.ext in ('.scsscheme', '.csscheme'))
+
+
+def test_dependency_index(tmpdir):
+    a, b, c, colors, extra = make_tree(tmpdir)
+    index = watch.DependencyIndex()
+    for root in (a, b, c):
+        index.update(root)
+
+    assert index.files() == set([a, b, c, colors, extra])
+    assert index.affected([colors]) == set([a, b])
+    assert index.affected([extra, c]) == set([b, c])
+    assert index.affected([str(tmpdir.join("unrelated.scss"))]) == set()
+
+    index.remove(b)
+    assert index.files() == set([a, c, colors])
+    assert index.affected([colors, extra]) == set([a])
+
+
+def test_import_changed(tmpdir):
+    a, b, c, colors, extra = make_tree(tmpdir)
+    rebuilt = []
+    watcher = watch.Watcher(collect(tmpdir), rebuilt.append)
+    assert watcher.poll() == set()
+
+    touch(extra, 2000)
+    changed = watcher.poll()
+    assert changed == set([extra])
+    watcher.rebuild(changed)
+    assert rebuilt == [[b]]
+
+    touch(colors, 2000)
+    watcher.rebuild(watcher.poll())
+    assert rebuilt == [[b], [a, b]]
+    # Nothing changed since
+    assert watcher.poll() == set()
+
+
+def test_new_import_is_watched(tmpdir):
+    a, b, c, colors, extra = make_tree(tmpdir)
+    rebuilt = []
+    watcher = watch.Watcher(collect(tmpdir), rebuilt.append)
+
+    new = write(tmpdir.join("_new.scss"))
+    write(tmpdir.join("a.scsscheme"), '@import "colors", "new";', mtime=2000)
+    watcher.rebuild(watcher.poll())
+    assert rebuilt == [[a]]
+
+    touch(new, 3000)
+    watcher.rebuild(watcher.poll())
+    assert rebuilt == [[a], [a]]
+
+
+def test_new_file(tmpdir):
+    make_tree(tmpdir)
+    rebuilt = []
+    watcher = watch.Watcher(collect(tmpdir), rebuilt.append)
+
+    d = write(tmpdir.join("d.csscheme"), "* {}")
+    changed = watcher.poll()
+    assert changed == set([d])
+    watcher.rebuild(changed)
+    assert rebuilt == [[d]]
+    assert d in watcher.index.roots
+
+
+def test_deleted_files(tmpdir):
+    a, b, c, colors, extra = make_tree(tmpdir)
+    rebuilt = []
+    watcher = watch.Watcher(collect(tmpdir), rebuilt.append)
+
+    # A deleted root is forgotten
+    os.remove(c)
+    assert watcher.poll() == set()
+    assert c not in watcher.index.roots
+
+    # A deleted import rebuilds its dependents (which will report the error)
+    os.remove(extra)
+    changed = watcher.poll()
+    assert changed == set([extra])
+    watcher.rebuild(changed)
+    assert rebuilt == [[b]]
+    assert extra not in watcher.index.files()
+
+
+def test_run_debounces(tmpdir, monkeypatch):
+    a, b, c, colors, extra = make_tree(tmpdir)
+    clock = [0.0]
+    edits = {1.0: 2000, 1.25: 2001}
+
+    def sleep(seconds):
+        clock[0] += seconds
+        # Simulate a file that is saved twice in quick succession
+        if clock[0] in edits:
+            touch(colors, edits[clock[0]])
+
+    monkeypatch.setattr(watch.time, 'time', lambda: clock[0])
+    monkeypatch.setattr(watch.time, 'sleep', sleep)
+
+    rebuilt = []
+
+    def on_change(roots):
+        rebuilt.append((clock[0], roots))
+        watcher.stop()
+
+    watcher = watch.Watcher(collect(tmpdir), on_change, interval=0.25, debounce=0.5)
+    watcher.run()
+
+    # One rebuild after the last change settled
+    assert rebuilt == [(1.75, [a, b])]
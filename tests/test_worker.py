@@ -0,0 +1,178 @@
+"""
+    Tests for the compiler server workers, using the stub server
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from CSScheme import converters
+from CSScheme.converters import worker
+from CSScheme.converters.cache import compile_cache
+from CSScheme.converters.reporters import ListReporter
+
+
+STUB_CMD = (sys.executable, os.path.join(worker.SERVERS_DIR, 'stub_server.py'))
+# Answers pings, but never finishes compiling
+SLOW_CMD = (sys.executable, '-c', """if True:
+    import json, sys, time
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get('ping'):
+            print(json.dumps({'id': request['id'], 'pong': True}))
+            sys.stdout.flush()
+        else:
+            time.sleep(30)
+""")
+
+
+class StubConverter(converters.SCSSConverter):
+
+    """Runs a python one-liner that prints the source, instead of sass."""
+
+    name = "StubScheme"
+    ext = "stubscheme"
+    default_executable = "stubc"
+    cmd_params = ('-c', "import sys; sys.stdout.write(open(sys.argv[1]).read())")
+    import_reg = None
+
+
+@pytest.fixture
+def stub_worker(request):
+    w = worker.CompilerWorker(STUB_CMD)
+    request.addfinalizer(w.stop)
+    return w
+
+
+@pytest.fixture(autouse=True)
+def cleanup(request):
+    compile_cache.clear()
+    request.addfinalizer(compile_cache.clear)
+    request.addfinalizer(worker.shutdown_workers)
+
+
+def test_start_and_ping(stub_worker):
+    assert not stub_worker.is_alive()
+    stub_worker.start()
+    assert stub_worker.is_alive()
+    assert stub_worker._ping()
+    assert stub_worker.failures == 0
+
+    stub_worker.stop()
+    assert not stub_worker.is_alive()
+
+
+def test_compile(stub_worker, tmpdir):
+    path = tmpdir.join("a.scsscheme")
+    path.write("* { foreground: #fff; }\n")
+
+    assert stub_worker.compile(str(path), ('--scss',)) == (0, "* { foreground: #fff; }\n", "")
+    # Errors of the compiler are results, not worker errors
+    returncode, stdout, stderr = stub_worker.compile(str(tmpdir.join("missing")))
+    assert returncode == 1
+    assert stdout == ""
+    assert stderr.startswith("Error:")
+
+
+def test_restart_after_crash(stub_worker, tmpdir):
+    path = tmpdir.join("a.scsscheme")
+    path.write("source {}")
+    assert stub_worker.compile(str(path))[1] == "source {}"
+
+    crashed = stub_worker.process
+    crashed.kill()
+    crashed.wait()
+    assert not stub_worker.is_alive()
+
+    assert stub_worker.compile(str(path))[1] == "source {}"
+    assert stub_worker.process is not crashed
+    assert stub_worker.is_alive()
+
+
+def test_request_after_stop(stub_worker):
+    stub_worker.start()
+    stub_worker.stop()
+    with pytest.raises(worker.WorkerError) as excinfo:
+        stub_worker._request({'ping': True}, 1)
+    assert "is not running" in str(excinfo.value)
+
+    # Stopped after the request looked at the process
+    stub_worker.start()
+    stub_worker.process.stdin.close()
+    with pytest.raises(worker.WorkerError) as excinfo:
+        stub_worker._request({'ping': True}, 1)
+    assert "Could not write" in str(excinfo.value)
+
+
+def test_stop_during_compile():
+    w = worker.CompilerWorker(SLOW_CMD)
+    timer = threading.Timer(0.2, w.stop)
+    start = time.time()
+    timer.start()
+    try:
+        with pytest.raises(worker.WorkerError) as excinfo:
+            w.compile("file")
+        assert "exited unexpectedly" in str(excinfo.value)
+        assert time.time() - start < 5
+        assert not w.is_alive()
+    finally:
+        timer.cancel()
+        w.stop()
+
+
+def test_unresponsive_server():
+    w = worker.CompilerWorker((sys.executable, '-c', "import time; time.sleep(30)"))
+    w.ping_timeout = 0.2
+    try:
+        with pytest.raises(worker.WorkerError) as excinfo:
+            w.compile("file")
+        assert "did not respond" in str(excinfo.value)
+        assert not w.is_alive()
+        assert w.failures == 1
+    finally:
+        w.stop()
+
+
+def test_give_up_after_failures(tmpdir):
+    w = worker.CompilerWorker((str(tmpdir.join("no-such-server")),))
+    for _ in range(w.max_failures):
+        with pytest.raises(worker.WorkerError) as excinfo:
+            w.compile("file")
+        assert "Could not start" in str(excinfo.value)
+    with pytest.raises(worker.WorkerError) as excinfo:
+        w.compile("file")
+    assert "giving up" in str(excinfo.value)
+
+
+def test_get_worker():
+    assert worker.get_worker(list(STUB_CMD)) is worker.get_worker(STUB_CMD)
+
+
+def test_convert_with_server(tmpdir):
+    path = tmpdir.join("a.stubscheme")
+    path.write("* {}")
+    out = ListReporter()
+
+    text = StubConverter.convert(out, str(path), {}, {'stubc': STUB_CMD})
+
+    assert text == "* {}"
+    assert out.lines == []
+    assert worker.get_worker(STUB_CMD).is_alive()
+
+
+def test_convert_fallback(tmpdir):
+    path = tmpdir.join("a.stubscheme")
+    path.write("* {}")
+    out = ListReporter()
+
+    text = StubConverter.convert(out, str(path), {'stubc': sys.executable},
+                                 {'stubc': [str(tmpdir.join("no-such-server"))]})
+
+    # Ran the executable directly and said so
+    assert text == "* {}"
+    assert len(out.lines) == 1
+    assert out.lines[0].startswith("Compiler server unavailable, running %s directly: "
+                                   "Could not start" % sys.executable)
@@ -22,7 +22,9 @@ Perform a few checks to assure that data is valid:
 
 __all__ = (
     'dump_stylesheet_file',
+    'write_plist_file',
     'datafy_stylesheet',
+    'evaluate_color',
 )
 
 
@@ -31,7 +33,9 @@ from collections import OrderedDict
 
 from .parser import StringRule, strvalue
 from .tinycss.parsing import split_on_comma, strip_whitespace
+from .tinycss.css21 import Declaration
 from .tinycss.token_data import Token
+from .tinycss.tokenizer import tokenize_grouped
 
 
 def clamp(minimum, x, maximum):
@@ -86,9 +90,17 @@ OPTIONS_LIST_VALUES = ('foreground', 'underline', 'stippled_underline', 'squiggl
 # I could test this, but it is like one line and I only forward anyway. I'll just leave this
 # comment here to remind myself.
 def dump_stylesheet_file(out_file, stylesheet):
+    write_plist_file(out_file, datafy_stylesheet(stylesheet))
+
+
+def write_plist_file(out_file, data):
     import plistlib
-    data = datafy_stylesheet(stylesheet)
-    plistlib.writePlist(data, out_file)
+    if hasattr(plistlib, 'dump'):
+        # writePlist is gone in Python 3.9, dump was added in 3.4
+        with open(out_file, 'wb') as f:
+            plistlib.dump(data, f)
+    else:
+        plistlib.writePlist(data, out_file)
 
 
 def datafy_stylesheet(stylesheet):
@@ -287,8 +299,10 @@ def translate_colors(decl, sel):
             params = []
             for i, p in enumerate(raw_params):
                 if len(p) != 1:
-                    raise DumpError(p[1], "expected 1 token for parameter {0} in function "
-                                          "'{1}()', got {2}".format(i + 1, fn, len(p)),
+                    # Empty parameters (as in `rgb(1, 2,)`) have no token to point at
+                    raise DumpError(p[1] if p else v,
+                                    "expected 1 token for parameter {0} in function "
+                                    "'{1}()', got {2}".format(i + 1, fn, len(p)),
                                     '%s; %s' % (sel, decl.name))
                 p = p[0]
 
@@ -344,3 +358,37 @@ def translate_colors(decl, sel):
         # Replace the old value
         if v.type != 'HASH' or color != v.value:
             decl.value[j] = Token('HASH', v.as_css(), color, None, v.line, v.column)
+
+
+# Color value text -> color hash (or None), see `evaluate_color`
+_color_cache = {}
+
+
+def evaluate_color(value):
+    """Evaluate the text of a color property value to a color hash, like when dumping.
+
+    Returns `None` if `value` is not a valid color. Results are cached per
+    value text, since color schemes tend to repeat the same few values.
+    """
+    try:
+        return _color_cache[value]
+    except KeyError:
+        pass
+
+    color = None
+    tokens = strip_whitespace(list(tokenize_grouped(value)))
+    # Other tokens (like variables of pre-processors) are no colors either way
+    if len(tokens) == 1 and tokens[0].type in ('HASH', 'IDENT', 'STRING', 'FUNCTION'):
+        decl = Declaration('foreground', tokens, None, 0, 0)
+        try:
+            translate_colors(decl, '')
+            validify_declaration(decl, '')
+        except DumpError:
+            pass
+        else:
+            color = decl.value[0].value
+
+    if len(_color_cache) >= 10000:
+        _color_cache.clear()
+    _color_cache[value] = color
+    return color
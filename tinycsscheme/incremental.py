@@ -0,0 +1,246 @@
+"""
+Keep a parsed stylesheet up to date while its source is being edited.
+
+The source is split into top-level chunks (rulesets and at-rules) with a cheap
+scan that only tracks strings, comments and braces. Chunks are parsed on their
+own. On `update`, the new source is compared with the previous one and only
+the chunks around the changed region are split and parsed again; everything
+before and after is reused.
+
+This is meant for editor features like completions and live validation. Line
+numbers of the parsed rules are relative to their chunk, use `rules_at` and
+`errors_at` for absolute positions.
+"""
+
+
+__all__ = (
+    'split_chunks',
+    'IncrementalStylesheet',
+)
+
+
+import copy
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from .dumper import DumpError, DummyToken, datafy_ruleset
+from .parser import CSSchemeParser
+
+
+# Characters that may change the nesting, plus comments and strings to skip
+_special_reg = re.compile(r"""/\*.*?(?:\*/|\Z)"""
+                          r"""|"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?"""
+                          r"""|[{};]""",
+                          re.DOTALL)
+
+
+def _iter_chunk_ends(text, pos=0):
+    """Yield the end offsets of the chunks in `text`, starting at chunk boundary `pos`."""
+    depth = 0
+    end = pos
+    for m in _special_reg.finditer(text, pos):
+        c = m.group()
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth = max(depth - 1, 0)
+            if not depth:
+                end = m.end()
+                yield end
+        elif c == ';' and not depth:
+            end = m.end()
+            yield end
+    if end < len(text):
+        yield len(text)
+
+
+def split_chunks(text):
+    """Split `text` into a list of top-level rule chunks (including whitespace).
+
+    Joining the chunks results in `text` again.
+    """
+    chunks = []
+    start = 0
+    for end in _iter_chunk_ends(text):
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def _common_prefix(a, b):
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a, b, limit):
+    lo, hi = 0, min(len(a), len(b), limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _chunk_start(chunk):
+    """Return a `DummyToken` at the first non-whitespace character of `chunk`."""
+    offset = len(chunk) - len(chunk.lstrip())
+    line = chunk.count('\n', 0, offset) + 1
+    return DummyToken(line, offset - chunk.rfind('\n', 0, offset))
+
+
+def _unexpected_error(subject, e):
+    return DumpError(subject, "unexpected {0}: {1}".format(type(e).__name__, e))
+
+
+class IncrementalStylesheet(object):
+
+    """A stylesheet that is re-parsed incrementally by calling `update`.
+
+    If `validate` is true, rulesets are also checked like when dumping them
+    (on a copy, so colors are not translated in `rules`).
+
+    .. attribute:: chunks
+
+        List of `(text, rules, errors)` tuples, one per chunk.
+
+    .. attribute:: starts
+
+        List of the start offsets of the chunks in `text`.
+    """
+
+    def __init__(self, text=None, validate=False):
+        self.parser = CSSchemeParser()
+        self.validate = validate
+        self.text = ""
+        self.chunks = []
+        self.starts = []
+        if text is not None:
+            self.update(text)
+
+    def update(self, text):
+        """Update to the new source `text`.
+
+        Returns the number of chunks that had to be parsed.
+        """
+        old, starts, chunks = self.text, self.starts, self.chunks
+        prefix = _common_prefix(old, text)
+        if prefix == len(old) == len(text):
+            return 0
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - prefix)
+        old_end = len(old) - suffix
+        new_end = len(text) - suffix
+        delta = len(text) - len(old)
+
+        # Start one chunk early, in case the change completes an unterminated chunk
+        first = max(bisect_right(starts, prefix) - 2, 0)
+        pos = starts[first] if chunks else 0
+        # Chunks that may be replaced, to reuse unchanged parts
+        replaced = dict((c[0], c) for c in chunks[first:bisect_right(starts, old_end) + 1])
+
+        new_chunks = []
+        new_starts = []
+        parsed = 0
+        tail = len(chunks)
+        for end in _iter_chunk_ends(text, pos):
+            chunk = text[pos:end]
+            result = replaced.get(chunk)
+            if result is None:
+                result = (chunk,) + self._parse(chunk)
+                parsed += 1
+            new_chunks.append(result)
+            new_starts.append(pos)
+            pos = end
+            # Stop at the first boundary after the change that was a boundary before
+            if end >= new_end and end < len(text):
+                i = bisect_left(starts, end - delta)
+                if i < len(starts) and starts[i] == end - delta:
+                    tail = i
+                    break
+
+        self.text = text
+        self.chunks = chunks[:first] + new_chunks + chunks[tail:]
+        self.starts = starts[:first] + new_starts + [s + delta for s in starts[tail:]]
+        return parsed
+
+    def _parse(self, chunk):
+        # Half-typed source must never break the editor features using this, so
+        # unexpected exceptions are reported as errors of the chunk instead
+        try:
+            stylesheet = self.parser.parse_stylesheet(chunk)
+        except Exception as e:
+            return [], [_unexpected_error(_chunk_start(chunk), e)]
+        errors = list(stylesheet.errors)
+        if self.validate:
+            for rule in stylesheet.rules:
+                if rule.at_keyword:
+                    continue
+                try:
+                    datafy_ruleset(copy.deepcopy(rule))
+                except DumpError as e:
+                    errors.append(e)
+                except Exception as e:
+                    errors.append(_unexpected_error(rule, e))
+        return stylesheet.rules, errors
+
+    @property
+    def rules(self):
+        """List of all parsed rules, in order."""
+        return [rule for chunk in self.chunks for rule in chunk[1]]
+
+    @property
+    def errors(self):
+        """List of all parse (and dump) errors, in order."""
+        return [error for chunk in self.chunks for error in chunk[2]]
+
+    def _located(self, index):
+        # Count lines only up to the chunks that have items
+        text = self.text
+        last, line, column = 0, 1, 1
+        for start, chunk in zip(self.starts, self.chunks):
+            if not chunk[index]:
+                continue
+            newlines = text.count('\n', last, start)
+            if newlines:
+                line += newlines
+                column = start - text.rfind('\n', last, start)
+            else:
+                column += start - last
+            last = start
+            for item in chunk[index]:
+                if item.line == 1:
+                    yield line, column + item.column - 1, item
+                else:
+                    yield line + item.line - 1, item.column, item
+
+    def rules_at(self):
+        """Yield `(line, column, rule)` for all rules, with absolute positions."""
+        return self._located(1)
+
+    def errors_at(self):
+        """Yield `(line, column, error)` for all errors, with absolute positions."""
+        return self._located(2)
+
+    def declarations(self):
+        """Yield all declarations of all rulesets."""
+        for chunk in self.chunks:
+            for rule in chunk[1]:
+                if not rule.at_keyword:
+                    for decl in rule.declarations:
+                        yield decl
+
+    def value_counts(self, names):
+        """Return a `Counter` of the values used for the properties in `names`."""
+        counts = Counter()
+        for decl in self.declarations():
+            if decl.name in names:
+                counts[decl.value.as_css().strip()] += 1
+        return counts
@@ -0,0 +1,154 @@
+"""
+Minimize .tmTheme-style data as returned by `dumper.datafy_stylesheet`.
+
+Only transformations that can not change the effective style of any scope are
+applied, regardless of how exactly the editor ranks selectors:
+
+- Settings in scoped items that equal the global setting are removed, but only
+  if *every* scoped item that sets the key uses the global value.
+
+- Settings that are overridden by a later item with the same selector are
+  removed. Items without any settings left are dropped.
+
+- Items with the same selector are merged into the later one, unless an item
+  in between sets any of the moved keys.
+
+Use `verify` to compare the effective styles of the original and the minimized
+data for all scopes mentioned in either.
+"""
+
+
+__all__ = (
+    'minimize',
+    'effective_style',
+    'sample_stacks',
+    'verify',
+)
+
+
+from collections import OrderedDict
+
+from .scope_selector import split_scope
+from .styles import StyleEngine, diff_styles
+
+
+def _normalize(scope):
+    """Normalize a selector for comparison, the order in lists doesn't matter."""
+    return tuple(sorted(" ".join(s.split()) for s in scope.split(',')))
+
+
+def _copy_item(item):
+    copy = OrderedDict(item)
+    copy['settings'] = OrderedDict(item.get('settings', ()))
+    return copy
+
+
+def _global_settings(items):
+    settings = {}
+    for item in items:
+        if 'scope' not in item:
+            settings.update(item.get('settings', {}))
+    return settings
+
+
+def _strip_global_values(items):
+    global_settings = _global_settings(items)
+    scoped = [item for item in items if 'scope' in item]
+    for key, value in global_settings.items():
+        values = [item['settings'][key] for item in scoped if key in item['settings']]
+        if values and all(v == value for v in values):
+            for item in scoped:
+                item['settings'].pop(key, None)
+
+
+def _strip_overridden(items):
+    overridden = {}  # normalized selector -> keys set by later items
+    for item in reversed(items):
+        if 'scope' not in item:
+            continue
+        keys = overridden.setdefault(_normalize(item['scope']), set())
+        for key in list(item['settings']):
+            if key in keys:
+                del item['settings'][key]
+        keys.update(item['settings'])
+
+
+def _merge_same_scope(items):
+    result = []
+    by_scope = {}
+    last_set = {}
+    for item in items:
+        if 'scope' in item:
+            norm = _normalize(item['scope'])
+            i = by_scope.get(norm)
+            if i is not None and all(last_set.get(k) == i for k in result[i]['settings']):
+                earlier, result[i] = result[i], None
+                merged = OrderedDict(earlier)
+                merged.update(item)
+                merged['settings'] = OrderedDict(earlier['settings'])
+                merged['settings'].update(item['settings'])
+                item = merged
+            by_scope[norm] = len(result)
+        for key in item['settings']:
+            last_set[key] = len(result)
+        result.append(item)
+    return [item for item in result if item is not None]
+
+
+def minimize(data):
+    """Return a minimized copy of `data` (a dict with a 'settings' list)."""
+    items = [_copy_item(item) for item in data.get('settings', ())]
+
+    _strip_global_values(items)
+    _strip_overridden(items)
+    items = [item for item in items if 'scope' not in item or item['settings']]
+    items = _merge_same_scope(items)
+
+    result = OrderedDict(data)
+    result['settings'] = items
+    return result
+
+
+def effective_style(data, stack):
+    """Return the dict of settings that apply to the scope stack `stack`.
+
+    See `styles.StyleEngine` for how they are resolved.
+    """
+    return dict(StyleEngine(data).style(stack))
+
+
+def sample_stacks(*datas):
+    """Return a set of scope stacks that exercise every selector in `datas`.
+
+    For each path of positive atoms in a selector, the stack itself, all of
+    its prefixes and variants with a more specific last scope are generated.
+    """
+    stacks = set()
+    for data in datas:
+        for item in data.get('settings', ()):
+            if 'scope' not in item:
+                continue
+            for part in item['scope'].replace('|', ',').split(','):
+                atoms = []
+                for word in split_scope(part.replace('&', ' ').replace('(', ' ')
+                                            .replace(')', ' ')):
+                    if word.startswith('-'):
+                        break
+                    atoms.append(word)
+                for i in range(1, len(atoms) + 1):
+                    stacks.add(tuple(atoms[:i]))
+                    stacks.add(tuple(atoms[:i - 1]) + (atoms[i - 1] + '.x',))
+    return stacks
+
+
+def verify(original, minimized, stacks=None):
+    """Compare the effective styles of `original` and `minimized` data.
+
+    Returns a list of `(stack, original_style, minimized_style)` tuples for
+    every scope stack with a different style, i.e. an empty list if both are
+    equivalent. `stacks` defaults to `sample_stacks(original, minimized)`.
+    """
+    if stacks is None:
+        stacks = sample_stacks(original, minimized)
+
+    return diff_styles(StyleEngine(original), StyleEngine(minimized), sorted(stacks))
@@ -115,9 +115,8 @@ class CSSchemeParser(CSS21Parser):
         token = head[0]
 
         # DIMENSION is used for uuids that start with a number
-        whole_value = strvalue(token)
         if not (token.type in ('STRING', 'IDENT', 'HASH')
-                or (token.type == 'DIMENSION' and is_uuid(whole_value))):
+                or (token.type == 'DIMENSION' and is_uuid(strvalue(token)))):
             raise ParseError(rule, 'expected STRING, IDENT or HASH token or a valid uuid4 for '
                                    '{0} rule, got {1}'.format(rule.at_keyword, token.type))
 
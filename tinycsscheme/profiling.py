@@ -0,0 +1,256 @@
+"""Opt-in instrumentation of the parser's and dumper's hot paths.
+
+While enabled, the functions listed in `TARGETS` are replaced by wrappers that
+report every call to a set of hooks. When disabled, the original functions are
+restored, so there is no overhead at all.
+
+Example:
+
+    from tinycsscheme import profiling
+
+    counters = profiling.Counters()
+    with profiling.enabled(counters):
+        datafy_stylesheet(parse_stylesheet(source))
+    print(counters.format())
+
+Available hooks are `Counters` (calls and cumulative time), `CProfileHook`
+(feeds a `cProfile.Profile` only while inside instrumented code) and
+`StageSampler` (samples the innermost active stage periodically). Custom hooks
+need to implement `enter(name)` and `exit(name, elapsed)`.
+"""
+
+__all__ = (
+    'TARGETS',
+    'enable',
+    'disable',
+    'enabled',
+    'is_enabled',
+    'Hook',
+    'Counters',
+    'CProfileHook',
+    'StageSampler',
+)
+
+
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+from .tinycss import tokenizer
+from . import parser, dumper
+
+
+# (owner, attribute name, stage name)
+TARGETS = (
+    (tokenizer, 'tokenize_flat', 'tokenize_flat'),
+    (tokenizer, 'regroup', 'regroup'),
+    (parser.CSSchemeParser, 'parse_ruleset', 'parse_ruleset'),
+    (parser.CSSchemeParser, 'parse_declaration', 'parse_declaration'),
+    (dumper, 'datafy_ruleset', 'datafy_ruleset'),
+    (dumper, 'translate_colors', 'translate_colors'),
+)
+
+_originals = []
+_hooks = ()
+_local = threading.local()
+
+
+def _stack():
+    """Return the stack of active stage names for the current thread."""
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def _enter(name):
+    _stack().append(name)
+    for hook in _hooks:
+        hook.enter(name)
+
+
+def _exit(name, elapsed):
+    _stack().pop()
+    for hook in _hooks:
+        hook.exit(name, elapsed)
+
+
+def _wrap_generator(name, gen):
+    # Only measure the time spent inside the generator, not in the consumer
+    while True:
+        _enter(name)
+        start = time.time()
+        try:
+            item = next(gen)
+        except StopIteration:
+            return
+        finally:
+            _exit(name, time.time() - start)
+        yield item
+
+
+def _instrument(func, name):
+    def wrapper(*args, **kwargs):
+        _enter(name)
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _exit(name, time.time() - start)
+        if isinstance(result, types.GeneratorType):
+            return _wrap_generator(name, result)
+        return result
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def enable(*hooks):
+    """Instrument all `TARGETS` and report to `hooks`."""
+    global _hooks
+    if _originals:
+        raise RuntimeError("profiling is already enabled")
+    _hooks = hooks
+    for owner, attr, name in TARGETS:
+        func = owner.__dict__[attr]
+        _originals.append((owner, attr, func))
+        setattr(owner, attr, _instrument(func, name))
+
+
+def disable():
+    """Restore the original functions."""
+    global _hooks
+    while _originals:
+        owner, attr, func = _originals.pop()
+        setattr(owner, attr, func)
+    _hooks = ()
+
+
+@contextmanager
+def enabled(*hooks):
+    """Context manager for `enable` and `disable`. Hooks with `start` and `stop`
+    methods are started and stopped as well.
+    """
+    enable(*hooks)
+    for hook in hooks:
+        if hasattr(hook, 'start'):
+            hook.start()
+    try:
+        yield hooks[0] if len(hooks) == 1 else hooks
+    finally:
+        for hook in hooks:
+            if hasattr(hook, 'stop'):
+                hook.stop()
+        disable()
+
+
+class Hook(object):
+    """Base class for hooks. Does nothing."""
+
+    def enter(self, name):
+        pass
+
+    def exit(self, name, elapsed):
+        pass
+
+
+class Counters(Hook):
+    """Count calls and cumulative (inclusive) time per stage.
+
+    .. attribute:: calls
+
+        Dict of stage name to number of calls (or generator steps).
+
+    .. attribute:: times
+
+        Dict of stage name to cumulative seconds.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.times = {}
+
+    def exit(self, name, elapsed):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.times[name] = self.times.get(name, 0) + elapsed
+
+    def format(self):
+        lines = ["%-20s %10s %10s" % ("Stage", "Calls", "Time")]
+        for name in sorted(self.times, key=self.times.get, reverse=True):
+            lines.append("%-20s %10d %8.1fms" % (name, self.calls[name], self.times[name] * 1000))
+        return "\n".join(lines)
+
+
+class CProfileHook(Hook):
+    """Feed a `cProfile.Profile` only while instrumented code is running.
+
+    .. attribute:: profile
+
+        The `cProfile.Profile` instance, e.g. for use with `pstats.Stats`.
+    """
+
+    def __init__(self, profile=None):
+        if profile is None:
+            import cProfile
+            profile = cProfile.Profile()
+        self.profile = profile
+        self.depth = 0
+
+    def enter(self, name):
+        if not self.depth:
+            self.profile.enable()
+        self.depth += 1
+
+    def exit(self, name, elapsed):
+        self.depth -= 1
+        if not self.depth:
+            self.profile.disable()
+
+
+class StageSampler(Hook):
+    """Periodically sample the innermost active stage of a thread.
+
+    .. attribute:: samples
+
+        Dict of stage name to number of samples.
+    """
+
+    def __init__(self, interval=0.001, thread=None):
+        self.interval = interval
+        self.samples = {}
+        self._target = thread or threading.current_thread()
+        self._stacks = {}
+        self._running = False
+        self._thread = None
+
+    def enter(self, name):
+        # Remember the stack of the sampled thread so the sampler thread can read it
+        if threading.current_thread() is self._target:
+            self._stacks['current'] = _stack()
+
+    def _sample(self):
+        while self._running:
+            stack = self._stacks.get('current')
+            if stack:
+                name = stack[-1]
+                self.samples[name] = self.samples.get(name, 0) + 1
+            time.sleep(self.interval)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._sample)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
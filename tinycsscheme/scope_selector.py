@@ -0,0 +1,193 @@
+"""
+Parse and match TextMate-style scope selectors.
+
+Supported syntax:
+
+- Paths of dotted scope atoms, separated by whitespace (descendants), e.g.
+  ``source.python string.quoted``. An atom matches a scope if it is equal to it
+  or a dot-separated prefix of it.
+- Lists of selectors separated by ``,`` or ``|``.
+- Conjunctions with ``&`` and exclusions with ``-``, e.g. ``source - comment``.
+- Grouping with parentheses.
+
+Matching a scope stack (a sequence of scope names, outermost first) returns a
+score or `None`. Scores are tuples that can be compared with each other, a
+higher score means a more specific match. The empty selector matches
+everything with the lowest score, ``()``.
+"""
+
+
+__all__ = (
+    'SelectorError',
+    'parse_selector',
+    'split_scope',
+)
+
+
+import re
+
+
+class SelectorError(ValueError):
+    pass
+
+
+_token_reg = re.compile(r"\s*([(),|&-]|[^\s(),|&]+)")
+
+
+def split_scope(scope):
+    """Split a space-separated scope string into a tuple of scope names."""
+    return tuple(scope.split())
+
+
+def _atom_matches(atom, scope):
+    return scope == atom or scope.startswith(atom + '.')
+
+
+class Empty(object):
+    """Matches everything, e.g. the '*' ruleset."""
+
+    def match(self, stack):
+        return ()
+
+    def __str__(self):
+        return ''
+
+
+class Path(object):
+    def __init__(self, atoms):
+        self.atoms = tuple(atoms)
+        self._dots = tuple(a.count('.') + 1 for a in self.atoms)
+
+    def match(self, stack):
+        # Match from the right and as deep as possible, so the score reflects
+        # the most specific way the path applies
+        score = []
+        i = len(stack)
+        for atom, dots in zip(reversed(self.atoms), reversed(self._dots)):
+            i -= 1
+            while i >= 0 and not _atom_matches(atom, stack[i]):
+                i -= 1
+            if i < 0:
+                return None
+            score.append((i, dots))
+        return tuple(score)
+
+    def __str__(self):
+        return ' '.join(self.atoms)
+
+
+class Or(object):
+    def __init__(self, items):
+        self.items = tuple(items)
+
+    def match(self, stack):
+        best = None
+        for item in self.items:
+            score = item.match(stack)
+            if score is not None and (best is None or score > best):
+                best = score
+        return best
+
+    def __str__(self):
+        return '(%s)' % ', '.join(map(str, self.items))
+
+
+class And(object):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def match(self, stack):
+        left = self.left.match(stack)
+        if left is None:
+            return None
+        right = self.right.match(stack)
+        if right is None:
+            return None
+        return max(left, right)
+
+    def __str__(self):
+        return '(%s & %s)' % (self.left, self.right)
+
+
+class Not(object):
+    def __init__(self, left, right):
+        self.left = left  # May be `Empty` for a leading '-'
+        self.right = right
+
+    def match(self, stack):
+        if self.right.match(stack) is not None:
+            return None
+        return self.left.match(stack)
+
+    def __str__(self):
+        return '(%s - %s)' % (self.left, self.right)
+
+
+class _Parser(object):
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _token_reg.findall(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def error(self, reason):
+        raise SelectorError("Invalid scope selector %r: %s" % (self.text, reason))
+
+    def parse(self):
+        result = self.parse_list()
+        if self.peek() is not None:
+            self.error("unexpected %r" % self.peek())
+        return result
+
+    def parse_list(self):
+        items = [self.parse_composite()]
+        while self.peek() in (',', '|'):
+            self.next()
+            items.append(self.parse_composite())
+        return items[0] if len(items) == 1 else Or(items)
+
+    def parse_composite(self):
+        if self.peek() == '-':
+            self.next()
+            result = Not(Empty(), self.parse_expression())
+        else:
+            result = self.parse_expression()
+        while self.peek() in ('&', '-'):
+            op = self.next()
+            right = self.parse_expression()
+            result = And(result, right) if op == '&' else Not(result, right)
+        return result
+
+    def parse_expression(self):
+        token = self.peek()
+        if token == '(':
+            self.next()
+            result = self.parse_list()
+            if self.next() != ')':
+                self.error("missing ')'")
+            return result
+
+        atoms = []
+        while self.peek() is not None and self.peek() not in '(),|&-':
+            atoms.append(self.next())
+        if not atoms:
+            self.error("expected a scope" if token is None else "unexpected %r" % token)
+        return Path(atoms)
+
+
+def parse_selector(text):
+    """Compile a scope selector string into an object with a `match(stack)` method.
+
+    Raises `SelectorError` for invalid selectors.
+    """
+    if not text.strip() or text.strip() == '*':
+        return Empty()
+    return _Parser(text).parse()
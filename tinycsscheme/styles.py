@@ -0,0 +1,223 @@
+"""
+Answer "which style does this scope get?" for a color scheme without Sublime Text.
+
+Example:
+
+    from tinycsscheme import parser, styles
+
+    engine = styles.StyleEngine.from_stylesheet(parser.parse_stylesheet(source))
+    engine.style("source.python string.quoted.double.python")
+    # {'foreground': '#A6E22E', 'background': '#272822', ...}
+
+Every ruleset's selector is compiled once with `scope_selector`. To avoid
+matching every selector against every scope stack, rules are indexed in a trie
+of dotted scope atoms by one atom of each of their paths (the one used by the
+fewest rules); a rule can only match a stack that contains a scope starting
+with that atom. Candidate lists per scope and the resolved styles per stack
+are cached, so repeated queries (which are the norm when walking over
+documents or comparing themes) are dictionary lookups.
+"""
+
+
+__all__ = (
+    'StyleEngine',
+    'diff_styles',
+)
+
+
+from collections import OrderedDict
+
+from .scope_selector import parse_selector, split_scope, Empty, Path, Or, And, Not
+
+
+def _key_paths(selector):
+    """Return the paths of which one must match any stack that `selector` matches.
+
+    Returns `None` if there are no such paths, e.g. for '*' or '- comment'.
+    """
+    if isinstance(selector, Path):
+        return [selector.atoms]
+    elif isinstance(selector, Or):
+        paths = []
+        for item in selector.items:
+            item_paths = _key_paths(item)
+            if item_paths is None:
+                return None
+            paths.extend(item_paths)
+        return paths
+    elif isinstance(selector, And):
+        paths = _key_paths(selector.left)
+        return paths if paths is not None else _key_paths(selector.right)
+    elif isinstance(selector, Not):
+        return _key_paths(selector.left)
+    else:
+        assert isinstance(selector, Empty)
+        return None
+
+
+class _TrieNode(object):
+    __slots__ = ('rules', 'children')
+
+    def __init__(self):
+        self.rules = []
+        self.children = {}
+
+
+class StyleEngine(object):
+
+    """Resolve effective styles of scope stacks for .tmTheme-style `data`.
+
+    For each key, the value of the matching item with the highest score wins,
+    later items win ties. Keys that no matching item sets fall back to the
+    global settings, i.e. those of items without a scope.
+
+    .. attribute:: items
+
+        The scoped items of `data`, in order.
+
+    .. attribute:: global_settings
+
+        The combined settings of all items without a scope.
+    """
+
+    def __init__(self, data, cache_size=100000):
+        self.items = []
+        self.global_settings = {}
+        self.cache_size = cache_size
+        self._selectors = []
+        self._always = []
+        self._trie = _TrieNode()
+        self._scope_cache = {}
+        self._style_cache = {}
+
+        rule_paths = []
+        for item in data.get('settings', ()):
+            if 'scope' not in item:
+                self.global_settings.update(item.get('settings', {}))
+                continue
+            selector = parse_selector(item['scope'])
+            self.items.append(item)
+            self._selectors.append((selector, item.get('settings', {})))
+            rule_paths.append(_key_paths(selector))
+
+        # Index every path by its rarest atom to keep the candidate lists short
+        frequency = {}
+        for paths in rule_paths:
+            for atom in set(atom for path in paths or () for atom in path):
+                frequency[atom] = frequency.get(atom, 0) + 1
+
+        for index, paths in enumerate(rule_paths):
+            if paths is None:
+                self._always.append(index)
+                continue
+            atoms = set(min(path, key=lambda atom: (frequency[atom], -atom.count('.')))
+                        for path in paths)
+            for atom in atoms:
+                node = self._trie
+                for part in atom.split('.'):
+                    node = node.children.setdefault(part, _TrieNode())
+                node.rules.append(index)
+
+    @classmethod
+    def from_stylesheet(cls, stylesheet, **kwargs):
+        """Create an engine for a parsed (CSScheme) `Stylesheet`.
+
+        Raises `dumper.DumpError` like `dumper.datafy_stylesheet`.
+        """
+        from .dumper import datafy_stylesheet
+        return cls(datafy_stylesheet(stylesheet), **kwargs)
+
+    def _scope_candidates(self, scope):
+        try:
+            return self._scope_cache[scope]
+        except KeyError:
+            pass
+        rules = []
+        node = self._trie
+        for part in scope.split('.'):
+            node = node.children.get(part)
+            if node is None:
+                break
+            rules.extend(node.rules)
+        rules = self._scope_cache[scope] = frozenset(rules)
+        return rules
+
+    def candidates(self, stack):
+        """Return the sorted indices of items that may match `stack`."""
+        rules = set(self._always)
+        for scope in stack:
+            rules.update(self._scope_candidates(scope))
+        return sorted(rules)
+
+    def _resolve(self, stack):
+        style = dict(self.global_settings)
+        best = {}
+        sources = {}
+        selectors = self._selectors
+        for index in self.candidates(stack):
+            selector, settings = selectors[index]
+            score = selector.match(stack)
+            if score is None:
+                continue
+            for key, value in settings.items():
+                if key not in best or score >= best[key]:
+                    best[key] = score
+                    style[key] = value
+                    sources[key] = index
+        return style, sources
+
+    def _lookup(self, stack):
+        if not isinstance(stack, tuple):
+            stack = split_scope(stack) if isinstance(stack, str) else tuple(stack)
+        try:
+            return self._style_cache[stack]
+        except KeyError:
+            pass
+        if len(self._style_cache) >= self.cache_size:
+            self._style_cache.clear()
+        result = self._style_cache[stack] = self._resolve(stack)
+        return result
+
+    def style(self, stack):
+        """Return the dict of settings for `stack`.
+
+        `stack` is a tuple of scope names (outermost first) or a space-separated
+        string. The returned dict is shared between calls, don't modify it.
+        """
+        return self._lookup(stack)[0]
+
+    def styles(self, stacks):
+        """Return a list with the style of every stack in `stacks`."""
+        lookup = self._lookup
+        return [lookup(stack)[0] for stack in stacks]
+
+    def sources(self, stack):
+        """Return a dict of setting keys to the index (in `items`) of the item
+        the value comes from. Keys from the global settings are not included.
+        """
+        return self._lookup(stack)[1]
+
+    def coverage(self, stacks):
+        """Count how many of `stacks` each item contributes a setting to.
+
+        Returns an `OrderedDict` of item index to count, including unused items.
+        """
+        counts = OrderedDict((i, 0) for i in range(len(self.items)))
+        for stack in stacks:
+            for index in set(self.sources(stack).values()):
+                counts[index] += 1
+        return counts
+
+    def clear_cache(self):
+        self._scope_cache.clear()
+        self._style_cache.clear()
+
+
+def diff_styles(engine_a, engine_b, stacks):
+    """Return `(stack, style_a, style_b)` tuples for every stack with a different style."""
+    differences = []
+    for stack in stacks:
+        a, b = engine_a.style(stack), engine_b.style(stack)
+        if a != b:
+            differences.append((stack, a, b))
+    return differences
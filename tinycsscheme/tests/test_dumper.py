@@ -341,6 +341,9 @@ def test_translate_colors(decl, expected_decl):
     (DC('prop', "rgb(1, 2, 3}"),
      "expected 1 token for parameter 3 in function 'rgb()', got 2"),
 
+    (DC('prop', "rgba(1, 2, 3,)"),
+     "expected 1 token for parameter 4 in function 'rgba()', got 0"),
+
     # Can't test all possible value types here, so only cover all params and
     # possible values as a whole
     (DC('prop', "rgb(hi, 2, 3)"),
@@ -367,3 +370,29 @@ def test_translate_colors_errors(decl, expected_error):
         assert False, "no exception was raised"
     except DumpError as e:
         assert expected_error in str(e)
+
+
+@pytest.mark.parametrize(('value', 'expected_color'), [
+    ("#123",                      "#112233"),
+    ("#12345678",                 "#12345678"),
+    (" black ",                   "#000000"),
+    ("rgb(255, 0, 0)",            "#FF0000"),
+    ("hsla(120, 100%, 50%, 0.5)", "#00FF0080"),
+    ("\"#abc\"",                  "#aabbcc"),
+
+    ("",                          None),
+    ("#12",                       None),
+    ("nocolor",                   None),
+    ("red blue",                  None),
+    ("$variable",                 None),
+    ("12px",                      None),
+    ("rgb(1, 2)",                 None),
+    ("rgb(10,20,",                None),
+    ("rgba(255, 0, 0,",           None),
+    ("hsl(1, 2%,",                None),
+    ("rgba(1,2,3,)",              None),
+])
+def test_evaluate_color(value, expected_color):
+    assert dumper.evaluate_color(value) == expected_color
+    # Cached
+    assert dumper._color_cache[value] == expected_color
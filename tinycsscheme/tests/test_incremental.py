@@ -0,0 +1,131 @@
+"""
+    Tests for the incrementally updated stylesheet
+"""
+
+import random
+
+import pytest
+
+from .. import incremental
+from ..incremental import split_chunks, IncrementalStylesheet
+
+
+SOURCE = """@name "Test";
+/* a { comment; */
+* { foreground: #fff; background: #000; }
+string { foreground: #fff; fontStyle: "bold"; }
+comment { foreground: red; }
+"""
+
+
+@pytest.mark.parametrize(('text', 'expected'), [
+    ("", []),
+    ("a {}", ["a {}"]),
+    ("@name 'x'; a { b: c; }\n", ["@name 'x';", " a { b: c; }", "\n"]),
+    ("a { b { c: d; } }", ["a { b { c: d; } }"]),
+    ("a { b: '}'; } /* } */ c {}", ["a { b: '}'; }", " /* } */ c {}"]),
+    ("a { b: 'x\\'}' }", ["a { b: 'x\\'}' }"]),
+    ("a { b: c", ["a { b: c"]),
+])
+def test_split_chunks(text, expected):
+    chunks = split_chunks(text)
+    assert chunks == expected
+    assert "".join(chunks) == text
+
+
+def test_update():
+    sheet = IncrementalStylesheet()
+    assert sheet.update(SOURCE) == 5
+    assert len(sheet.rules) == 4
+    assert not sheet.errors
+
+    # Nothing changed
+    assert sheet.update(SOURCE) == 0
+    assert len(sheet.rules) == 4
+
+    # Only one chunk changed
+    assert sheet.update(SOURCE.replace("red", "blue")) == 1
+    assert sheet.rules[-1].declarations[0].value.as_css() == "blue"
+
+    # Errors, the trailing whitespace is part of the new chunk
+    assert sheet.update(SOURCE.replace("red", "blue") + "keyword { foreground }") == 1
+    assert len(sheet.errors) == 1
+
+
+def test_value_counts():
+    sheet = IncrementalStylesheet(SOURCE)
+    assert sheet.value_counts({'foreground'}) == {'#fff': 2, 'red': 1}
+    assert sheet.value_counts({'fontStyle'}) == {'"bold"': 1}
+    assert sheet.value_counts(set()) == {}
+
+
+def test_validate():
+    text = ('@name "Test";\n* { foreground: #12; }\n'
+            'a { fontStyle: 1; }  b { c }\n'
+            'd { foreground: #123; }')
+    sheet = IncrementalStylesheet(text, validate=True)
+    errors = [(line, column, e.reason) for line, column, e in sheet.errors_at()]
+    assert errors == [
+        (2, 17, "unexpected length of 2 of color hash for property foreground"),
+        (3, 16, "unexpected INTEGER token for property fontStyle"),
+        (3, 26, "expected ':'"),
+    ]
+    # Colors are not translated
+    assert sheet.rules[-1].declarations[0].value.as_css() == "#123"
+
+    # Only parse errors without validation
+    assert len(list(IncrementalStylesheet(text).errors_at())) == 1
+
+
+def test_half_typed():
+    text = ('@name foo();\n'
+            'a { @x (1); }\n'
+            '* { foreground: rgb(10,20,; background: rgba(1,2,3,); }\n')
+    sheet = IncrementalStylesheet(text, validate=True)
+    errors = [(line, column, e.reason) for line, column, e in sheet.errors_at()]
+    assert errors == [
+        (1, 1, "expected STRING, IDENT or HASH token or a valid uuid4 for @name rule, "
+               "got FUNCTION"),
+        (2, 5, "expected STRING, IDENT or HASH token or a valid uuid4 for @x rule, got ("),
+        (3, 27, "unexpected ; token for property foreground in function 'rgb()'"),
+    ]
+
+
+def test_unexpected_exceptions(monkeypatch):
+    def broken(*args):
+        raise IndexError("list index out of range")
+
+    text = 'a { b: c; }\n\n  @name "x";'
+    sheet = IncrementalStylesheet(text, validate=True)
+    monkeypatch.setattr(incremental, 'datafy_ruleset', broken)
+    sheet.update(text.replace("c", "d"))
+    monkeypatch.setattr(sheet.parser, 'parse_stylesheet', broken)
+    sheet.update(text.replace("c", "d").replace("x", "y"))
+
+    errors = [(line, column, e.reason) for line, column, e in sheet.errors_at()]
+    assert errors == [
+        (1, 1, "unexpected IndexError: list index out of range"),
+        (3, 3, "unexpected IndexError: list index out of range"),
+    ]
+    assert len(sheet.rules) == 1
+
+
+def test_random_edits():
+    rnd = random.Random(0)
+    pieces = ["a { b: c; }", "\n", "/* } */", "'{'", "@name 'x';", "{", "}", ";", " ",
+              "d { e: #123; f: bold }"]
+    text = SOURCE
+    sheet = IncrementalStylesheet(text)
+    for _ in range(300):
+        i = rnd.randint(0, len(text))
+        j = min(len(text), i + rnd.randint(0, 10))
+        text = text[:i] + rnd.choice(pieces) * rnd.randint(0, 2) + text[j:]
+        sheet.update(text)
+        assert [c[0] for c in sheet.chunks] == split_chunks(text)
+        assert sheet.starts == [sum(map(len, split_chunks(text)[:k]))
+                                for k in range(len(sheet.chunks))]
+
+        fresh = IncrementalStylesheet(text)
+        assert [r.line for r in sheet.rules] == [r.line for r in fresh.rules]
+        assert ([(line, column, str(e)) for line, column, e in sheet.errors_at()]
+                == [(line, column, str(e)) for line, column, e in fresh.errors_at()])
@@ -0,0 +1,87 @@
+"""
+    Tests for the CSScheme output minimizer
+"""
+
+import pytest
+
+from .. import minimizer
+
+
+def DATA(*items):  # noqa
+    settings = [{'settings': {'foreground': "#FFFFFF", 'background': "#000000"}}]
+    settings.extend({'scope': scope, 'settings': s} for scope, s in items)
+    return {'name': "Test", 'settings': settings}
+
+
+@pytest.mark.parametrize(('data', 'expected'), [
+    # Nothing to do
+    (DATA(("string", {'foreground': "#123456"})),
+     DATA(("string", {'foreground': "#123456"}))),
+    # Global values
+    (DATA(("string", {'foreground': "#FFFFFF", 'fontStyle': "bold"}),
+          ("comment", {'background': "#000000"})),
+     DATA(("string", {'fontStyle': "bold"}))),
+    # Global values are needed to reset other rules
+    (DATA(("string", {'foreground': "#123456"}),
+          ("string.quoted", {'foreground': "#FFFFFF"})),
+     DATA(("string", {'foreground': "#123456"}),
+          ("string.quoted", {'foreground': "#FFFFFF"}))),
+    # Overridden settings and items
+    (DATA(("string", {'foreground': "#123456"}),
+          ("comment", {'foreground': "#654321"}),
+          ("string", {'foreground': "#abcdef"})),
+     DATA(("comment", {'foreground': "#654321"}),
+          ("string", {'foreground': "#abcdef"}))),
+    # Order in lists doesn't matter
+    (DATA(("string, comment", {'foreground': "#123456"}),
+          ("comment,string", {'foreground': "#abcdef"})),
+     DATA(("comment,string", {'foreground': "#abcdef"}))),
+    # Merge
+    (DATA(("string", {'foreground': "#123456"}),
+          ("comment", {'background': "#654321"}),
+          ("string", {'fontStyle': "bold"})),
+     DATA(("comment", {'background': "#654321"}),
+          ("string", {'foreground': "#123456", 'fontStyle': "bold"}))),
+    # Don't merge over items setting the same keys
+    (DATA(("string", {'foreground': "#123456"}),
+          ("comment", {'foreground': "#654321"}),
+          ("string", {'fontStyle': "bold"})),
+     DATA(("string", {'foreground': "#123456"}),
+          ("comment", {'foreground': "#654321"}),
+          ("string", {'fontStyle': "bold"}))),
+])
+def test_minimize(data, expected):
+    minimized = minimizer.minimize(data)
+    assert minimized == expected
+    assert minimizer.verify(data, minimized) == []
+
+
+def test_does_not_modify_input():
+    data = DATA(("string", {'foreground': "#FFFFFF"}))
+    minimizer.minimize(data)
+    assert data == DATA(("string", {'foreground': "#FFFFFF"}))
+
+
+def test_effective_style():
+    data = DATA(("string", {'foreground': "#111111"}),
+                ("source string", {'fontStyle': "bold"}),
+                ("string.quoted", {'foreground': "#222222"}),
+                ("string", {'foreground': "#333333"}))
+    assert minimizer.effective_style(data, ("source", "string.quoted")) == {
+        'foreground': "#222222",
+        'background': "#000000",
+        'fontStyle': "bold",
+    }
+    assert minimizer.effective_style(data, ("string.unquoted",)) == {
+        'foreground': "#333333",
+        'background': "#000000",
+    }
+
+
+def test_verify():
+    original = DATA(("string", {'foreground': "#111111"}))
+    modified = DATA(("string.quoted", {'foreground': "#111111"}))
+    differences = minimizer.verify(original, modified)
+    assert [d[0] for d in differences] == [("string",), ("string.x",)]
+    assert differences[0][1]['foreground'] == "#111111"
+    assert differences[0][2]['foreground'] == "#FFFFFF"
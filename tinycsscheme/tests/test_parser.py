@@ -124,6 +124,12 @@ def test_core_parser(css_source, expected_rules, expected_errors):
     ('@uuid 2e3af29f-ebee-331f-af96-72bda5d4c144;', 0,
         ["expected STRING, IDENT or HASH token or a valid uuid4 for @uuid rule, "
          "got DIMENSION"]),
+    ('@name foo();', 0,
+        ["expected STRING, IDENT or HASH token or a valid uuid4 for @name rule, "
+         "got FUNCTION"]),
+    ('foo {@bar (1);}', 1,
+        ["expected STRING, IDENT or HASH token or a valid uuid4 for @bar rule, "
+         "got ("]),
 ])
 def test_at_rules(css_source, expected_rules, expected_errors):
     stylesheet = CSSchemeParser().parse_stylesheet(css_source)
@@ -0,0 +1,99 @@
+"""
+    Tests for the CSScheme profiling hooks
+"""
+
+import pytest
+
+from .. import profiling
+from ..dumper import datafy_stylesheet
+from ..parser import CSSchemeParser, parse_stylesheet
+from ..tinycss import tokenizer
+
+
+SOURCE = """
+@name "Test";
+* { foreground: #123; background: rgb(1, 2, 3); }
+string { foreground: hsl(120, 50%, 50%); fontStyle: bold; }
+comment { foreground: red; }
+"""
+
+
+class RecordingHook(profiling.Hook):
+    def __init__(self):
+        self.events = []
+
+    def enter(self, name):
+        self.events.append(('enter', name))
+
+    def exit(self, name, elapsed):
+        assert elapsed >= 0
+        self.events.append(('exit', name))
+
+
+def test_counters():
+    with profiling.enabled(profiling.Counters()) as counters:
+        datafy_stylesheet(parse_stylesheet(SOURCE))
+
+    assert counters.calls['tokenize_flat'] == 1
+    assert counters.calls['parse_ruleset'] == 3
+    assert counters.calls['parse_declaration'] == 5
+    assert counters.calls['datafy_ruleset'] == 3
+    assert counters.calls['translate_colors'] == 5
+    # regroup is a generator and counted per step
+    assert counters.calls['regroup'] > 1
+    assert all(t >= 0 for t in counters.times.values())
+    assert 'parse_ruleset' in counters.format()
+
+
+def test_nesting():
+    hook = RecordingHook()
+    with profiling.enabled(hook):
+        CSSchemeParser().parse_stylesheet("a { b: c; }")
+
+    events = [e for e in hook.events if e[1] in ('parse_ruleset', 'parse_declaration')]
+    assert events == [('enter', 'parse_ruleset'),
+                      ('enter', 'parse_declaration'),
+                      ('exit', 'parse_declaration'),
+                      ('exit', 'parse_ruleset')]
+
+
+def test_disable_restores_originals():
+    originals = [owner.__dict__[attr] for owner, attr, _ in profiling.TARGETS]
+    with profiling.enabled(profiling.Counters()):
+        assert profiling.is_enabled()
+        assert tokenizer.regroup is not originals[1]
+    assert not profiling.is_enabled()
+    assert [owner.__dict__[attr] for owner, attr, _ in profiling.TARGETS] == originals
+
+
+def test_enable_twice():
+    with profiling.enabled():
+        with pytest.raises(RuntimeError):
+            profiling.enable()
+    assert not profiling.is_enabled()
+
+
+def test_disabled_on_error():
+    with pytest.raises(ZeroDivisionError):
+        with profiling.enabled(profiling.Counters()):
+            1 / 0
+    assert not profiling.is_enabled()
+
+
+def test_cprofile_hook():
+    import pstats
+    hook = profiling.CProfileHook()
+    with profiling.enabled(hook):
+        parse_stylesheet(SOURCE)
+    assert hook.depth == 0
+    stats = pstats.Stats(hook.profile)
+    assert any(func[2] == 'parse_declaration' for func in stats.stats)
+
+
+def test_stage_sampler():
+    sampler = profiling.StageSampler(interval=0.0001)
+    with profiling.enabled(sampler):
+        for _ in range(50):
+            datafy_stylesheet(parse_stylesheet(SOURCE))
+    assert not sampler._running
+    assert set(sampler.samples) <= set(name for _, _, name in profiling.TARGETS)
@@ -0,0 +1,55 @@
+"""
+    Tests for the scope selector matcher
+"""
+
+import pytest
+
+from ..scope_selector import parse_selector, split_scope, SelectorError
+
+
+@pytest.mark.parametrize(('selector', 'scope', 'matches'), [
+    ("", "source.python", True),
+    ("*", "source.python", True),
+    ("source", "source.python", True),
+    ("source.python", "source.python", True),
+    ("source.py", "source.python", False),
+    ("string", "source.python string.quoted", True),
+    ("source string", "source.python string.quoted", True),
+    ("string source", "source.python string.quoted", False),
+    ("source string", "source.python meta.block string.quoted", True),
+    ("comment, string", "source.python string.quoted", True),
+    ("comment | string", "source.python string.quoted", True),
+    ("source - string", "source.python string.quoted", False),
+    ("source - string", "source.python comment", True),
+    ("- string", "source.python comment", True),
+    ("source & string", "source.python string", True),
+    ("source & comment", "source.python string", False),
+    ("source - (string, comment)", "source.python comment", False),
+    ("meta.function-call", "source meta.function-call.python", True),
+])
+def test_match(selector, scope, matches):
+    score = parse_selector(selector).match(split_scope(scope))
+    assert (score is not None) == matches
+
+
+@pytest.mark.parametrize(('more', 'less', 'scope'), [
+    ("string.quoted", "string", "string.quoted.double"),
+    ("string", "source", "source.python string.quoted"),
+    ("source string", "string", "source.python string.quoted"),
+    ("string", "", "source.python string.quoted"),
+    ("comment, string.quoted", "string", "source string.quoted"),
+])
+def test_score(more, less, scope):
+    stack = split_scope(scope)
+    assert parse_selector(more).match(stack) > parse_selector(less).match(stack)
+
+
+@pytest.mark.parametrize('selector', [
+    "source,",
+    "(source",
+    "source)",
+    "source & ",
+])
+def test_invalid(selector):
+    with pytest.raises(SelectorError):
+        parse_selector(selector)
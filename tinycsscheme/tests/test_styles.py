@@ -0,0 +1,76 @@
+"""
+    Tests for the CSScheme style engine
+"""
+
+import pytest
+
+from ..parser import parse_stylesheet
+from ..styles import StyleEngine, diff_styles
+
+
+DATA = {
+    'name': "Test",
+    'settings': [
+        {'settings': {'foreground': "#FFFFFF", 'background': "#000000"}},
+        {'scope': "string", 'settings': {'foreground': "#111111"}},
+        {'scope': "source.python string", 'settings': {'fontStyle': "italic"}},
+        {'scope': "string.quoted", 'settings': {'foreground': "#222222"}},
+        {'scope': "comment, string.regexp", 'settings': {'foreground': "#333333"}},
+        {'scope': "- comment", 'settings': {'background': "#444444"}},
+        {'scope': "string", 'settings': {'fontStyle': "bold"}},
+    ]
+}
+
+
+@pytest.mark.parametrize(('stack', 'expected'), [
+    ("source.python",
+     {'foreground': "#FFFFFF", 'background': "#444444"}),
+    ("comment.line",
+     {'foreground': "#333333", 'background': "#000000"}),
+    ("string.unquoted",
+     {'foreground': "#111111", 'background': "#444444", 'fontStyle': "bold"}),
+    ("source.python string.quoted.double",
+     {'foreground': "#222222", 'background': "#444444", 'fontStyle': "italic"}),
+    ("source.python string.regexp",
+     {'foreground': "#333333", 'background': "#444444", 'fontStyle': "italic"}),
+    (("source.js", "string.regexp"),
+     {'foreground': "#333333", 'background': "#444444", 'fontStyle': "bold"}),
+])
+def test_style(stack, expected):
+    engine = StyleEngine(DATA)
+    assert engine.style(stack) == expected
+    # Cached
+    assert engine.style(stack) == expected
+
+
+def test_candidates():
+    engine = StyleEngine(DATA)
+    assert engine.candidates(("comment",)) == [3, 4]
+    assert engine.candidates(("source.python", "string")) == [0, 1, 4, 5]
+
+
+def test_sources_and_coverage():
+    engine = StyleEngine(DATA)
+    assert engine.sources("source.python string.quoted") == {
+        'foreground': 2, 'fontStyle': 1, 'background': 4}
+    coverage = engine.coverage(["string", "comment", "keyword"])
+    assert list(coverage.items()) == [(0, 1), (1, 0), (2, 0), (3, 1), (4, 2), (5, 1)]
+
+
+def test_from_stylesheet():
+    engine = StyleEngine.from_stylesheet(parse_stylesheet("""
+        @name "Test";
+        * { foreground: #fff; }
+        string { foreground: red; }
+    """))
+    assert engine.style("string.quoted") == {'foreground': "#FF0000"}
+    assert engine.style("comment") == {'foreground': "#ffffff"}
+
+
+def test_diff_styles():
+    other = dict(DATA, settings=DATA['settings'][:-1])
+    differences = diff_styles(StyleEngine(DATA), StyleEngine(other),
+                              ["comment", "string", "source.python string"])
+    assert [d[0] for d in differences] == ["string"]
+    assert differences[0][1]['fontStyle'] == "bold"
+    assert 'fontStyle' not in differences[0][2]
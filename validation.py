@@ -0,0 +1,125 @@
+import html
+
+import sublime
+import sublime_plugin
+
+from .tinycsscheme.incremental import IncrementalStylesheet
+
+from .convert import settings
+
+
+REGION_KEY = "csscheme-errors"
+
+PHANTOM_TEMPLATE = """
+<body id="csscheme-error">
+    <style>
+        div.error {{
+            background-color: color(var(--redish) alpha(0.15));
+            border-radius: 0.2rem;
+            padding: 0 0.4rem;
+        }}
+    </style>
+    <div class="error">{0}</div>
+</body>
+"""
+
+
+def is_csscheme(view):
+    """Whether the view contains plain CSScheme (and not SCSS or stylus)."""
+    return view.scope_name(0).split(' ', 1)[0] == "source.csscheme"
+
+
+def stylesheet_errors(sheet):
+    """Yield `(line, column, message)` for all errors of an `IncrementalStylesheet`,
+    including those that only show in the context of the whole stylesheet.
+    """
+    for line, column, error in sheet.errors_at():
+        yield line, column, error.reason
+
+    asterisks = [(line, column) for line, column, rule in sheet.rules_at()
+                 if not rule.at_keyword and rule.selector.as_css() == "*"]
+    if not asterisks and sheet.rules:
+        yield 1, 1, "Must contain '*' ruleset"
+    for line, column in asterisks[1:]:
+        yield line, column, "Only one *-rule allowed"
+
+
+class CSSchemeValidationListener(sublime_plugin.EventListener):
+
+    """Validate CSScheme files while typing.
+
+    Parsing happens on the async thread after the view was not modified for
+    `live_validation_delay` milliseconds. Results for outdated buffer contents
+    are discarded. Only changed top-level rules are parsed again, see
+    `IncrementalStylesheet`.
+    """
+
+    # view id -> IncrementalStylesheet
+    stylesheets = {}
+    # view id -> PhantomSet
+    phantom_sets = {}
+
+    def schedule(self, view):
+        if not settings().get("live_validation", True) or not is_csscheme(view):
+            return
+        change_count = view.change_count()
+        sublime.set_timeout_async(lambda: self.validate(view, change_count),
+                                  settings().get("live_validation_delay", 300))
+
+    def validate(self, view, change_count):
+        # Skip if there were more modifications in the meantime, they scheduled
+        # their own validation
+        if not view.is_valid() or view.change_count() != change_count:
+            return
+
+        sheet = self.stylesheets.get(view.id())
+        if sheet is None:
+            sheet = self.stylesheets[view.id()] = IncrementalStylesheet(validate=True)
+        sheet.update(view.substr(sublime.Region(0, view.size())))
+        errors = list(stylesheet_errors(sheet))
+
+        sublime.set_timeout(lambda: self.render(view, change_count, errors), 0)
+
+    def render(self, view, change_count, errors):
+        if not view.is_valid() or view.change_count() != change_count:
+            return
+
+        regions = []
+        phantoms = []
+        for line, column, message in errors:
+            point = view.text_point(line - 1, column - 1)
+            region = view.word(point)
+            if not region.contains(point) or region.empty():
+                region = sublime.Region(point, point + 1)
+            regions.append(region)
+            phantoms.append((region, message))
+
+        view.add_regions(REGION_KEY, regions, "invalid", "",
+                         sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE
+                         | sublime.DRAW_SQUIGGLY_UNDERLINE)
+
+        if not hasattr(sublime, 'PhantomSet'):
+            return
+        phantom_set = self.phantom_sets.get(view.id())
+        if phantom_set is None:
+            phantom_set = self.phantom_sets[view.id()] = sublime.PhantomSet(view, REGION_KEY)
+        phantom_set.update([
+            sublime.Phantom(sublime.Region(view.line(region).end()),
+                            PHANTOM_TEMPLATE.format(html.escape(message)),
+                            sublime.LAYOUT_BLOCK)
+            for region, message in phantoms
+        ])
+
+    def on_modified_async(self, view):
+        self.schedule(view)
+
+    def on_load_async(self, view):
+        self.schedule(view)
+
+    def on_activated_async(self, view):
+        if view.id() not in self.stylesheets:
+            self.schedule(view)
+
+    def on_close(self, view):
+        self.stylesheets.pop(view.id(), None)
+        self.phantom_sets.pop(view.id(), None)